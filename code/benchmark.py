@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Benchmarks and Equivalence Checks for Al Sadoon et al. (2019) Replication
+=========================================================================
+
+Two checks for changes to the simulation pipeline:
+
+speed
+    Times the stages of the Python engine (DGP generation, AB and SYS
+    estimation) over the Figure 1 N grid for Models A and B, plus rendering
+    all tables from the results store, and reports the throughput of each
+    stage (replications per second; table builds per second). Results are
+    written to output/benchmarks/latest.json and compared with a saved
+    baseline (--save-baseline): a stage whose throughput falls more than
+    --tolerance below its baseline is a regression.
+
+equivalence
+    Reruns cells of the archived Stata results (output/partial,
+    output/partial_tab2, output/partial_tab3) with the Python engine and
+    checks that AB_bias, SYS_bias, AB_se and SYS_se agree within Monte Carlo
+    error. The biases are compared with their MC standard errors and the
+    standard deviations with sd * sqrt((kurtosis - 1) / (4 (valid - 1))),
+    sd / sqrt(2 (valid - 1)) for normal estimates, with the kurtosis of the
+    rerun; the critical value is Bonferroni-corrected over all comparisons.
+
+    The kurtosis matters at short T: with T = 4 (Experiment 1) AB has two
+    collapsed instruments for one coefficient, so its estimates have a finite
+    mean but no finite variance (moments of IV estimators exist only up to
+    the degree of overidentification), and their sample sd differs from run
+    to run far more than normal theory says (AB kurtosis above 50, SYS near
+    10, for rho = 0.75).
+
+    The cells of one design and N share their random numbers, in the .do
+    files and in a rerun alike, so their differences are not independent and
+    a systematic gap can hide below the per-cell tolerance. With --seeds K,
+    every cell is rerun with K seeds: the per-cell comparisons use all K
+    reruns merged, and a pooled check tests the mean z of every group of
+    cells (design, N and column). The archived group mean has the same
+    variance as the group mean of one rerun, which is estimated from the
+    spread between seeds, so (mean over seeds) / sqrt(var (1 + 1/K)) is a t
+    statistic with K - 1 degrees of freedom; the groups are also
+    Bonferroni-corrected.
+
+Both commands exit with status 1 on a regression or a failed comparison.
+
+Usage:
+    python benchmark.py speed [--N 200 1000 5000] [--reps 50] [--save-baseline]
+    python benchmark.py equivalence [--preset table1] [--reps 500] [--seeds 8]
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+import dgp
+import gmm
+import make_tables
+import results_store
+import simulate
+import sweep
+from mcstats import RunningStats
+
+BENCHMARK_DIR = "output/benchmarks"
+BASELINE_FILE = "baseline.json"
+LATEST_FILE = "latest.json"
+
+# Relative throughput loss that counts as a regression
+TOLERANCE = 0.30
+
+# Minimum time spent timing each stage (short stages are repeated more often)
+MIN_SECONDS = 0.5
+
+# Family-wise error rate of the equivalence comparisons
+ALPHA = 0.05
+
+STAGES = ['dgp', 'AB', 'SYS']
+
+# Results store selection -> (simulate.py design, estimator suffix)
+SELECTIONS = {
+    'endogenous': ('endogenous', ''),
+    'non_endogenous': ('nonendogenous', ''),
+    'full_sample': ('endogenous', '_full'),
+}
+
+
+def best_time(function, repeat):
+    """
+    Shortest wall-clock time of repeated calls (the least disturbed run).
+
+    The function is called at least repeat times and until MIN_SECONDS have
+    been spent.
+    """
+    times = []
+    while len(times) < repeat or sum(times) < MIN_SECONDS:
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def time_stages(N, model, rho=0.5, reps=50, repeat=3):
+    """
+    Time DGP generation and AB/SYS estimation for one (N, model).
+
+    Args:
+        N: Number of individuals
+        model: Selection model
+        rho: Autoregressive parameter
+        reps: Replications per timed call
+        repeat: Minimum timed calls per stage (the fastest counts)
+
+    Returns:
+        Dictionary mapping stage to replications per second
+    """
+    params = dgp.get_design('endogenous')
+    rng = np.random.default_rng(dgp.SEED)
+    panels = {}
+
+    def generate():
+        panels.update(dgp.drop_burn_in(dgp.simulate_panels(params, N, model, rho, reps, rng), params))
+
+    seconds = {
+        'dgp': best_time(generate, repeat),
+        'AB': best_time(lambda: gmm.arellano_bond(panels['y']), repeat),
+        'SYS': best_time(lambda: gmm.system_gmm(panels['y']), repeat),
+    }
+    return {stage: reps / seconds[stage] for stage in STAGES}
+
+
+def time_tables(repeat=3):
+    """
+    Time loading the results store and rendering all tables (into a temporary directory).
+
+    Returns:
+        Table builds per second
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        def build():
+            conn = results_store.connect()
+            index = results_store.load_index(conn)
+            conn.close()
+            for module in make_tables.TABLE_MODULES:
+                module.generate_latex_table(module.select_results(index),
+                                            os.path.join(directory, module.TABLE_OUTPUT_FILE))
+
+        return 1 / best_time(build, repeat)
+
+
+def find_regressions(results, baseline, tolerance=TOLERANCE):
+    """
+    Compare throughputs with the baseline.
+
+    Args:
+        results: Dictionary mapping benchmark name to throughput
+        baseline: Same for the baseline run
+        tolerance: Allowed relative throughput loss
+
+    Returns:
+        List of (name, throughput, baseline throughput) below the threshold
+    """
+    return [(name, value, baseline[name]) for name, value in results.items()
+            if name in baseline and value < (1 - tolerance) * baseline[name]]
+
+
+def save_json(data, path):
+    """Write a JSON file, creating its directory."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+
+def run_speed(args):
+    """Run the speed benchmarks; returns the exit status."""
+    print("=" * 70)
+    print(f"SPEED BENCHMARKS - {args.reps} replications per call, best of {args.repeat}")
+    print("=" * 70)
+    print(f"{'N':>6} {'model':>5}" + "".join(f"{stage + ' reps/s':>14}" for stage in STAGES))
+
+    results = {}
+    for N in args.N:
+        for model in sweep.MODELS:
+            throughput = time_stages(N, model, reps=args.reps, repeat=args.repeat)
+            print(f"{N:>6} {model:>5}" + "".join(f"{throughput[stage]:>14.1f}" for stage in STAGES))
+            for stage in STAGES:
+                results[f"{stage}/{model}/N{N}"] = throughput[stage]
+    results['tables'] = time_tables(args.repeat)
+    print(f"Tables: {results['tables']:.1f} builds/s")
+
+    save_json(results, os.path.join(args.dir, LATEST_FILE))
+    baseline_path = os.path.join(args.dir, BASELINE_FILE)
+    status = 0
+    if args.save_baseline:
+        save_json(results, baseline_path)
+        print(f"Baseline saved to: {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for name, value, reference in regressions:
+            print(f"  REGRESSION {name}: {value:.1f}/s vs baseline {reference:.1f}/s")
+        print(f"{len(regressions)} of {len(results)} benchmarks more than {args.tolerance:.0%} below baseline")
+        status = 1 if regressions else 0
+    else:
+        print(f"No baseline in {baseline_path} (run with --save-baseline)")
+    print("=" * 70)
+    return status
+
+
+def archived_results(directories=results_store.PARTIAL_DIRS):
+    """Index of the archived Stata results (read into an in-memory store, not output/results.sqlite)."""
+    conn = results_store.connect(":memory:", archive=directories)
+    index = results_store.load_index(conn, engine='stata')
+    conn.close()
+    return index
+
+
+def design_of(row):
+    """simulate.py design and estimator suffix of an archived cell."""
+    if row['experiment'] > 0:
+        return f"exp{row['experiment']}", ''
+    return SELECTIONS[row['selection']]
+
+
+def compare_estimator(reference, summary, estimator):
+    """
+    z statistics of the bias and sd differences of one estimator.
+
+    Args:
+        reference: Archived results row
+        summary: mcstats.RunningStats.summary() of the rerun
+        estimator: 'AB' or 'SYS'
+
+    Returns:
+        List of (column, archived value, rerun value, z)
+    """
+    comparisons = []
+    valid = reference[f"{estimator}_valid"]
+    bias, sd = reference[f"{estimator}_bias"], reference[f"{estimator}_se"]
+    if bias is None or sd is None or valid < 2 or summary['valid'] < 2:
+        return comparisons
+    error = math.hypot(sd / math.sqrt(valid), summary['mcse'])
+    comparisons.append((f"{estimator}_bias", bias, summary['bias'], (summary['bias'] - bias) / error))
+    # MC error of a sample sd: sd * sqrt((kurtosis - 1) / (4 (n - 1))), with the kurtosis of the rerun for both
+    scale = math.sqrt((summary['kurtosis'] - 1) / 4)
+    error = scale * math.hypot(sd / math.sqrt(valid - 1), summary['sd'] / math.sqrt(summary['valid'] - 1))
+    comparisons.append((f"{estimator}_se", sd, summary['sd'], (summary['sd'] - sd) / error))
+    return comparisons
+
+
+def student_t_p_value(t, df):
+    """
+    Two-sided p-value of a Student t statistic.
+
+    Uses the finite series for integer degrees of freedom (Abramowitz and
+    Stegun 26.7.3 and 26.7.4).
+
+    Args:
+        t: t statistic
+        df: Degrees of freedom (positive integer)
+
+    Returns:
+        P(|T| >= |t|)
+    """
+    theta = math.atan(abs(t) / math.sqrt(df))
+    cos2 = math.cos(theta) ** 2
+    term = total = 1.0
+    if df % 2 == 0:
+        for k in range(2, df, 2):
+            term *= cos2 * (k - 1) / k
+            total += term
+        inside = math.sin(theta) * total
+    else:
+        for k in range(3, df, 2):
+            term *= cos2 * (k - 1) / k
+            total += term
+        inside = 2 / math.pi * (theta + (math.sin(theta) * math.cos(theta) * total if df > 1 else 0.0))
+    return max(1.0 - inside, 0.0)
+
+
+def pool_groups(z_values):
+    """
+    Pooled check of groups of cells that share their random numbers.
+
+    Args:
+        z_values: Dictionary mapping group to the list, one entry per seed,
+            of the z statistics of the group's cells
+
+    Returns:
+        List of (group, mean z, t, p) in group order; t and p are NaN with
+        fewer than two seeds
+    """
+    pooled = []
+    for group, by_seed in sorted(z_values.items()):
+        means = [sum(values) / len(values) for values in by_seed]
+        K = len(means)
+        mean = sum(means) / K
+        if K < 2:
+            pooled.append((group, mean, math.nan, math.nan))
+            continue
+        var = sum((value - mean) ** 2 for value in means) / (K - 1)
+        t = mean / math.sqrt(var * (1 + 1 / K)) if var > 0 else math.copysign(math.inf, mean)
+        pooled.append((group, mean, t, student_t_p_value(t, K - 1)))
+    return pooled
+
+
+def run_equivalence(args):
+    """Rerun archived cells and compare; returns the exit status."""
+    preset = sweep.PRESETS[args.preset]
+    designs = set(preset['designs'])
+    index = archived_results()
+
+    # One run per (design, N, model, rho); the endogenous run also gives the full sample
+    runs = {}
+    for key, row in sorted(index.items()):
+        design, suffix = design_of(row)
+        if design not in designs or row['N'] not in preset['N']:
+            continue
+        runs.setdefault((design, row['N'], row['model'], row['rho']), []).append((row, suffix))
+
+    seeds = [args.seed + index for index in range(args.seeds)]
+    print("=" * 70)
+    print(f"EQUIVALENCE WITH ARCHIVED STATA RESULTS - preset {args.preset}, {len(runs)} cells, "
+          f"seeds {', '.join(map(str, seeds))}")
+    print("=" * 70)
+    comparisons = []
+    z_values = {}
+    for (design, N, model, rho), references in runs.items():
+        full_sample = any(suffix for _, suffix in references)
+        reruns = [simulate.run_cell(design, N, model, rho, reps=args.reps, full_sample=full_sample, seed=seed)
+                  for seed in seeds]
+        for reference, suffix in references:
+            for estimator in ['AB', 'SYS']:
+                name = estimator + suffix
+                merged = RunningStats()
+                for index, stats in enumerate(reruns):
+                    merged.merge(stats[name])
+                    for column, _, _, z in compare_estimator(reference, stats[name].summary(rho), estimator):
+                        z_values.setdefault((design + suffix, N, column), [[] for _ in seeds])[index].append(z)
+                cell = simulate.cell_basename(design, model, f"{rho:.2f}", N) + suffix
+                comparisons += [(cell,) + comparison
+                                for comparison in compare_estimator(reference, merged.summary(rho), estimator)]
+
+    critical = NormalDist().inv_cdf(1 - args.alpha / (2 * max(len(comparisons), 1)))
+    failures = [comparison for comparison in comparisons if not abs(comparison[4]) <= critical]
+    for cell, column, archived, rerun, z in comparisons:
+        flag = "  FAIL" if not abs(z) <= critical else ""
+        print(f"{cell:<34} {column:<9} archived={archived:>9.5f} rerun={rerun:>9.5f} z={z:>6.2f}{flag}")
+    print("-" * 70)
+    print(f"{len(failures)} of {len(comparisons)} comparisons outside MC tolerance "
+          f"(|z| > {critical:.2f}, Bonferroni at {args.alpha})")
+
+    pooled = pool_groups(z_values)
+    print("-" * 70)
+    if len(seeds) < 2:
+        print("Pooled check of the groups of cells skipped: it needs --seeds 2 or more")
+        pooled_failures = []
+    else:
+        level = args.alpha / max(len(pooled), 1)
+        pooled_failures = [group for group, _, _, p in pooled if not p >= level]
+        for (design, N, column), mean, t, p in pooled:
+            flag = "  FAIL" if not p >= level else ""
+            print(f"{design:<18} N={N:<6} {column:<9} mean z={mean:>6.2f} t={t:>7.2f} p={p:.4f}{flag}")
+        print(f"{len(pooled_failures)} of {len(pooled)} groups with a systematic difference "
+              f"(p < {level:.4f}, t with {len(seeds) - 1} df, Bonferroni at {args.alpha})")
+    print("=" * 70)
+    return 1 if failures or pooled_failures else 0
+
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the simulation pipeline and check it against Stata.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    speed = commands.add_parser('speed', help="time the pipeline stages")
+    speed.add_argument('--N', type=int, nargs='+', default=sweep.FIGURE1_N)
+    speed.add_argument('--reps', type=int, default=50, help="replications per timed call")
+    speed.add_argument('--repeat', type=int, default=3, help="minimum timed calls per stage (the fastest counts)")
+    speed.add_argument('--tolerance', type=float, default=TOLERANCE,
+                       help="relative throughput loss that counts as a regression")
+    speed.add_argument('--save-baseline', action='store_true', help="save the results as the new baseline")
+    speed.add_argument('--dir', default=BENCHMARK_DIR)
+
+    equivalence = commands.add_parser('equivalence', help="rerun archived cells and compare")
+    equivalence.add_argument('--preset', choices=sorted(sweep.PRESETS), default='table1')
+    equivalence.add_argument('--reps', type=int, default=simulate.REPS)
+    equivalence.add_argument('--seed', type=int, default=dgp.SEED, help="seed of the first rerun")
+    equivalence.add_argument('--seeds', type=int, default=1,
+                             help="reruns of every cell with seeds --seed, --seed + 1, ... (2 or more for the "
+                                  "pooled check of groups of cells)")
+    equivalence.add_argument('--alpha', type=float, default=ALPHA,
+                             help="family-wise error rate of the comparisons")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Main function to run a benchmark command."""
+    args = parse_args(argv)
+    if args.command == 'speed':
+        return run_speed(args)
+    return run_equivalence(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Incremental Artifact Builder for Al Sadoon et al. (2019) Replication
+====================================================================
+
+Rebuilds only the tables and Figure 1 panels whose inputs changed. Every
+artifact is declared with the results store filter that selects its cells,
+which gives the dependency graph from grid cells to outputs. A manifest
+(output/build_manifest.json) records the content hash of every cell and of
+the inputs each artifact was last built from, together with the identity of
+the store (results_store.get_meta(conn, 'store_id')) and the last store
+version seen. A store with a different identity (deleted and rebuilt, or
+replaced) rebuilds everything.
+
+A build reads only the cells written since that version (an indexed query),
+re-hashes them, and rebuilds the artifacts that contain a cell whose hash
+changed or whose output file is missing. With nothing new in the store the
+build ends after one query, so it can be run on every sweep tick.
+
+Tables and Figure 1 panels (pgfplots, see make_figure_1.py) are rendered in
+process from the rows of the artifact's own filtered query.
+
+Usage:
+    python build.py            # rebuild what changed
+    python build.py --force    # rebuild everything
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import make_figure_1
+import make_table_1
+import make_table_2
+import make_table_3
+import results_store
+
+MANIFEST_PATH = "output/build_manifest.json"
+
+# Value columns that enter the artifacts (date_time does not, so rerunning a
+# cell with identical results rebuilds nothing)
+HASHED_COLUMNS = ["AB_bias", "AB_se", "SYS_bias", "SYS_se", "AB_valid", "SYS_valid"]
+
+
+def _panel(number):
+    """Figure 1 panel artifact."""
+    return {
+        'filters': make_figure_1.panel_filters(make_figure_1.PANELS[number][0]),
+        'table': None,
+        'panel': number,
+    }
+
+
+# Output path -> store filter of its input cells and how to build it
+ARTIFACTS = {
+    "output/tables/table1.tex": {
+        'filters': {'experiment': 0, 'selection': ['endogenous', 'non_endogenous'], 'N': [500, 5000]},
+        'table': make_table_1,
+        'panel': None,
+    },
+    "output/tables/table2.tex": {
+        'filters': {'experiment': [1, 2, 3, 4, 5], 'N': 500},
+        'table': make_table_2,
+        'panel': None,
+    },
+    "output/tables/table3.tex": {
+        'filters': {'experiment': [1, 2, 3, 4, 5], 'N': 5000},
+        'table': make_table_3,
+        'panel': None,
+    },
+    "output/fig1/panel1_bias_rho025.tex": _panel(1),
+    "output/fig1/panel2_bias_rho050.tex": _panel(2),
+    "output/fig1/panel3_bias_rho075.tex": _panel(3),
+}
+
+
+def cell_key(row):
+    """Manifest key of a cell, e.g. '0/endogenous/A/500/0.25'."""
+    return "/".join(str(row[column]) for column in results_store.KEY_COLUMNS)
+
+
+def cell_hash(row):
+    """Content hash of the values of one cell that enter the artifacts."""
+    payload = json.dumps([row[column] for column in HASHED_COLUMNS])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def inputs_hash(cell_hashes):
+    """Content hash of all input cells of an artifact."""
+    digest = hashlib.sha1()
+    for key in sorted(cell_hashes):
+        digest.update(f"{key}={cell_hashes[key]}\n".encode())
+    return digest.hexdigest()
+
+
+def matches(row, filters):
+    """Whether a cell is an input of the artifact with the given store filter."""
+    for column, value in filters.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        if column == 'rho':
+            values = [results_store.normalize_rho(v) for v in values]
+        if row[column] not in values:
+            return False
+    return True
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Read the build manifest (empty if there is none)."""
+    if not os.path.exists(path):
+        return {'store': None, 'version': -1, 'cells': {}, 'artifacts': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """Write the build manifest atomically."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def stale_artifacts(conn, manifest, force=False):
+    """
+    Find the artifacts to rebuild and update the cell hashes in the manifest.
+
+    Args:
+        conn: Store connection
+        manifest: Manifest dictionary (updated in place)
+        force: Treat every artifact as stale (a store other than the one in
+            the manifest makes every artifact stale anyway)
+
+    Returns:
+        Set of output paths to rebuild
+    """
+    store = results_store.get_meta(conn, 'store_id')
+    if manifest.get('store') != store:
+        # Another store (e.g. deleted and rebuilt): its versions say nothing about the manifest
+        manifest.update(store=store, version=-1, cells={}, artifacts={})
+    rows, latest = results_store.changed_since(conn, manifest['version'])
+    if latest < manifest['version']:
+        # The store was rolled back: compare every cell
+        rows, latest = results_store.changed_since(conn, -1)
+    manifest['version'] = latest
+
+    stale = {path for path in ARTIFACTS
+             if force or path not in manifest['artifacts'] or not os.path.exists(path)}
+    for row in rows:
+        key = cell_key(row)
+        digest = cell_hash(row)
+        if manifest['cells'].get(key) == digest:
+            continue
+        manifest['cells'][key] = digest
+        stale.update(path for path, artifact in ARTIFACTS.items() if matches(row, artifact['filters']))
+    return stale
+
+
+def build(force=False, manifest_path=MANIFEST_PATH):
+    """
+    Rebuild the stale artifacts.
+
+    Args:
+        force: Rebuild every artifact
+        manifest_path: Build manifest path
+
+    Returns:
+        List of rebuilt output paths
+    """
+    manifest = load_manifest(manifest_path)
+    conn = results_store.connect()
+    stale = stale_artifacts(conn, manifest, force)
+
+    rebuilt = []
+    for path in sorted(stale):
+        artifact = ARTIFACTS[path]
+        rows = results_store.query_results(conn, **artifact['filters'])
+        digest = inputs_hash({cell_key(row): manifest['cells'][cell_key(row)] for row in rows})
+        if not force and manifest['artifacts'].get(path) == digest and os.path.exists(path):
+            continue
+
+        if artifact['table'] is not None:
+            index = {tuple(row[column] for column in results_store.KEY_COLUMNS): row for row in rows}
+            artifact['table'].generate_latex_table(artifact['table'].select_results(index), path)
+        else:
+            make_figure_1.generate_pgfplots_panel(make_figure_1.select_series(rows), path)
+        manifest['artifacts'][path] = digest
+        rebuilt.append(path)
+    conn.close()
+
+    save_manifest(manifest, manifest_path)
+    return rebuilt
+
+
+def main(argv=None):
+    """Main function to rebuild the stale artifacts."""
+    parser = argparse.ArgumentParser(description="Rebuild the tables and figure panels whose inputs changed.")
+    parser.add_argument('--force', action='store_true', help="rebuild everything")
+    args = parser.parse_args(argv)
+
+    rebuilt = build(force=args.force)
+    for path in rebuilt:
+        print(f"✓ {path}")
+    print(f"Rebuilt {len(rebuilt)} of {len(ARTIFACTS)} artifacts")
+
+
+if __name__ == "__main__":
+    main()
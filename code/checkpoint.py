@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Replication Checkpoints for Al Sadoon et al. (2019) Replication
+===============================================================
+
+Durable, append-only checkpoints of one simulation cell, so that a crashed or
+preempted cell can resume from the last completed batch instead of starting
+over.
+
+A checkpoint is a JSON Lines file. The first line describes the run (cell
+parameters, seed, batch size, estimators); every following line holds one
+completed batch: its replication range, the running statistics of each
+estimator after the batch (see mcstats.RunningStats.state()), the RNG state
+after the batch and the cell's telemetry so far (see telemetry.py). Each batch is flushed and fsync'ed before the next one starts.
+Floats are written with repr precision, so a resumed run reproduces an
+uninterrupted run bit for bit.
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import json
+import os
+
+
+def load_checkpoint(path, header):
+    """
+    Read the completed batches of a checkpoint.
+
+    A truncated last line (crash while writing) is ignored.
+
+    Args:
+        path: Checkpoint file path
+        header: Run description; must match the header stored in the file
+
+    Returns:
+        List of batch dictionaries (start, stop, stats, rng_state and, if
+        recorded, telemetry), empty if the file does not exist
+
+    Raises:
+        ValueError: If the checkpoint belongs to a different run
+    """
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as f:
+        lines = f.read().split('\n')
+
+    try:
+        stored_header = json.loads(lines[0])
+    except json.JSONDecodeError:
+        return []
+    if stored_header != header:
+        raise ValueError(f"Checkpoint {path} was written by a different run: {stored_header}")
+
+    batches = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            break
+        expected_start = batches[-1]['stop'] if batches else 0
+        if record['start'] != expected_start:
+            break
+        batches.append(record)
+    return batches
+
+
+class CheckpointWriter:
+    """
+    Append-only checkpoint writer for one cell.
+
+    Args:
+        path: Checkpoint file path
+        header: Run description written as the first line
+        batches: Completed batches already in the file (from load_checkpoint);
+            the file is rewritten from scratch when empty
+    """
+
+    def __init__(self, path, header, batches=()):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if batches:
+            # Drop anything after the last complete batch (e.g. a truncated line)
+            self._rewrite(path, header, batches)
+            self.file = open(path, 'a')
+        else:
+            self.file = open(path, 'w')
+            self._write_line(header)
+
+    def _rewrite(self, path, header, batches):
+        with open(path + '.tmp', 'w') as f:
+            f.write(json.dumps(header) + '\n')
+            for batch in batches:
+                f.write(json.dumps(batch) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def _write_line(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def append(self, start, stop, stats, rng_state, telemetry=None):
+        """
+        Durably record one completed batch.
+
+        Args:
+            start: First replication of the batch
+            stop: One past the last replication of the batch
+            stats: Dictionary mapping estimator name to its RunningStats after the batch
+            rng_state: Generator.bit_generator.state after the batch
+            telemetry: Optional CellTelemetry of the cell so far
+        """
+        record = {
+            'start': start,
+            'stop': stop,
+            'stats': {name: running.state() for name, running in stats.items()},
+            'rng_state': rng_state,
+        }
+        if telemetry is not None:
+            record['telemetry'] = telemetry.state()
+        self._write_line(record)
+
+    def close(self):
+        self.file.close()
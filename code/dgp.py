@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Vectorized Data-Generating Process for Al Sadoon et al. (2019) Replication
+==========================================================================
+
+NumPy version of the DGP in endogenous.do / nonendogenous.do / experiment*.do.
+Instead of rebuilding an N*T_total long-format dataset per replication, all
+replications of a cell are drawn at once as (reps, N, T_total) arrays.
+
+Note: Stata's RNG stream cannot be reproduced with NumPy, so individual draws
+differ from the .do files even with the same seed. Only the distribution of the
+simulated panels (and hence the Monte Carlo results) is the same.
+
+With init='stationary', only the T estimation periods are generated: the
+outcome before the first of them and (Model B) the selection state are drawn
+from their stationary distributions given the individual effects, instead of
+running the 13-period burn-in (see simulate_panels()).
+
+Replications can be drawn in dependent units for variance reduction
+(variance_reduced_shocks()): antithetic pairs, where the second replication
+uses the mirrored innovations of the first, or Latin hypercube blocks, where
+every innovation is stratified across the replications of the block.
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import math
+
+import numpy as np
+
+# Same seed as the .do files (set seed 08869)
+SEED = 8869
+
+# Constant of the outcome equation, y_it = rho*y_it-1 + 2 + alpha_i + eps_it
+OUTCOME_CONSTANT = 2
+
+# Baseline parameters (Section 3 of Al Sadoon et al. 2019), as in endogenous.do
+BASELINE = {
+    'T': 7,                   # Time periods for estimation (after discarding 13)
+    'T_total': 20,            # Total periods generated
+    'T_discard': 13,          # Periods to discard for initial conditions
+    'a_param': 1.794,         # Set so P(d_it* > 0) = 0.85 (15% selection)
+    'sigma_z': 1,             # Standard deviation of z_it
+    'sigma_eta': 1,           # Standard deviation of eta_i
+    'sigma_u': 1,             # Standard deviation of u_it
+    'sigma_alpha0': 1,        # Standard deviation of alpha_i^0
+    'sigma_eps0': 1,          # Standard deviation of epsilon_it^0
+    'theta_param': 0.5,       # alpha_i = alpha_i^0 + theta*eta_i
+    'vartheta_param': 0.5,    # eps_it = eps_it^0 + vartheta*u_it
+    'nonstationary': False,   # Experiment 5 time-varying error components
+    'init': 'burn_in',        # Initial conditions: 'burn_in' or 'stationary'
+}
+
+# Initial condition modes
+INIT_MODES = ['burn_in', 'stationary']
+
+# Uniform draws behind the Experiment 5 multipliers, in draw order
+NONSTATIONARY_UNIFORMS = ['eps_switch', 'u_switch', 'draw1', 'draw2']
+
+# Draws of the stationary initial conditions (init='stationary'): a standard
+# normal for the pre-sample outcome and a uniform for the selection state
+STATIONARY_INIT = ['y_init', 'd_init']
+
+# Variance reduction mode -> replications per unit (see variance_reduced_shocks())
+SAMPLING_UNITS = {'antithetic': 2, 'lhs': 10}
+
+# Coefficients of Acklam's rational approximation of the normal quantile
+# function (relative error below 1.2e-9)
+_QUANTILE_A = [-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+               1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00]
+_QUANTILE_B = [-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+               6.680131188771972e+01, -1.328068155288572e+01, 1.0]
+_QUANTILE_C = [-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+               -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00]
+_QUANTILE_D = [7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+               3.754408661907416e+00, 1.0]
+_QUANTILE_LOW = 0.02425
+
+# One entry per .do file. Values override BASELINE.
+DESIGNS = {
+    'endogenous': {},
+    'nonendogenous': {'theta_param': 0, 'vartheta_param': 0},
+    'exp1': {'T': 4, 'T_total': 17},                      # Very short T
+    'exp2': {'a_param': 1.168},                           # 25% selection
+    'exp3': {'a_param': 1.8, 'sigma_eta': 2},             # sigma_eta/sigma_eps = 2
+    'exp4': {'a_param': 1.8, 'theta_param': 0.25, 'vartheta_param': 0.25},
+    'exp5': {'a_param': 1.8, 'nonstationary': True},      # Non-stationary errors
+}
+
+
+def get_design(name, **overrides):
+    """
+    Get the full parameter set for one of the simulation designs.
+
+    Args:
+        name: Design name, one of DESIGNS ('endogenous', 'nonendogenous', 'exp1'-'exp5')
+        **overrides: Individual parameters to replace (e.g. T_total=30)
+
+    Returns:
+        Dictionary with all DGP parameters
+    """
+    if name not in DESIGNS:
+        raise ValueError(f"Unknown design '{name}'. Expected one of: {', '.join(DESIGNS)}")
+
+    params = dict(BASELINE)
+    params.update(DESIGNS[name])
+    params.update(overrides)
+    params['design'] = name
+    if params['init'] not in INIT_MODES:
+        raise ValueError(f"Unknown init '{params['init']}'. Expected one of: {', '.join(INIT_MODES)}")
+    if params['init'] == 'stationary' and params['nonstationary']:
+        raise ValueError(f"Design '{name}' has non-stationary errors: use init='burn_in'")
+    return params
+
+
+def generated_periods(params):
+    """Number of periods simulate_panels() generates (T_total, or T without burn-in)."""
+    return params['T'] if params['init'] == 'stationary' else params['T_total']
+
+
+def draw_shocks(N, T_total, reps, rng, nonstationary=False, stationary_init=False):
+    """
+    Draw the standardized innovations of a batch of replications.
+
+    Normals have unit variance and are scaled by the design's standard
+    deviations in simulate_panels(). The uniforms are only needed for the
+    time-varying multipliers of Experiment 5.
+
+    Args:
+        N: Number of individuals
+        T_total: Periods generated (see generated_periods())
+        reps: Number of replications
+        rng: numpy Generator
+        nonstationary: Also draw the Experiment 5 uniforms
+        stationary_init: Also draw the stationary initial conditions
+
+    Returns:
+        Dictionary of arrays: alpha_i0, eta_i (reps, N); eps_i0, u_it, z_it
+        (reps, N, T_total); eps_switch, u_switch, draw1, draw2 (reps, N,
+        T_total) if nonstationary; and y_init, d_init (reps, N) if
+        stationary_init
+    """
+    shape = (reps, N, T_total)
+    shocks = {
+        'alpha_i0': rng.standard_normal((reps, N)),
+        'eta_i': rng.standard_normal((reps, N)),
+        'eps_i0': rng.standard_normal(shape),
+        'u_it': rng.standard_normal(shape),
+        'z_it': rng.standard_normal(shape),
+    }
+    if nonstationary:
+        for name in NONSTATIONARY_UNIFORMS:
+            shocks[name] = rng.random(shape)
+    if stationary_init:
+        shocks['y_init'] = rng.standard_normal((reps, N))
+        shocks['d_init'] = rng.random((reps, N))
+    return shocks
+
+
+def shock_shapes(N, T_total, nonstationary=False, stationary_init=False):
+    """Shape of one replication of every innovation of draw_shocks(), in draw order."""
+    shapes = {'alpha_i0': (N,), 'eta_i': (N,), 'eps_i0': (N, T_total), 'u_it': (N, T_total), 'z_it': (N, T_total)}
+    if nonstationary:
+        shapes.update({name: (N, T_total) for name in NONSTATIONARY_UNIFORMS})
+    if stationary_init:
+        shapes.update({'y_init': (N,), 'd_init': (N,)})
+    return shapes
+
+
+def replication_rng(seed, N, T_total, rep, chunk=0):
+    """
+    Counter-based generator for one replication (or one chunk of its individuals).
+
+    The Philox key is derived from (seed, N, T_total) and the replication and
+    chunk indices set the high words of the counter, so every replication has its own stream
+    that does not depend on which other replications are drawn, in what order,
+    or in which process. rho, the selection model and the design's scale
+    parameters are deliberately not part of the key: as with `set seed 08869`
+    in the .do files, cells of the same shape use common random numbers.
+
+    Args:
+        seed: RNG seed
+        N: Number of individuals
+        T_total: Total periods generated
+        rep: Replication index
+        chunk: Index of the chunk of individuals (0 when drawn all at once)
+
+    Returns:
+        numpy Generator
+    """
+    key = np.random.SeedSequence([seed, N, T_total]).generate_state(2, np.uint64)
+    return np.random.Generator(np.random.Philox(key=key, counter=[0, chunk, rep, 0]))
+
+
+def counter_shocks(N, T_total, start, stop, seed=SEED, nonstationary=False, stationary_init=False,
+                   chunk=0, n=None):
+    """
+    Innovations of replications start..stop-1 from counter-based streams.
+
+    Args:
+        N: Number of individuals in the cell
+        T_total: Periods generated
+        start: First replication
+        stop: One past the last replication
+        seed: RNG seed
+        nonstationary: Also draw the Experiment 5 uniforms
+        stationary_init: Also draw the stationary initial conditions
+        chunk: Index of the chunk of individuals
+        n: Individuals in the chunk (default: N)
+
+    Returns:
+        Dictionary in the format of draw_shocks()
+    """
+    draws = [draw_shocks(n or N, T_total, 1, replication_rng(seed, N, T_total, rep, chunk), nonstationary,
+                         stationary_init)
+             for rep in range(start, stop)]
+    return {name: np.concatenate([draw[name] for draw in draws]) for name in draws[0]}
+
+
+def normal_quantile(p):
+    """Standard normal quantile function (elementwise, 0 < p < 1)."""
+    p = np.asarray(p, dtype=float)
+    x = np.empty_like(p)
+    central = (p >= _QUANTILE_LOW) & (p <= 1 - _QUANTILE_LOW)
+    q = p[central] - 0.5
+    r = q * q
+    x[central] = q * np.polyval(_QUANTILE_A, r) / np.polyval(_QUANTILE_B, r)
+    tail = ~central
+    q = np.sqrt(-2 * np.log(np.minimum(p[tail], 1 - p[tail])))
+    x[tail] = np.where(p[tail] < 0.5, 1, -1) * np.polyval(_QUANTILE_C, q) / np.polyval(_QUANTILE_D, q)
+    return x
+
+
+def variance_reduced_shocks(N, T_total, reps, rng, mode, nonstationary=False, stationary_init=False):
+    """
+    Draw the innovations of a batch of replications in dependent units.
+
+    'antithetic': replications come in pairs, the second with the normals of
+    the first negated and the uniforms u replaced by 1 - u.
+
+    'lhs': replications come in blocks of SAMPLING_UNITS['lhs']; in every
+    block, each innovation (individual, period and shock) takes one value in
+    each of the block's equal-probability strata, in random order (Latin
+    hypercube sampling across replications). This is the one-dimensional
+    stratification of a scrambled (t, m, s)-net, which needs no direction
+    numbers and works whatever the number of innovations per replication.
+
+    Within a unit the replications are dependent, so only unit means are
+    independent (see mcstats.UnitStats). Every replication still has the
+    distribution of draw_shocks().
+
+    Args:
+        N: Number of individuals
+        T_total: Periods generated
+        reps: Number of replications, a multiple of SAMPLING_UNITS[mode]
+        rng: numpy Generator
+        mode: 'antithetic' or 'lhs'
+        nonstationary: Also draw the Experiment 5 uniforms
+        stationary_init: Also draw the stationary initial conditions
+
+    Returns:
+        Dictionary in the format of draw_shocks()
+    """
+    size = SAMPLING_UNITS[mode]
+    if reps % size:
+        raise ValueError(f"{mode} draws need a multiple of {size} replications, got {reps}")
+    uniforms = set(NONSTATIONARY_UNIFORMS) | {'d_init'}
+    if mode == 'antithetic':
+        shocks = draw_shocks(N, T_total, reps // 2, rng, nonstationary, stationary_init)
+        return {name: np.stack([values, 1 - values if name in uniforms else -values], axis=1)
+                .reshape((reps,) + values.shape[1:])
+                for name, values in shocks.items()}
+
+    shocks = {}
+    for name, shape in shock_shapes(N, T_total, nonstationary, stationary_init).items():
+        blocks = (reps // size, size) + shape
+        strata = np.argsort(rng.random(blocks), axis=1)
+        u = (strata + rng.random(blocks)) / size
+        values = u if name in uniforms else normal_quantile(u)
+        shocks[name] = values.reshape((reps,) + shape)
+    return shocks
+
+
+def _normal_cdf(x):
+    """Standard normal CDF (elementwise)."""
+    return 0.5 * np.vectorize(math.erfc, otypes=[float])(-np.asarray(x) / math.sqrt(2))
+
+
+def stationary_selection_probability(params, eta_i):
+    """
+    Stationary probability of being selected under dynamic selection (Model B).
+
+    Given eta_i, d_it is a two-state Markov chain with
+    P(d_it = 1 | d_it-1 = 0) = p0 = Phi((a - eta_i) / s) and
+    P(d_it = 1 | d_it-1 = 1) = p1 = Phi((a - eta_i - 0.5) / s), where s is the
+    standard deviation of z_it - u_it; its stationary probability of d = 1 is
+    p0 / (1 - p1 + p0).
+
+    Args:
+        params: DGP parameters
+        eta_i: Individual effects in the selection equation
+
+    Returns:
+        Array with the shape of eta_i
+    """
+    s = math.sqrt(params['sigma_z'] ** 2 + params['sigma_u'] ** 2)
+    p0 = _normal_cdf((params['a_param'] - eta_i) / s)
+    p1 = _normal_cdf((params['a_param'] - eta_i - 0.5) / s)
+    return p0 / (1 - p1 + p0)
+
+
+def simulate_panels(params, N, model, rho, reps, rng=None, shocks=None):
+    """
+    Draw all replications of a simulation cell at once.
+
+    Follows the DATA GENERATION PROCESS block of the .do files:
+    individual effects alpha_i, eta_i; shocks eps_it, u_it, z_it; static (A)
+    or dynamic (B) selection d; AR(1) outcome y_star; and y = y_star if d == 1.
+
+    With params['init'] == 'stationary', only the T estimation periods are
+    generated. The outcome of the period before is drawn from its stationary
+    distribution given alpha_i, (2 + alpha_i)/(1-rho) plus a normal with
+    variance Var(eps_it)/(1-rho^2), and in Model B the previous selection state
+    from its stationary distribution given eta_i. This is exact for Model A and
+    for non-endogenous selection; in Model B with endogenous selection it
+    leaves out the dependence between the pre-sample outcome and selection
+    state that runs through past u_it.
+
+    Args:
+        params: DGP parameters as returned by get_design()
+        N: Number of individuals
+        model: Selection model ('A' = static, 'B' = dynamic)
+        rho: Autoregressive parameter
+        reps: Number of replications to draw
+        rng: numpy Generator (default: seeded with SEED)
+        shocks: Optional standardized innovations (as returned by draw_shocks(),
+            e.g. read from a shock bank); rng is not used when given
+
+    Returns:
+        Dictionary of arrays with the .do variable names. Time-varying arrays
+        have shape (reps, N, T_total); alpha_i0 and eta_i have shape (reps, N)
+        (alpha_i is time-varying only in Experiment 5). y is NaN when d == 0,
+        like Stata missing values.
+    """
+    if model not in ('A', 'B'):
+        raise ValueError("Model must be A (static) or B (dynamic)")
+    T_total = generated_periods(params)
+    stationary_init = params['init'] == 'stationary'
+    shape = (reps, N, T_total)
+    if shocks is None:
+        if rng is None:
+            rng = np.random.default_rng(SEED)
+        shocks = draw_shocks(N, T_total, reps, rng, params['nonstationary'], stationary_init)
+
+    # Individual-specific components (time-invariant)
+    alpha_i0 = params['sigma_alpha0'] * shocks['alpha_i0']
+    eta_i = params['sigma_eta'] * shocks['eta_i']
+
+    # Time-varying components
+    eps_i0 = params['sigma_eps0'] * shocks['eps_i0']
+    u_it = params['sigma_u'] * shocks['u_it']
+    z_it = params['sigma_z'] * shocks['z_it']
+
+    if params['nonstationary']:
+        # Experiment 5: time-varying variances (x1 or x2) and time-varying
+        # correlation parameters (x0.5, x1 or x2)
+        eps_i0 = eps_i0 * ((shocks['eps_switch'] < 0.5) + 1)
+        u_it = u_it * ((shocks['u_switch'] < 0.5) + 1)
+        multiplier = np.where(shocks['draw1'] < 0.333, 0.5, np.where(shocks['draw2'] < 0.5, 1.0, 2.0))
+        alpha_i = alpha_i0[..., None] + params['theta_param'] * multiplier * eta_i[..., None]
+        eps_it = eps_i0 + params['vartheta_param'] * multiplier * u_it
+    else:
+        alpha_i = alpha_i0 + params['theta_param'] * eta_i
+        eps_it = eps_i0 + params['vartheta_param'] * u_it
+
+    # Broadcast time-invariant terms over t
+    alpha_t = alpha_i if alpha_i.ndim == 3 else alpha_i[..., None]
+    eta_t = eta_i[..., None]
+
+    # Selection equation
+    a = params['a_param']
+    if model == 'A':
+        # Static selection: d_it* = a - z_it - eta_i - u_it
+        d = (a - z_it - eta_t - u_it) > 0
+    else:
+        # Dynamic selection: d_it* = a - 0.5*d_it-1 + z_it - eta_i - u_it, d_i0 = 1
+        base = a + z_it - eta_t - u_it
+        d = np.empty(shape, dtype=bool)
+        if stationary_init:
+            ditm1 = shocks['d_init'] < stationary_selection_probability(params, eta_i)
+        else:
+            ditm1 = np.ones((reps, N))
+        for t in range(T_total):
+            d[..., t] = (base[..., t] - 0.5 * ditm1) > 0
+            ditm1 = d[..., t]
+
+    # Outcome equation: AR(1) with initial condition (2 + alpha_i + eps_i1)/(1-rho)
+    innovation = OUTCOME_CONSTANT + alpha_t + eps_it
+    y_star = np.empty(shape)
+    if stationary_init:
+        sd_eps = math.sqrt(params['sigma_eps0'] ** 2 + (params['vartheta_param'] * params['sigma_u']) ** 2)
+        y_init = (OUTCOME_CONSTANT + alpha_i) / (1 - rho) + sd_eps / math.sqrt(1 - rho ** 2) * shocks['y_init']
+        y_star[..., 0] = rho * y_init + innovation[..., 0]
+    else:
+        y_star[..., 0] = innovation[..., 0] / (1 - rho)
+    for t in range(1, T_total):
+        y_star[..., t] = rho * y_star[..., t - 1] + innovation[..., t]
+
+    # Observe y only when selected
+    y = np.where(d, y_star, np.nan)
+
+    return {
+        'alpha_i0': alpha_i0,
+        'eta_i': eta_i,
+        'alpha_i': alpha_i,
+        'eps_it': eps_it,
+        'u_it': u_it,
+        'z_it': z_it,
+        'd': d,
+        'y_star': y_star,
+        'y': y,
+    }
+
+
+def drop_burn_in(panels, params):
+    """
+    Drop the first T_discard periods from the time-varying arrays.
+
+    Args:
+        panels: Dictionary returned by simulate_panels()
+        params: DGP parameters
+
+    Returns:
+        New dictionary where time-varying arrays have T = T_total - T_discard
+        periods (views, no copy); the panels themselves with init='stationary'
+    """
+    if params['init'] == 'stationary':
+        return panels
+    T_total = params['T_total']
+    T_discard = params['T_discard']
+    return {
+        name: (values[..., T_discard:] if values.ndim == 3 and values.shape[-1] == T_total else values)
+        for name, values in panels.items()
+    }
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Batched GMM Estimators for Al Sadoon et al. (2019) Replication
+==============================================================
+
+NumPy versions of the xtabond2 calls in the .do files, estimated for all
+replications of a cell in a single pass:
+
+    AB:  xtabond2 y L.y, gmm(L.y, collapse) nolevel
+    SYS: xtabond2 y L.y, gmm(L.y, lag(2 .)) iv(L.D.y, equation(level))
+
+Panels are (reps, N, T) arrays where unobserved values of y are NaN (or
+excluded through a selection mask). Following xtabond2, an equation enters the
+estimation only when all of its variables are observed, and missing values in
+GMM-style instruments are replaced by zeros. Estimates are one-step with the
+default H matrix (h(3)) and non-robust standard errors.
+
+Both estimators only need sums over individuals, accumulated in a
+PatternMoments by observation pattern. Use it directly to accumulate large
+panels chunk by chunk of individuals.
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import numpy as np
+
+
+def _observed(y, mask=None):
+    """
+    Combine missing values and the selection mask into one observation mask.
+
+    Args:
+        y: Outcome array (reps, N, T), NaN when unobserved
+        mask: Optional boolean selection array (d == 1) of the same shape
+
+    Returns:
+        Tuple (y0, observed) where y0 has unobserved values replaced by 0
+    """
+    observed = np.isfinite(y)
+    if mask is not None:
+        observed &= mask.astype(bool)
+    y0 = np.where(observed, y, 0.0)
+    return y0, observed
+
+
+def _difference_h(n_rows):
+    """
+    H block for the first-differenced equations (2 on the diagonal, -1 off it).
+
+    Args:
+        n_rows: Number of consecutive difference equations
+
+    Returns:
+        (n_rows, n_rows) array
+    """
+    H = 2 * np.eye(n_rows)
+    H -= np.eye(n_rows, k=1)
+    H -= np.eye(n_rows, k=-1)
+    return H
+
+
+def _system_h(n_rows):
+    """
+    H matrix for system GMM (xtabond2 h(3) default).
+
+    Rows are the difference equations followed by the level equations for the
+    same periods. The blocks are MM' (difference), M (difference x level) and
+    I (level), where M is the first-difference operator.
+
+    Args:
+        n_rows: Number of periods with both a difference and a level equation
+
+    Returns:
+        (2 * n_rows, 2 * n_rows) array
+    """
+    M = np.eye(n_rows) - np.eye(n_rows, k=-1)
+    return np.block([
+        [_difference_h(n_rows), M],
+        [M.T, np.eye(n_rows)],
+    ])
+
+
+def _pattern_kernel(equations, T, code):
+    """
+    Moments of one observation pattern as a linear map of w w'.
+
+    Given which of the T periods are observed, every row of the estimating
+    equations (instruments Z, regressors X, dependent variable Y) is a linear
+    function of w = (y_1, ..., y_T, 1) with y_t = 0 when unobserved, so every
+    moment matrix is a fixed linear function of w w'. The map is found by
+    building the equations for the T + 1 unit vectors of w.
+
+    Args:
+        equations: Equation builder (_ab_equations or _system_equations)
+        T: Number of periods
+        code: Observation pattern, bit t set when period t is observed
+
+    Returns:
+        Tuple (K, shapes): K is a ((T+1)^2, n_moments) array such that the
+        moments of individuals with this pattern are (sum of w w') @ K, and
+        shapes gives the name and shape of each moment in K's columns; None if
+        the pattern has no row in the estimation sample
+    """
+    observed = ((code >> np.arange(T)) & 1).astype(bool)
+    basis = np.eye(T + 1)
+    Z, X, Y, included, H, n_diff = equations(basis[:, :T] * observed, np.tile(observed, (T + 1, 1)),
+                                             basis[:, T])
+    if not included[0].any():
+        return None
+    Xd = X[:, :n_diff]
+    Yd = Y[:, :n_diff]
+    nobs = np.zeros((T + 1, T + 1))
+    nobs[T, T] = np.count_nonzero(included[0, :n_diff])
+    moments = {
+        'ZHZ': np.einsum('arl,rs,bsm->ablm', Z, H, Z, optimize=True),
+        'ZX': np.einsum('arl,brk->ablk', Z, X, optimize=True),
+        'Zy': np.einsum('arl,br->abl', Z, Y, optimize=True),
+        # Difference-equation cross products for the residual variance
+        'XX': np.einsum('ark,brj->abkj', Xd, Xd, optimize=True),
+        'Xy': np.einsum('ark,br->abk', Xd, Yd, optimize=True),
+        'yy': np.einsum('ar,br->ab', Yd, Yd, optimize=True),
+        'nobs': nobs,
+    }
+    shapes = [(name, values.shape[2:]) for name, values in moments.items()]
+    K = np.concatenate([values.reshape((T + 1) ** 2, -1) for values in moments.values()], axis=1)
+    return K, shapes
+
+
+# Pattern kernels by (equation builder, T, pattern), shared by all
+# replications and cells with the same T
+_PATTERN_KERNELS = {}
+
+
+def _cached_pattern_kernel(equations, T, code):
+    """_pattern_kernel() computed once per (equations, T, code)."""
+    key = (equations.__name__, T, code)
+    if key not in _PATTERN_KERNELS:
+        _PATTERN_KERNELS[key] = _pattern_kernel(equations, T, code)
+    return _PATTERN_KERNELS[key]
+
+
+def _one_step(moments):
+    """
+    One-step GMM coefficients and non-robust standard errors from moments.
+
+    b = (X'Z A Z'X)^-1 X'Z A Z'y with A = (Z'HZ)^-1 (generalized inverse, so
+    all-zero instrument columns do no harm) and V = sig2 * (X'Z A Z'X)^-1, where
+    sig2 = e*'e* / (2 (n - k)) is estimated from the difference equations.
+
+    Args:
+        moments: Dictionary returned by PatternMoments.moments()
+
+    Returns:
+        Tuple (coefs, ses), each (reps, k); NaN where estimation failed
+    """
+    ZX = moments['ZX']
+    k = ZX.shape[-1]
+    A = np.linalg.pinv(moments['ZHZ'], hermitian=True)
+    XZA = np.swapaxes(ZX, -1, -2) @ A
+    M = XZA @ ZX
+    XZAZy = (XZA @ moments['Zy'][..., None])[..., 0]
+
+    # Replications without enough information are reported as missing
+    valid = (np.linalg.matrix_rank(M) == k) & (moments['nobs'] > k)
+    M[~valid] = np.eye(k)
+    M_inv = np.linalg.inv(M)
+    coefs = (M_inv @ XZAZy[..., None])[..., 0]
+
+    # Residual variance from the difference equations
+    ssr = (moments['yy']
+           - 2 * np.einsum('bk,bk->b', coefs, moments['Xy'])
+           + np.einsum('bk,bkj,bj->b', coefs, moments['XX'], coefs))
+    dof = np.maximum(moments['nobs'] - k, 1)
+    sig2 = ssr / (2 * dof)
+    ses = np.sqrt(np.maximum(sig2, 0)[:, None] * np.diagonal(M_inv, axis1=-2, axis2=-1))
+
+    coefs[~valid] = np.nan
+    ses[~valid] = np.nan
+    return coefs, ses
+
+
+def _ab_equations(y0, observed, one):
+    """
+    Rows of the Arellano-Bond difference equations.
+
+    Equations D.y_t = rho * D.y_t-1 for t = 3..T enter when y_t, y_t-1 and
+    y_t-2 are all observed; the collapsed instruments are y_t-2, y_t-3, ...,
+    one column per lag distance.
+
+    Args:
+        y0: Outcomes (..., T), zero when unobserved
+        observed: Boolean observation mask (..., T)
+        one: Value of the constant (...,) (not used: no constant in AB)
+
+    Returns:
+        Tuple (Z, X, Y, included, H, n_diff) with instruments (..., R, L),
+        regressors (..., R, 1) and dependent variable (..., R), zero on rows
+        not in the estimation sample, the included rows (..., R), the H matrix
+        and the number of difference-equation rows
+    """
+    T = y0.shape[-1]
+    n_rows = T - 2
+
+    # Equations for t = 3..T: need y_t, y_t-1 and y_t-2
+    valid = observed[..., 2:] & observed[..., 1:-1] & observed[..., :-2]
+    Y = (y0[..., 2:] - y0[..., 1:-1]) * valid
+    X = ((y0[..., 1:-1] - y0[..., :-2]) * valid)[..., None]
+
+    # Collapsed GMM instruments: column j holds y_t-2-j (zero when missing)
+    Z = np.zeros(y0.shape[:-1] + (n_rows, n_rows))
+    for j in range(n_rows):
+        Z[..., j:, j] = y0[..., :n_rows - j]
+    Z *= valid[..., None]
+
+    return Z, X, Y, valid, _difference_h(n_rows), n_rows
+
+
+def _system_equations(y0, observed, one):
+    """
+    Rows of the system GMM difference and level equations.
+
+    Row r is period t = r + 3 (1-based) in both equation blocks. Both the
+    difference equation D.y_t = rho * D.y_t-1 and the level equation
+    y_t = rho * y_t-1 + _cons enter when y_t, y_t-1 and y_t-2 are observed
+    (L.D.y must be available for the levels). Instruments:
+      - difference equations: y_t-3, y_t-4, ... (one column per period and lag)
+      - level equations: D.y_t-2 (one column per period), L.D.y and _cons
+
+    Args:
+        y0: Outcomes (..., T), zero when unobserved
+        observed: Boolean observation mask (..., T)
+        one: Value of the constant (...,), 1 for actual individuals
+
+    Returns:
+        Tuple (Z, X, Y, included, H, n_diff) as in _ab_equations()
+    """
+    T = y0.shape[-1]
+    n_rows = T - 2
+
+    valid = observed[..., 2:] & observed[..., 1:-1] & observed[..., :-2]
+    dy = y0[..., 1:] - y0[..., :-1]
+    dy_available = observed[..., 1:] & observed[..., :-1]
+    constant = np.asarray(one)[..., None]
+
+    Y = np.concatenate([dy[..., 1:], y0[..., 2:]], axis=-1) * np.concatenate([valid, valid], axis=-1)
+    X = np.zeros(y0.shape[:-1] + (2 * n_rows, 2))
+    X[..., :n_rows, 0] = dy[..., :-1] * valid          # D.L.y
+    X[..., n_rows:, 0] = y0[..., 1:-1] * valid         # L.y
+    X[..., n_rows:, 1] = constant * valid              # _cons
+
+    # Difference-equation GMM instruments: row r uses y_s for periods s < r,
+    # i.e. y_t-3 and earlier (uncollapsed, one column per (t, s) pair)
+    rows, lags = np.tril_indices(n_rows, -1)
+    n_diff_cols = len(rows)
+    # Level-equation GMM instruments: D.y_t-2 for rows r >= 1
+    n_level_cols = n_rows - 1
+    n_cols = n_diff_cols + n_level_cols + 2
+
+    Z = np.zeros(y0.shape[:-1] + (2 * n_rows, n_cols))
+    Z[..., rows, np.arange(n_diff_cols)] = y0[..., lags]
+    level_rows = np.arange(1, n_rows)
+    level_cols = n_diff_cols + np.arange(n_level_cols)
+    Z[..., n_rows + level_rows, level_cols] = (dy * dy_available)[..., level_rows - 1]
+    Z[..., n_rows:, -2] = dy[..., :-1]                 # L.D.y (IV-style)
+    Z[..., n_rows:, -1] = constant                     # _cons
+    included = np.concatenate([valid, valid], axis=-1)
+    Z *= included[..., None]
+
+    return Z, X, Y, included, _system_h(n_rows), n_rows
+
+
+class PatternMoments:
+    """
+    Sufficient statistics of the AB and SYS estimators for a batch of replications.
+
+    For every replication and observation pattern, the sum of w w' over the
+    individuals with that pattern (see _pattern_kernel()), from which all
+    moment matrices of both estimators follow. Totals of disjoint sets of
+    individuals of the same replications simply add up, so a panel can be
+    accumulated chunk by chunk of individuals, or chunks can be accumulated in
+    separate processes and merged: memory depends on the number of patterns
+    (at most 2^T), not on N. Adding the same chunks in the same order always
+    gives the same result, bit for bit, whether they are added to one
+    PatternMoments or each to its own and then merged in that order.
+
+    Args:
+        reps: Number of replications
+        T: Number of periods
+    """
+
+    def __init__(self, reps, T):
+        self.reps = reps
+        self.T = T
+        self.totals = {}
+
+    def add(self, y, mask=None, full=None):
+        """
+        Add a chunk of individuals.
+
+        Individuals are grouped by pattern and replication with one sort, and
+        each group is reduced to its sum of w w'.
+
+        With full, the same individuals are also added to another
+        PatternMoments without the selection, like the full-sample estimates
+        of endogenous2.do. y must then be observed everywhere (e.g. y_star)
+        and mask gives the selection. The group sums are taken of the
+        unselected w w' and masked by the pattern afterwards, since within a
+        group the masking is the same for every individual; the full-sample
+        totals are the sums over the groups. One sort and one pass over the
+        individuals thus serve both samples, and the selected totals are
+        exactly those of add(y masked, mask).
+
+        Args:
+            y: Outcome array (reps, n, T) for n individuals, NaN if unobserved
+            mask: Optional boolean selection array (d == 1)
+            full: Optional PatternMoments for the full sample (see above)
+        """
+        y0, observed = _observed(y, mask)
+        codes = observed.astype(np.int64) @ (1 << np.arange(self.T, dtype=np.int64))
+        self._add_patterns(y0 if full is None else y, codes, full, masked=full is None)
+
+    def add_panel(self, panel, name='y_star', full=None):
+        """
+        Add the selected observations of a variable of a panel.Panel.
+
+        The selection codes of the panel are the observation patterns, so the
+        individuals are grouped without unpacking the selection or copying the
+        variable (the group sums are masked by pattern, as with full in add()).
+
+        Args:
+            panel: panel.Panel of a chunk of individuals
+            name: Variable, observed everywhere (y_star)
+            full: Optional PatternMoments for the full sample (see add())
+        """
+        self._add_patterns(panel[name], panel.codes.astype(np.int64), full)
+
+    def _add_patterns(self, values, codes, full=None, masked=False):
+        """
+        Group individuals by pattern and replication and add their sums of w w'.
+
+        Args:
+            values: Outcomes (reps, n, T); unless masked, the sums are masked
+                by pattern afterwards
+            codes: Observation patterns (reps, n)
+            full: Optional PatternMoments for the unmasked sums
+            masked: values are already zero where unobserved
+        """
+        reps, n, T = values.shape
+        keys = (codes * reps + np.arange(reps)[:, None]).ravel()
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        w = np.concatenate([values, np.ones((reps, n, 1))], axis=-1)
+        w = w.reshape(reps * n, T + 1)[order]
+
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        G = np.add.reduceat(np.einsum('ia,ib->iab', w, w).reshape(reps * n, -1), starts)
+        group_codes, group_reps = np.divmod(keys[starts], reps)
+
+        # The full sample gets one total per chunk, as merge() adds it
+        full_totals = np.zeros((reps, G.shape[1])) if full is not None else None
+        bounds = np.flatnonzero(np.r_[True, group_codes[1:] != group_codes[:-1], True])
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            code = int(group_codes[first])
+            totals = G[first:last]
+            if full is not None:
+                full_totals[group_reps[first:last]] += totals
+            if not masked:
+                selected = np.append((code >> np.arange(T)) & 1, 1).astype(float)
+                totals = totals * np.outer(selected, selected).ravel()
+            self._add_totals(code, group_reps[first:last], totals)
+        if full is not None:
+            full._add_totals((1 << T) - 1, np.arange(reps), full_totals)
+
+    def _add_totals(self, code, reps, totals):
+        """Add group totals of one pattern to the given replications (distinct)."""
+        if code not in self.totals:
+            self.totals[code] = np.zeros((self.reps, (self.T + 1) ** 2))
+        self.totals[code][reps] += totals
+
+    def merge(self, other):
+        """
+        Add the individuals accumulated by another PatternMoments.
+
+        Args:
+            other: PatternMoments of other individuals of the same replications
+        """
+        for code, values in other.totals.items():
+            if code in self.totals:
+                self.totals[code] = self.totals[code] + values
+            else:
+                self.totals[code] = values.copy()
+
+    def moments(self, equations):
+        """
+        Moment matrices of one estimator.
+
+        The totals of each pattern are mapped through the cached kernel of the
+        pattern, so the instrument matrices are built once per pattern instead
+        of once per individual. Each replication only sums over its own
+        individuals, so its moments do not depend on the other replications.
+
+        Args:
+            equations: Equation builder (_ab_equations or _system_equations)
+
+        Returns:
+            Dictionary of per-replication moment matrices
+        """
+        T = self.T
+        count = (T + 1) ** 2 - 1      # entry of w w' counting the individuals
+        totals = None
+        for code in sorted(self.totals):
+            kernel = _cached_pattern_kernel(equations, T, code)
+            if kernel is None:
+                continue
+            K, shapes = kernel
+            if totals is None:
+                totals = np.zeros((self.reps, K.shape[1]))
+            rows = np.flatnonzero(self.totals[code][:, count])
+            totals[rows] += self.totals[code][rows] @ K
+
+        if totals is None:
+            # No individual has a usable equation: only the shapes matter
+            K, shapes = _pattern_kernel(equations, T, (1 << T) - 1)
+            totals = np.zeros((self.reps, K.shape[1]))
+
+        moments = {}
+        column = 0
+        for name, shape in shapes:
+            size = int(np.prod(shape))
+            moments[name] = totals[:, column:column + size].reshape((self.reps,) + shape)
+            column += size
+        moments['nobs'] = np.rint(moments['nobs']).astype(np.int64)
+        return moments
+
+    def moment_conditions(self, equations, coefs):
+        """
+        Sample moment conditions Z'(y - X coefs) of every replication.
+
+        Args:
+            equations: Equation builder (_ab_equations or _system_equations)
+            coefs: Coefficients of the regressors (L.y, and _cons for SYS)
+
+        Returns:
+            (reps, n_instruments) array, summed over individuals
+        """
+        moments = self.moments(equations)
+        return moments['Zy'] - moments['ZX'] @ np.asarray(coefs, dtype=float)
+
+    def arellano_bond_conditions(self, rho):
+        """AB moment conditions at the coefficient rho (see moment_conditions())."""
+        return self.moment_conditions(_ab_equations, [rho])
+
+    def system_gmm_conditions(self, rho, constant):
+        """SYS moment conditions at the coefficients rho and _cons (see moment_conditions())."""
+        return self.moment_conditions(_system_equations, [rho, constant])
+
+    def arellano_bond(self):
+        """AB coefficients and standard errors (see arellano_bond())."""
+        coefs, ses = _one_step(self.moments(_ab_equations))
+        return coefs[:, 0], ses[:, 0]
+
+    def system_gmm(self):
+        """SYS coefficients and standard errors for L.y (see system_gmm())."""
+        coefs, ses = _one_step(self.moments(_system_equations))
+        return coefs[:, 0], ses[:, 0]
+
+
+def arellano_bond(y, mask=None):
+    """
+    Arellano-Bond difference GMM for all replications at once.
+
+    Equivalent to: xtabond2 y L.y, gmm(L.y, collapse) nolevel
+    (see _ab_equations()).
+
+    Args:
+        y: Outcome array (reps, N, T) after dropping burn-in, NaN if unobserved
+        mask: Optional boolean selection array (d == 1)
+
+    Returns:
+        Tuple (AB_coefs, AB_ses), each of shape (reps,)
+    """
+    moments = PatternMoments(y.shape[0], y.shape[-1])
+    moments.add(y, mask)
+    return moments.arellano_bond()
+
+
+def system_gmm(y, mask=None):
+    """
+    Blundell-Bond system GMM for all replications at once.
+
+    Equivalent to: xtabond2 y L.y, gmm(L.y, lag(2 .)) iv(L.D.y, equation(level))
+    (see _system_equations()). Missing values in the GMM-style instruments are
+    zeros, so the unbalanced panels are handled through masks over the fixed
+    (N, T) layout.
+
+    Args:
+        y: Outcome array (reps, N, T) after dropping burn-in, NaN if unobserved
+        mask: Optional boolean selection array (d == 1)
+
+    Returns:
+        Tuple (SYS_coefs, SYS_ses), each of shape (reps,), for L.y
+    """
+    moments = PatternMoments(y.shape[0], y.shape[-1])
+    moments.add(y, mask)
+    return moments.system_gmm()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Sweep Hotspot Report for Al Sadoon et al. (2019) Replication
+============================================================
+
+Ranks where the time of a sweep goes, from the telemetry that simulate.py
+stores with every cell (see telemetry.py): the most expensive cells with their
+time per replication, phase split (DGP, moments, AB, SYS), peak memory and
+estimation failures; the total time by design, N and model; and the share of
+each phase. Cells run by Stata have no telemetry and are skipped.
+
+Usage:
+    python hotspots.py [--top 15] [--store output/results.sqlite]
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import argparse
+from collections import defaultdict
+
+import results_store
+from telemetry import PHASES
+
+# (experiment, selection) -> file name prefix
+PREFIX_OF = {key: prefix for prefix, key in results_store.PREFIXES.items()}
+
+
+def cell_label(row):
+    """Cell name as in the result file names, e.g. endo_modelA_N500_rho0.25."""
+    prefix = PREFIX_OF.get((row['experiment'], row['selection']), row['selection'])
+    return f"{prefix}_model{row['model']}_N{row['N']}_rho{row['rho']:.2f}"
+
+
+def timed_cells(rows):
+    """Rows that carry telemetry."""
+    return [row for row in rows if row['wall_seconds'] is not None]
+
+
+def failures(row, estimator):
+    """
+    Failure counts of one estimator in a cell.
+
+    Returns:
+        Tuple (not converged, converged but invalid), or (None, None) without telemetry
+    """
+    converged = row[f"{estimator}_converged"]
+    if converged is None or row['reps'] is None:
+        return None, None
+    return row['reps'] - converged, converged - (row[f"{estimator}_valid"] or 0)
+
+
+def totals_by(rows, key):
+    """
+    Total wall time grouped by a function of the row.
+
+    Returns:
+        List of (group, seconds, cells), most expensive first
+    """
+    seconds = defaultdict(float)
+    cells = defaultdict(int)
+    for row in rows:
+        seconds[key(row)] += row['wall_seconds']
+        cells[key(row)] += 1
+    return sorted(((group, seconds[group], cells[group]) for group in seconds), key=lambda item: -item[1])
+
+
+def print_report(rows, top=15):
+    """
+    Print the hotspot report.
+
+    Args:
+        rows: Results store rows
+        top: Number of cells to list
+    """
+    cells = timed_cells(rows)
+    print("=" * 100)
+    print("SWEEP HOTSPOTS")
+    print("=" * 100)
+    if not cells:
+        print("No cells with telemetry in the store (run cells with simulate.py or sweep.py --engine python)")
+        print("=" * 100)
+        return
+
+    total = sum(row['wall_seconds'] for row in cells)
+    print(f"{len(cells)} cells with telemetry, {total:.1f}s ({total / 3600:.2f} hours) in total")
+    phase_totals = {name: sum(row[f"{name}_seconds"] or 0.0 for row in cells) for name in PHASES}
+    print("Phases: " + ", ".join(f"{name} {seconds / total:.0%}" for name, seconds in phase_totals.items()))
+    print()
+
+    print(f"Most expensive cells (top {top}):")
+    print(f"{'cell':<34} {'wall':>9} {'share':>6} {'reps':>6} {'s/rep':>8} "
+          + "".join(f"{name:>8}" for name in PHASES) + f" {'RSS MB':>7} {'AB fail':>8} {'SYS fail':>8}")
+    for row in sorted(cells, key=lambda row: -row['wall_seconds'])[:top]:
+        phases = "".join(f"{(row[f'{name}_seconds'] or 0.0) / row['wall_seconds']:>8.0%}" for name in PHASES)
+        rss = f"{row['peak_rss_mb']:>7.0f}" if row['peak_rss_mb'] is not None else f"{'-':>7}"
+        counts = []
+        for estimator in ['AB', 'SYS']:
+            failed, invalid = failures(row, estimator)
+            counts.append(f"{'-' if failed is None else f'{failed}+{invalid}':>8}")
+        print(f"{cell_label(row):<34} {row['wall_seconds']:>8.1f}s {row['wall_seconds'] / total:>6.1%} "
+              f"{row['reps']:>6} {row['seconds_per_rep']:>8.4f} {phases} {rss} {' '.join(counts)}")
+    print("  (fail = not converged + converged but invalid)")
+
+    for title, key in [("design", lambda row: PREFIX_OF.get((row['experiment'], row['selection']))),
+                       ("N", lambda row: row['N']),
+                       ("model", lambda row: row['model'])]:
+        print()
+        print(f"Time by {title}:")
+        for group, seconds, count in totals_by(cells, key):
+            print(f"  {str(group):<12} {seconds:>10.1f}s {seconds / total:>6.1%}  ({count} cells)")
+    print("=" * 100)
+
+
+def main(argv=None):
+    """Main function to print the hotspot report."""
+    parser = argparse.ArgumentParser(description="Rank where the time of a sweep goes.")
+    parser.add_argument('--top', type=int, default=15, help="number of cells to list")
+    parser.add_argument('--store', default=results_store.STORE_PATH)
+    args = parser.parse_args(argv)
+
+    conn = results_store.connect(args.store)
+    rows = results_store.query_results(conn, engine='python')
+    conn.close()
+    print_report(rows, args.top)
+
+
+if __name__ == "__main__":
+    main()
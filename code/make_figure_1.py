@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Figure 1 Generator for Al Sadoon et al. (2019) Replication
+==========================================================
+
+Python counterpart of fig1.R: writes the three Figure 1 panels (mean bias of
+AB and System GMM against N, Model A, with and without endogenous selection)
+as pgfplots axes with inline coordinate tables, instead of rendering them
+through R's TikZ graphics device. Each panel reads only its own cells from
+the results store (one filtered query on the key columns), so a refresh takes
+milliseconds and needs no R toolchain. The paper preamble already loads
+pgfplots.
+
+Usage:
+    python make_figure_1.py          # all three panels
+    python make_figure_1.py 1 3      # only panels 1 and 3
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import argparse
+import math
+import os
+import time
+
+import results_store
+
+FIGURE_OUTPUT_DIR = "output/fig1"
+
+# Sample sizes plotted in Figure 1
+FIGURE1_N = [200, 400, 600, 800, 1000, 1500, 2000, 2500, 3000, 3500, 4000, 4500, 5000]
+
+# Panel number -> (rho, output file)
+PANELS = {
+    1: (0.25, "panel1_bias_rho025.tex"),
+    2: (0.50, "panel2_bias_rho050.tex"),
+    3: (0.75, "panel3_bias_rho075.tex"),
+}
+
+# Series in legend order: (label, store selection, bias column, color, mark), as in fig1.R
+SERIES = [
+    ("AB (all)", 'full_sample', 'AB_bias', "2166AC", "*"),
+    ("AB (select)", 'endogenous', 'AB_bias', "5AAE61", "triangle*"),
+    ("System (all)", 'full_sample', 'SYS_bias', "D73027", "diamond*"),
+    ("System (select)", 'endogenous', 'SYS_bias', "FC8D59", "square*"),
+]
+
+
+def panel_filters(rho):
+    """Results store filter of the cells of one panel."""
+    return {'experiment': 0, 'selection': ['endogenous', 'full_sample'], 'model': 'A', 'N': FIGURE1_N, 'rho': rho}
+
+
+def select_series(rows):
+    """
+    Arrange the cells of one panel into its plotted series.
+
+    Args:
+        rows: Results store rows of the panel (see panel_filters())
+
+    Returns:
+        Dictionary mapping series label to its list of (N, bias), sorted by N;
+        missing biases are left out
+    """
+    series = {label: [] for label, _, _, _, _ in SERIES}
+    for row in rows:
+        for label, selection, column, _, _ in SERIES:
+            bias = row[column]
+            if row['selection'] == selection and bias is not None and not math.isnan(bias):
+                series[label].append((row['N'], bias))
+    for points in series.values():
+        points.sort()
+    return series
+
+
+def generate_pgfplots_panel(series, output_path):
+    """
+    Write one panel as a pgfplots axis.
+
+    Args:
+        series: Dictionary returned by select_series()
+        output_path: Path of the .tex file
+
+    Returns:
+        The output path
+    """
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    lines = ["% Generated by make_figure_1.py", "\\begin{tikzpicture}"]
+    for index, (_, _, _, color, _) in enumerate(SERIES):
+        lines.append(f"\\definecolor{{figoneseries{'abcd'[index]}}}{{HTML}}{{{color}}}")
+    lines += [
+        "\\begin{axis}[",
+        "  width=6in, height=4in,",
+        "  xmin=0, xmax=5000, xtick={0,1000,2000,3000,4000,5000}, scaled x ticks=false,",
+        "  xlabel={$N$}, scaled y ticks=false,",
+        "  y tick label style={/pgf/number format/fixed},",
+        "  grid=major, major grid style={gray!15}, axis line style={draw=none}, tick style={draw=none},",
+        "  legend columns=4, legend style={at={(0.5,-0.18)}, anchor=north, draw=none,",
+        "    /tikz/every even column/.append style={column sep=6pt}},",
+        "]",
+    ]
+    for index, (label, _, _, _, mark) in enumerate(SERIES):
+        points = series.get(label, [])
+        if not points:
+            continue
+        table = "\\\\ ".join(f"{N} {bias:.6g}" for N, bias in points)
+        lines.append(f"\\addplot[color=figoneseries{'abcd'[index]}, mark={mark}, mark size=2pt, line width=0.8pt] "
+                     f"table[row sep=\\\\] {{N bias\\\\ {table}\\\\}};")
+        lines.append(f"\\addlegendentry{{{label}}}")
+    lines += ["\\end{axis}", "\\end{tikzpicture}"]
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return output_path
+
+
+def build_panels(conn, panels=tuple(PANELS)):
+    """
+    Render Figure 1 panels from the results store.
+
+    Args:
+        conn: Store connection
+        panels: Panel numbers to render
+
+    Returns:
+        List of the output file paths
+    """
+    outputs = []
+    for panel in panels:
+        rho, filename = PANELS[panel]
+        rows = results_store.query_results(conn, **panel_filters(rho))
+        outputs.append(generate_pgfplots_panel(select_series(rows), os.path.join(FIGURE_OUTPUT_DIR, filename)))
+    return outputs
+
+
+def main(argv=None):
+    """Main function to generate the Figure 1 panels."""
+    parser = argparse.ArgumentParser(description="Generate the Figure 1 panels as pgfplots axes.")
+    parser.add_argument('panels', nargs='*', type=int, help="panels to render, 1-3 (default: all)")
+    args = parser.parse_args(argv)
+    if any(panel not in PANELS for panel in args.panels):
+        parser.error(f"panels must be among {sorted(PANELS)}")
+    start = time.perf_counter()
+
+    conn = results_store.connect()
+    outputs = build_panels(conn, args.panels or tuple(PANELS))
+    conn.close()
+
+    for output_path in outputs:
+        print(f"✓ {output_path}")
+    print(f"Built {len(outputs)} panels in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
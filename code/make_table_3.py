@@ -7,215 +7,63 @@ Author: Felipe I. Tappata
 Date: July 2025
 """
 
-import pandas as pd
+import argparse
 import os
-import glob
-import re
-from pathlib import Path
+
+import results_store
+from table_format import format_mc_error, format_number_enhanced, is_missing
 
 # Configuration - Modified for Table 3 (N = 5000)
-PARTIAL_OUTPUT_DIR = "output/partial_tab3"  # Updated to use partial_tab3 for N = 5000
 TABLE_OUTPUT_DIR = "output/tables"
 TABLE_OUTPUT_FILE = "table3.tex"  # Changed from table2.tex to table3.tex
 
-def find_first_significant_decimal(value):
+def select_results(index):
     """
-    Find the position of the first significant (non-zero) digit after the decimal point.
+    Pick the N = 5000 experiment cells out of the results index.
     
     Args:
-        value: Numeric value
+        index: Dictionary returned by results_store.load_index()
     
     Returns:
-        Position of first significant digit (1-indexed), or None if no significant decimals
-    """
-    if pd.isna(value) or value == 0:
-        return None
-    
-    # Get the decimal part
-    decimal_part = abs(value) % 1
-    if decimal_part == 0:
-        return None
-    
-    # Convert to string and find first non-zero digit after decimal
-    decimal_str = f"{decimal_part:.10f}"  # Use more precision to be safe
-    decimal_str = decimal_str[2:]  # Remove "0."
-    
-    for i, digit in enumerate(decimal_str):
-        if digit != '0':
-            return i + 1  # 1-indexed position
-    
-    return None
-
-def format_number_enhanced(value, underline_significant=True, use_decimal_alignment=True):
-    """
-    Enhanced number formatting with optional underlining of first significant decimal
-    and support for decimal alignment with proper centering.
-    
-    Args:
-        value: Numeric value to format
-        underline_significant: Whether to underline the first significant decimal
-        use_decimal_alignment: Whether to format for decimal alignment (plain text vs math mode)
-    
-    Returns:
-        Formatted string for LaTeX
-    """
-    if pd.isna(value):
-        return "---"
-    
-    # Handle zero
-    if value == 0:
-        if use_decimal_alignment:
-            return "$\\phantom{-}0.00000$"
-        else:
-            return "$0.00000$"
-    
-    # Check if we need scientific notation
-    if abs(value) < 1e-5 and abs(value) > 0:
-        # Use scientific notation
-        formatted = f"{value:.2e}"
-        if "e" in formatted:
-            base, exp = formatted.split("e")
-            exp = int(exp)
-            if base.startswith('-'):
-                base = f"-{base[1:]}"
-            if use_decimal_alignment:
-                return f"${base} \\times 10^{{{exp}}}$"  # Fixed: restored \times in math mode
-            else:
-                return f"${base} \\times 10^{{{exp}}}$"
-    
-    # Regular formatting with 5 decimal places
-    formatted = f"{value:.5f}"
-    
-    if underline_significant:
-        # Find the first significant decimal
-        sig_pos = find_first_significant_decimal(value)
-        if sig_pos is not None:
-            # Split the formatted number
-            if '.' in formatted:
-                integer_part, decimal_part = formatted.split('.')
-                if sig_pos <= len(decimal_part):
-                    # Underline the significant digit
-                    sig_digit = decimal_part[sig_pos-1]
-                    new_decimal = (decimal_part[:sig_pos-1] + 
-                                 f"\\underline{{{sig_digit}}}" + 
-                                 decimal_part[sig_pos:])
-                    formatted = f"{integer_part}.{new_decimal}"
-    
-    if use_decimal_alignment:
-        # For decimal alignment with proper centering, pad positive numbers with phantom minus
-        # Always wrap in math mode for proper formatting
-        if not formatted.startswith('-'):
-            # Add phantom minus sign for alignment
-            formatted = f"$\\phantom{{-}}{formatted}$"
-        else:
-            formatted = f"${formatted}$"
-        return formatted
-    else:
-        # Handle negative signs properly for LaTeX math mode  
-        if formatted.startswith('-'):
-            # For negative numbers, remove leading zero after minus sign
-            if formatted.startswith('-0.'):
-                formatted = f"-{formatted[2:]}"  # Remove the '0' after '-'
-            return f"${formatted}$"
-        else:
-            # For positive numbers less than 1, remove leading zero
-            if formatted.startswith('0.'):
-                formatted = formatted[1:]  # Remove leading '0'
-            return f"${formatted}$"
-
-def format_number(value):
+        Dictionary with results organized by (experiment, model, rho)
     """
-    Original format function for backward compatibility.
-    Shows 5 decimal places. Uses format similar to stata output:
-    - Negative: -.00351 (no leading zero)
-    - Positive < 1: .13394 (no leading zero) 
-    - Positive >= 1: 1.13394 (with leading digit)
+    results = {}
     
-    Args:
-        value: Numeric value to format
+    for (experiment, selection, model, N, rho), row in index.items():
+        if experiment not in (1, 2, 3, 4, 5) or N != 5000:
+            continue
+        # Store results - key is (experiment, model, rho)
+        key = (experiment, model, rho)
+        results[key] = {
+            'ab_bias': row['AB_bias'],
+            'ab_se': row['AB_se'],
+            'sys_bias': row['SYS_bias'],
+            'sys_se': row['SYS_se'],
+            'ab_valid': row['AB_valid'],
+            'sys_valid': row['SYS_valid'],
+            'ab_mcse': row['AB_mcse'],
+            'sys_mcse': row['SYS_mcse'],
+            'n_value': N
+        }
     
-    Returns:
-        Formatted string for LaTeX
-    """
-    return format_number_enhanced(value, underline_significant=False, use_decimal_alignment=False)
+    return results
 
 def read_simulation_results():
     """
-    Read all experiment CSV files and organize them into a structured format.
-    Filters for N = 5000 results only.
+    Read the N = 5000 experiment results from the results store and organize
+    them into a structured format.
     
     Returns:
         Dictionary with results organized by (experiment, model, rho)
     """
-    results = {}
-    
-    # Pattern to match our CSV files
-    pattern = os.path.join(PARTIAL_OUTPUT_DIR, "*.csv")
-    csv_files = glob.glob(pattern)
-    
-    print(f"Found {len(csv_files)} CSV files in {PARTIAL_OUTPUT_DIR}")
-    
-    for file_path in csv_files:
-        filename = os.path.basename(file_path)
-        print(f"Processing: {filename}")
-        
-        # Parse filename to extract parameters
-        # Expected format: exp{1-5}_model{A|B}_N{N}_rho{rho}.csv or endo_model{A}_N{N}_rho{rho}.csv
-        try:
-            parts = filename.replace('.csv', '').split('_')
-            
-            # Handle both naming conventions
-            if filename.startswith('exp'):
-                experiment = int(parts[0].replace('exp', ''))  # 1-5
-                model = parts[1].replace('model', '')  # A or B
-                n_value = int(parts[2].replace('N', ''))
-                rho_value = float(parts[3].replace('rho', ''))
-            elif filename.startswith('endo_model'):
-                # This is the basic endogenous experiment (experiment 1 equivalent)
-                experiment = 1
-                model = parts[1].replace('model', '')  # A or B
-                n_value = int(parts[2].replace('N', ''))
-                rho_value = float(parts[3].replace('rho', ''))
-            else:
-                print(f"  -> Skipping unknown format: {filename}")
-                continue
-            
-            # Only process N = 5000 files for Table 3
-            if n_value != 5000:
-                print(f"  -> Skipping N={n_value} (Table 3 is for N=5000)")
-                continue
-            
-            # Read the CSV file
-            df = pd.read_csv(file_path)
-            
-            # Extract the results we need
-            if len(df) > 0:
-                # Get the first (and likely only) row of results
-                row = df.iloc[0]
-                
-                # Store results - key is (experiment, model, rho)
-                key = (experiment, model, rho_value)
-                results[key] = {
-                    'ab_bias': row.get('AB_bias', pd.NA),
-                    'ab_se': row.get('AB_se', pd.NA),
-                    'sys_bias': row.get('SYS_bias', pd.NA),
-                    'sys_se': row.get('SYS_se', pd.NA),
-                    'ab_valid': row.get('AB_valid', pd.NA),
-                    'sys_valid': row.get('SYS_valid', pd.NA),
-                    'n_value': n_value
-                }
-                
-                print(f"  -> Experiment {experiment}, Model {model}, ρ={rho_value}, N={n_value}")
-                if not pd.isna(row.get('AB_bias')):
-                    print(f"     AB bias: {row.get('AB_bias'):.6f}, SYS bias: {row.get('SYS_bias'):.6f}")
-            
-        except Exception as e:
-            print(f"  -> Error parsing {filename}: {e}")
-            continue
+    conn = results_store.connect()
+    index = results_store.load_index(conn)
+    conn.close()
     
-    return results
+    print(f"Loaded {len(index)} cells from {results_store.STORE_PATH}")
+    return select_results(index)
 
-def generate_latex_table(results, output_path="output/tables/table3.tex"):
+def generate_latex_table(results, output_path="output/tables/table3.tex", show_mc_error=False):
     """
     Generate the LaTeX tabular environment replicating Table 3 from Al Sadoon et al. (2019).
     Uses decimal alignment and underlining of first significant decimal.
@@ -224,6 +72,7 @@ def generate_latex_table(results, output_path="output/tables/table3.tex"):
     Args:
         results: Dictionary with simulation results
         output_path: Path where to save the LaTeX table
+        show_mc_error: Show the Monte Carlo standard error after each bias
     """
     
     # Create output directory if it doesn't exist
@@ -267,8 +116,11 @@ def generate_latex_table(results, output_path="output/tables/table3.tex"):
                     
                     if key in results:
                         result = results[key]
-                        ab_bias = format_number_enhanced(result['ab_bias'], underline_significant=True, use_decimal_alignment=True)
-                        sys_bias = format_number_enhanced(result['sys_bias'], underline_significant=True, use_decimal_alignment=True)
+                        ab_bias = format_number_enhanced(result['ab_bias'], underline_significant=True, use_centered_alignment=True)
+                        sys_bias = format_number_enhanced(result['sys_bias'], underline_significant=True, use_centered_alignment=True)
+                        if show_mc_error:
+                            ab_bias += format_mc_error(result['ab_mcse'])
+                            sys_bias += format_mc_error(result['sys_mcse'])
                     else:
                         ab_bias = "---"
                         sys_bias = "---"
@@ -284,8 +136,8 @@ def generate_latex_table(results, output_path="output/tables/table3.tex"):
                     
                     if key in results:
                         result = results[key]
-                        ab_se = format_number_enhanced(result['ab_se'], underline_significant=True, use_decimal_alignment=True)
-                        sys_se = format_number_enhanced(result['sys_se'], underline_significant=True, use_decimal_alignment=True)
+                        ab_se = format_number_enhanced(result['ab_se'], underline_significant=True, use_centered_alignment=True)
+                        sys_se = format_number_enhanced(result['sys_se'], underline_significant=True, use_centered_alignment=True)
                     else:
                         ab_se = "---"
                         sys_se = "---"
@@ -301,10 +153,18 @@ def generate_latex_table(results, output_path="output/tables/table3.tex"):
         f.write("\\bottomrule\n")
         f.write("\\end{tabular}\n")
 
-def main():
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Generate the LaTeX table.")
+    parser.add_argument('--mc-error', action='store_true',
+                        help="show the Monte Carlo standard error after each bias")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """
     Main function to coordinate the table generation process.
     """
+    args = parse_args(argv)
     print("=" * 70)
     print("Table 3 Generator for Al Sadoon et al. (2019) Replication")
     print("=" * 70)
@@ -320,7 +180,7 @@ def main():
     # Generate LaTeX table
     output_path = os.path.join(TABLE_OUTPUT_DIR, TABLE_OUTPUT_FILE)
     print(f"Generating LaTeX table: {output_path}")
-    generate_latex_table(results, output_path)
+    generate_latex_table(results, output_path, show_mc_error=args.mc_error)
     
     # Check for missing combinations
     print("\nChecking for missing combinations...")
@@ -337,7 +197,7 @@ def main():
         for model in models:
             for rho in rho_values:
                 key = (exp, model, rho)
-                if key in results and not pd.isna(results[key].get('ab_bias', pd.NA)):
+                if key in results and not is_missing(results[key].get('ab_bias', None)):
                     available += 1
                 else:
                     print(f"Missing: Experiment {exp} model {model}, rho={rho}")
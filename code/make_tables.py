@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Build All Tables for Al Sadoon et al. (2019) Replication
+========================================================
+
+Renders table1.tex, table2.tex and table3.tex in one pass: the results store
+is read once into an in-memory index keyed by (experiment, selection, model,
+N, rho), and each table picks its cells from that index. Meant to be rerun on
+every sweep tick, so it only imports the standard library.
+
+Usage:
+    python make_tables.py [--mc-error]
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import argparse
+import os
+import time
+
+import make_table_1
+import make_table_2
+import make_table_3
+import results_store
+
+# Table generator modules, in output order
+TABLE_MODULES = [make_table_1, make_table_2, make_table_3]
+
+
+def build_all(index, show_mc_error=False):
+    """
+    Render every table from one results index.
+
+    Args:
+        index: Dictionary returned by results_store.load_index()
+        show_mc_error: Show the Monte Carlo standard error after each bias
+
+    Returns:
+        List of the output file paths
+    """
+    outputs = []
+    for module in TABLE_MODULES:
+        output_path = os.path.join(module.TABLE_OUTPUT_DIR, module.TABLE_OUTPUT_FILE)
+        module.generate_latex_table(module.select_results(index), output_path, show_mc_error)
+        outputs.append(output_path)
+    return outputs
+
+
+def main(argv=None):
+    """Main function to generate all tables."""
+    parser = argparse.ArgumentParser(description="Generate all LaTeX tables from one results load.")
+    parser.add_argument('--mc-error', action='store_true',
+                        help="show the Monte Carlo standard error after each bias")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+
+    conn = results_store.connect()
+    index = results_store.load_index(conn)
+    conn.close()
+
+    outputs = build_all(index, args.mc_error)
+
+    print(f"Loaded {len(index)} cells from {results_store.STORE_PATH}")
+    for output_path in outputs:
+        print(f"✓ {output_path}")
+    print(f"Built {len(outputs)} tables in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
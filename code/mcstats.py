@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Streaming Monte Carlo Statistics for Al Sadoon et al. (2019) Replication
+========================================================================
+
+Summary statistics of the replications of one estimator, accumulated batch by
+batch instead of keeping every coefficient until the end of the cell. Each
+batch is reduced to (count, mean, sums of squared, cubed and fourth-power
+deviations) and merged into the running totals with the pairwise update of
+Chan, Golub and LeVeque (extended to the higher moments by Pebay), which is
+numerically stable and needs constant memory whatever the number of
+replications.
+
+From the running totals the cell reports, like the .do files, the bias and
+the standard deviation of the valid replications, plus the root mean squared
+error and the Monte Carlo standard error of the bias (sd / sqrt(n)), the
+kurtosis (for the Monte Carlo error of the sd itself, which depends on the
+tails of the estimates), and the number of replications where the estimation
+converged (ab_converged and sys_converged in the .do files).
+
+UnitStats does the same for replications drawn in dependent units
+(antithetic pairs, Latin hypercube blocks) and with control variates, where
+the Monte Carlo error has to come from the independent unit means.
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import math
+
+import numpy as np
+
+# Minimum number of valid replications to report a bias (as in the .do files)
+MIN_VALID = 10
+
+
+class RunningStats:
+    """
+    Running count, mean and sums of powers of deviations of the valid coefficients.
+
+    A replication has converged when the estimation produced a coefficient,
+    and is valid when its coefficient and standard error are non-missing and
+    the standard error is positive.
+
+    Args:
+        n: Number of valid replications so far
+        mean: Mean of the valid coefficients so far
+        m2: Sum of squared deviations from the mean so far
+        reps: Number of replications so far, valid or not
+        converged: Number of converged replications so far
+        m3: Sum of cubed deviations from the mean so far
+        m4: Sum of fourth powers of the deviations from the mean so far
+    """
+
+    def __init__(self, n=0, mean=0.0, m2=0.0, reps=0, converged=0, m3=0.0, m4=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.reps = reps
+        self.converged = converged
+        self.m3 = m3
+        self.m4 = m4
+
+    def update(self, coefs, ses):
+        """
+        Add one batch of replications.
+
+        Args:
+            coefs: Coefficients of the batch
+            ses: Standard errors of the batch
+        """
+        self.reps += len(coefs)
+        self.converged += int(np.count_nonzero(np.isfinite(coefs)))
+        valid = np.isfinite(coefs) & np.isfinite(ses) & (ses > 0)
+        values = coefs[valid]
+        n_batch = len(values)
+        if n_batch == 0:
+            return
+        mean_batch = float(values.mean())
+        deviations = values - mean_batch
+        squares = deviations * deviations
+        self._combine(n_batch, mean_batch, float(squares.sum()), float((squares * deviations).sum()),
+                      float((squares * squares).sum()))
+
+    def _combine(self, n_other, mean_other, m2_other, m3_other, m4_other):
+        n_self = self.n
+        n = n_self + n_other
+        delta = mean_other - self.mean
+        delta_n = delta / n
+        cross = delta * delta * n_self * n_other / n
+        self.mean += delta * n_other / n
+        self.m4 += (m4_other + cross * delta_n * delta_n * (n_self * n_self - n_self * n_other + n_other * n_other)
+                    + 6 * delta_n * delta_n * (n_self * n_self * m2_other + n_other * n_other * self.m2)
+                    + 4 * delta_n * (n_self * m3_other - n_other * self.m3))
+        self.m3 += (m3_other + cross * delta_n * (n_self - n_other)
+                    + 3 * delta_n * (n_self * m2_other - n_other * self.m2))
+        self.m2 += m2_other + cross
+        self.n = n
+
+    def merge(self, other):
+        """
+        Add the replications summarized by another RunningStats.
+
+        Merging the same sequence of summaries in the same order always gives
+        the same result, bit for bit.
+
+        Args:
+            other: RunningStats of later replications
+        """
+        self.reps += other.reps
+        self.converged += other.converged
+        if other.n > 0:
+            self._combine(other.n, other.mean, other.m2, other.m3, other.m4)
+
+    def summary(self, rho):
+        """
+        Summary statistics of the replications so far.
+
+        Bias and the other statistics are only reported with at least
+        MIN_VALID valid replications (NaN otherwise).
+
+        Args:
+            rho: True autoregressive parameter
+
+        Returns:
+            Dictionary with bias, sd, rmse, mcse (Monte Carlo standard error of
+            the bias), kurtosis (n m4 / m2^2, 3 for normal estimates), valid
+            (number of valid replications), reps (number of replications) and
+            converged (number of converged replications)
+        """
+        if self.n < MIN_VALID:
+            return {'bias': np.nan, 'sd': np.nan, 'rmse': np.nan, 'mcse': np.nan, 'kurtosis': np.nan,
+                    'valid': self.n, 'reps': self.reps, 'converged': self.converged}
+        bias = self.mean - rho
+        sd = math.sqrt(self.m2 / (self.n - 1))
+        return {
+            'bias': bias,
+            'sd': sd,
+            'rmse': math.sqrt(self.m2 / self.n + bias * bias),
+            'mcse': sd / math.sqrt(self.n),
+            'kurtosis': self.n * self.m4 / (self.m2 * self.m2) if self.m2 > 0 else np.nan,
+            'valid': self.n,
+            'reps': self.reps,
+            'converged': self.converged,
+        }
+
+    def state(self):
+        """Running totals as a JSON-safe list (for checkpoints)."""
+        return [self.n, self.mean, self.m2, self.reps, self.converged, self.m3, self.m4]
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild the running totals saved with state() (converged, m3 and m4 are 0 in older states)."""
+        return cls(*state)
+
+
+class UnitStats(RunningStats):
+    """
+    Running statistics of replications drawn in dependent units, optionally
+    with control variates.
+
+    With antithetic pairs or Latin hypercube blocks (dgp.SAMPLING_UNITS) only
+    the means of the units of `size` replications are independent, so the
+    bias and its Monte Carlo standard error come from the unit means (units
+    of one replication for independent draws). With controls (statistics of
+    each replication with known mean zero), the bias is corrected by the
+    regression of the unit means on the unit means of the controls, and the
+    Monte Carlo standard error is that of the regression residuals, inflated
+    by (n - 2) / (n - k - 2) for the estimated coefficients of the k controls
+    over n units (Lavenberg and Welch).
+
+    The summary adds the variance reduction factor vrf, the variance of the
+    mean of as many independent replications (sd^2 / valid) over the variance
+    of the reported bias: one replication is worth vrf independent ones.
+    Units with an invalid replication are left out of the bias and its error.
+
+    Args:
+        size: Replications per unit
+    """
+
+    def __init__(self, size=1):
+        super().__init__()
+        self.size = size
+        self.units = 0
+        self.unit_mean = None
+        self.unit_m2 = None
+
+    def update(self, coefs, ses, controls=None):
+        """
+        Add one batch of whole units of replications.
+
+        Args:
+            coefs: Coefficients of the batch
+            ses: Standard errors of the batch
+            controls: Optional (replications, k) array of zero-mean controls
+        """
+        super().update(coefs, ses)
+        n_units = len(coefs) // self.size
+        if n_units * self.size != len(coefs):
+            raise ValueError(f"Batches must hold whole units of {self.size} replications")
+        valid = (np.isfinite(coefs) & np.isfinite(ses) & (ses > 0)).reshape(n_units, self.size).all(axis=1)
+        columns = [coefs.reshape(n_units, self.size)]
+        if controls is not None:
+            columns += list(np.moveaxis(controls.reshape(n_units, self.size, -1), -1, 0))
+        values = np.stack([column.mean(axis=1) for column in columns], axis=1)[valid]
+        n_batch = len(values)
+        if n_batch == 0:
+            return
+        mean_batch = values.mean(axis=0)
+        deviations = values - mean_batch
+        m2_batch = deviations.T @ deviations
+        if self.units == 0:
+            self.units, self.unit_mean, self.unit_m2 = n_batch, mean_batch, m2_batch
+            return
+        n = self.units + n_batch
+        delta = mean_batch - self.unit_mean
+        self.unit_mean = self.unit_mean + delta * n_batch / n
+        self.unit_m2 = self.unit_m2 + m2_batch + np.outer(delta, delta) * self.units * n_batch / n
+        self.units = n
+
+    def summary(self, rho):
+        """
+        Summary statistics of the replications so far (see RunningStats.summary()).
+
+        Returns:
+            Dictionary of RunningStats.summary() with bias, mcse and rmse from
+            the units (and controls), plus vrf and units
+        """
+        summary = super().summary(rho)
+        summary.update({'vrf': np.nan, 'units': self.units})
+        k = 0 if self.unit_mean is None else len(self.unit_mean) - 1
+        if self.units - k - 2 < MIN_VALID or np.isnan(summary['bias']):
+            summary.update({'bias': np.nan, 'mcse': np.nan, 'rmse': np.nan})
+            return summary
+        mean = self.unit_mean[0]
+        residual = self.unit_m2[0, 0]
+        if k:
+            beta = np.linalg.lstsq(self.unit_m2[1:, 1:], self.unit_m2[1:, 0], rcond=None)[0]
+            mean -= beta @ self.unit_mean[1:]
+            residual -= beta @ self.unit_m2[1:, 0]
+        variance = max(residual, 0.0) / (self.units - k - 1) / self.units
+        if k:
+            variance *= (self.units - 2) / (self.units - k - 2)
+        bias = float(mean - rho)
+        summary.update({
+            'bias': bias,
+            'mcse': math.sqrt(variance),
+            'rmse': math.sqrt(self.m2 / self.n + bias * bias),
+            'vrf': summary['sd'] ** 2 / self.n / variance if variance > 0 else np.inf,
+        })
+        return summary
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Sweep Progress Monitor for Al Sadoon et al. (2019) Replication
+==============================================================
+
+Aggregates the progress events of a running sweep (see progress.py) into a
+live view: per running cell the replications done, replications per second
+and ETA; for the whole sweep the share of the cost done, the current
+throughput (in units of sweep.cell_cost() per second, so cells of different
+N and T are comparable) and the ETA of the remaining cost.
+
+Stragglers are flagged while there is still time to rebalance or kill them:
+
+    SLOW     the cell's throughput per unit of cost is more than SLOW_FACTOR
+             times below the median of the sweep's cells
+    STALLED  no event from the cell for --stall seconds
+
+Only the events of the last sweep in the file are shown. Without a sweep
+event (cells run directly with simulate.py --progress), the cost of a cell is
+its number of replications.
+
+Usage:
+    python monitor.py [--follow [--interval 5]] [--progress output/progress.jsonl] [--all]
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import progress
+
+# Throughput per unit of cost below the median by this factor counts as slow
+SLOW_FACTOR = 2.0
+
+# Seconds without an event after which a running cell counts as stalled
+STALL_SECONDS = 600
+
+STATUS_ORDER = ['running', 'failed', 'queued', 'done']
+
+
+def cell_states(events):
+    """
+    Replay the events of one sweep into the state of every cell.
+
+    Args:
+        events: Events in file order (see progress.current_sweep())
+
+    Returns:
+        Dictionary mapping cell name to a dictionary with status ('queued',
+        'running', 'done' or 'failed'), reps, cost, done, rate (replications
+        per second, None until measured), started and last (event times)
+    """
+    states = {}
+
+    def state(name, reps=None):
+        if name not in states:
+            states[name] = {'status': 'queued', 'reps': reps, 'cost': None, 'done': 0, 'first': 0,
+                            'rate': None, 'started': None, 'last': None, 'code': None}
+        return states[name]
+
+    for event in events:
+        kind = event['event']
+        if kind == 'sweep':
+            for job in event['jobs']:
+                state(job['cell'], job['reps'])['cost'] = job['cost']
+            continue
+        cell = state(event['cell'], event.get('reps'))
+        cell['last'] = event['time']
+        if event.get('reps') is not None:
+            cell['reps'] = event['reps']
+        if kind == 'start':
+            # A worker's own start (with its replications already done) replaces the launch time
+            cell['status'] = 'running'
+            if cell['started'] is None or 'done' in event:
+                cell['started'] = event['time']
+                cell['first'] = cell['done'] = event.get('done', 0)
+        elif kind == 'progress':
+            cell['status'] = 'running'
+            cell['done'] = event['done']
+            if cell['started'] is None:
+                cell['started'] = event['time']
+            seconds = event['time'] - cell['started']
+            cell['rate'] = event.get('rate')
+            if cell['rate'] is None and seconds > 0:
+                cell['rate'] = (cell['done'] - cell['first']) / seconds
+        elif kind == 'done':
+            cell['done'] = event['done']
+            cell['status'] = 'done'
+        elif kind == 'exit':
+            cell['code'] = event['code']
+            cell['status'] = 'done' if event['code'] == 0 else 'failed'
+
+    for cell in states.values():
+        if cell['cost'] is None:
+            cell['cost'] = cell['reps'] or 0
+    return states
+
+
+def cost_rate(cell):
+    """Throughput of a cell in units of cost per second (None until measured)."""
+    if not cell['rate'] or not cell['reps']:
+        return None
+    return cell['rate'] * cell['cost'] / cell['reps']
+
+
+def cost_done(cell):
+    """Cost of the replications of a cell done so far."""
+    if cell['status'] == 'done' or not cell['reps']:
+        return cell['cost'] if cell['status'] == 'done' else 0
+    return cell['cost'] * min(cell['done'], cell['reps']) / cell['reps']
+
+
+def cell_eta(cell):
+    """Seconds until a running cell finishes at its current rate (None until measured)."""
+    if cell['status'] != 'running' or not cell['rate'] or cell['reps'] is None:
+        return None
+    return max(cell['reps'] - cell['done'], 0) / cell['rate']
+
+
+def flag_stragglers(states, now, stall=STALL_SECONDS, slow_factor=SLOW_FACTOR):
+    """
+    Flag slow and stalled running cells.
+
+    Args:
+        states: Dictionary returned by cell_states()
+        now: Current time
+        stall: Seconds without an event after which a cell is stalled
+        slow_factor: Throughput below the median by this factor is slow
+
+    Returns:
+        Dictionary mapping cell name to its flag ('SLOW' or 'STALLED') for flagged cells
+    """
+    rates = [rate for rate in map(cost_rate, states.values()) if rate]
+    median = statistics.median(rates) if rates else None
+    flags = {}
+    for name, cell in states.items():
+        if cell['status'] != 'running':
+            continue
+        if cell['last'] is not None and now - cell['last'] > stall:
+            flags[name] = 'STALLED'
+        elif median and len(rates) > 1 and cost_rate(cell) and cost_rate(cell) * slow_factor < median:
+            flags[name] = 'SLOW'
+    return flags
+
+
+def sweep_summary(states, now):
+    """
+    Whole-sweep progress.
+
+    The ETA is the remaining cost over the current throughput of the running
+    cells (the pool stays full while cells are queued), and at least the ETA
+    of the slowest running cell.
+
+    Returns:
+        Dictionary with counts per status, cost fraction done, throughput (cost
+        per second), ETA in seconds (None until measured) and elapsed seconds
+    """
+    counts = {status: sum(cell['status'] == status for cell in states.values()) for status in STATUS_ORDER}
+    total = sum(cell['cost'] for cell in states.values())
+    done = sum(cost_done(cell) for cell in states.values())
+    remaining = sum(cell['cost'] - cost_done(cell) for cell in states.values() if cell['status'] != 'failed')
+    throughput = sum(cost_rate(cell) or 0.0 for cell in states.values() if cell['status'] == 'running')
+    eta = None
+    if remaining <= 0:
+        eta = 0.0
+    elif throughput > 0:
+        eta = max([remaining / throughput] + [cell_eta(cell) or 0.0 for cell in states.values()])
+    starts = [cell['started'] for cell in states.values() if cell['started'] is not None]
+    return {'counts': counts, 'fraction': done / total if total else 0.0, 'throughput': throughput,
+            'eta': eta, 'elapsed': now - min(starts) if starts else 0.0}
+
+
+def format_seconds(seconds):
+    """Seconds as h:mm:ss ('-' when unknown)."""
+    if seconds is None:
+        return "-"
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def print_status(states, now, show_all=False, stall=STALL_SECONDS):
+    """
+    Print the sweep and per-cell progress.
+
+    Args:
+        states: Dictionary returned by cell_states()
+        now: Current time
+        show_all: Also list queued and finished cells
+        stall: Seconds without an event after which a cell is stalled
+    """
+    summary = sweep_summary(states, now)
+    flags = flag_stragglers(states, now, stall)
+    counts = summary['counts']
+    print("=" * 90)
+    print(f"SWEEP PROGRESS - {time.strftime('%H:%M:%S', time.localtime(now))}")
+    print("=" * 90)
+    print(f"Cells: {counts['done']} done, {counts['running']} running, {counts['queued']} queued, "
+          f"{counts['failed']} failed")
+    print(f"Cost done: {summary['fraction']:.1%}, elapsed {format_seconds(summary['elapsed'])}, "
+          f"throughput {summary['throughput']:,.0f} cost/s, ETA {format_seconds(summary['eta'])}")
+    print()
+    print(f"{'cell':<40} {'status':<8} {'done':>13} {'%':>5} {'reps/s':>8} {'elapsed':>9} {'ETA':>9}  flag")
+
+    listed = [name for name in states if show_all or states[name]['status'] in ('running', 'failed')]
+    listed.sort(key=lambda name: (STATUS_ORDER.index(states[name]['status']), -(cell_eta(states[name]) or 0.0)))
+    for name in listed:
+        cell = states[name]
+        reps = cell['reps'] or 0
+        share = f"{cell['done'] / reps:>5.0%}" if reps else f"{'-':>5}"
+        rate = f"{cell['rate']:>8.2f}" if cell['rate'] else f"{'-':>8}"
+        elapsed = (cell['last'] if cell['status'] in ('done', 'failed') else now) - cell['started'] \
+            if cell['started'] is not None else None
+        status = cell['status'] if cell['code'] in (None, 0) else f"exit {cell['code']}"
+        print(f"{name:<40} {status:<8} {cell['done']:>6}/{reps:<6} {share} {rate} "
+              f"{format_seconds(elapsed):>9} {format_seconds(cell_eta(cell)):>9}  {flags.get(name, '')}")
+    print("=" * 90)
+
+
+def main(argv=None):
+    """Main function to show the progress of a sweep."""
+    parser = argparse.ArgumentParser(description="Show the throughput and ETA of a running sweep.")
+    parser.add_argument('--progress', default=progress.PROGRESS_PATH, help="progress event file")
+    parser.add_argument('--follow', action='store_true', help="refresh until the sweep has finished")
+    parser.add_argument('--interval', type=float, default=5.0, help="refresh interval in seconds (with --follow)")
+    parser.add_argument('--stall', type=float, default=STALL_SECONDS,
+                        help="seconds without an event after which a running cell is flagged")
+    parser.add_argument('--all', action='store_true', help="also list queued and finished cells")
+    args = parser.parse_args(argv)
+
+    while True:
+        states = cell_states(progress.current_sweep(progress.read_events(args.progress)))
+        if args.follow and sys.stdout.isatty():
+            print("\033[2J\033[H", end="")
+        if not states:
+            print(f"No progress events in {args.progress}")
+        else:
+            print_status(states, time.time(), args.all, args.stall)
+        active = any(cell['status'] in ('running', 'queued') for cell in states.values())
+        if not args.follow or (states and not active):
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
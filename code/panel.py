@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Wide Panel Container for Al Sadoon et al. (2019) Replication
+============================================================
+
+The .do files hold each replication in long format (gen long id, gen int t,
+xtset id t) and get L.y, L2.y and D.y through time-series operators. Here a
+panel holds every time-varying variable as a dense (reps, N, T) array and the
+selection as one bit-packed code per individual (bit t set when d == 1 in
+period t, i.e. T bits instead of T bytes):
+
+    L(name, k)            y_t-k for periods start..T (a view, no copy)
+    D(name)               y_t - y_t-1
+    consecutive(k)        codes with bit t set when t-k+1..t are all selected,
+                          the has_3consec (k = 3) and has_2consec (k = 2)
+                          indicators of endogenous.do
+    count_consecutive(k)  the counts of those indicators per replication
+
+The selection codes are also the observation patterns by which
+gmm.PatternMoments groups individuals (see PatternMoments.add_panel()).
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import numpy as np
+
+# Number of set bits of every byte value
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1, dtype=np.intp)
+
+
+def code_dtype(T):
+    """Smallest unsigned integer type with T bits."""
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if np.iinfo(dtype).bits >= T:
+            return np.dtype(dtype)
+    raise ValueError(f"At most 64 periods can be bit-packed, got {T}")
+
+
+def pack_mask(mask):
+    """
+    Bit-pack a boolean mask over periods.
+
+    Args:
+        mask: Boolean array (..., T)
+
+    Returns:
+        Array (...) of code_dtype(T), bit t set when mask[..., t]
+    """
+    T = mask.shape[-1]
+    dtype = code_dtype(T)
+    packed = np.packbits(mask, axis=-1, bitorder='little')
+    if packed.shape[-1] < dtype.itemsize:
+        width = [(0, 0)] * (packed.ndim - 1) + [(0, dtype.itemsize - packed.shape[-1])]
+        packed = np.pad(packed, width)
+    return np.ascontiguousarray(packed).view(dtype.newbyteorder('<'))[..., 0].astype(dtype, copy=False)
+
+
+def unpack_mask(codes, T):
+    """
+    Boolean mask over periods from bit-packed codes (inverse of pack_mask()).
+
+    Args:
+        codes: Integer array (...)
+        T: Number of periods
+
+    Returns:
+        Boolean array (..., T)
+    """
+    return ((codes[..., None] >> np.arange(T, dtype=codes.dtype)) & 1).astype(bool)
+
+
+class Panel:
+    """
+    Balanced wide panel of a batch of replications with a bit-packed selection.
+
+    Args:
+        variables: Dictionary mapping name to (reps, N, T) array
+        codes: Bit-packed selection (reps, N) (see pack_mask())
+        T: Number of periods
+    """
+
+    def __init__(self, variables, codes, T):
+        self.variables = variables
+        self.codes = codes
+        self.T = T
+
+    @classmethod
+    def from_panels(cls, panels, names=('y_star',)):
+        """
+        Panel of the output of dgp.simulate_panels() (after drop_burn_in()).
+
+        Args:
+            panels: Dictionary of arrays with the .do variable names
+            names: Time-varying variables to keep (y is y_star where selected)
+
+        Returns:
+            Panel with the selection d
+        """
+        return cls({name: panels[name] for name in names}, pack_mask(panels['d']), panels['d'].shape[-1])
+
+    @property
+    def reps(self):
+        return self.codes.shape[0]
+
+    @property
+    def N(self):
+        return self.codes.shape[1]
+
+    @property
+    def nbytes(self):
+        """Memory held by the variables and the selection codes."""
+        return sum(values.nbytes for values in self.variables.values()) + self.codes.nbytes
+
+    def __getitem__(self, name):
+        return self.variables[name]
+
+    def individuals(self, start, stop):
+        """Panel of individuals start..stop-1 (views, no copy)."""
+        return Panel({name: values[:, start:stop] for name, values in self.variables.items()},
+                     self.codes[:, start:stop], self.T)
+
+    def selected(self):
+        """Boolean selection (reps, N, T)."""
+        return unpack_mask(self.codes, self.T)
+
+    def observed(self, name):
+        """
+        Variable where selected, zero elsewhere (like y in the .do files, with
+        missing values as zeros).
+        """
+        return np.where(self.selected(), self.variables[name], 0.0)
+
+    def L(self, name, k=1, start=None):
+        """
+        k-th lag of a variable, as a view.
+
+        Args:
+            name: Variable name
+            k: Lag
+            start: First period (0-based) of the result, at least k (default k)
+
+        Returns:
+            Array (reps, N, T - start) with y_t-k for t = start..T-1
+        """
+        start = k if start is None else start
+        if not 0 <= k <= start <= self.T:
+            raise ValueError(f"Lag {k} is not available from period {start}")
+        return self.variables[name][..., start - k:self.T - k]
+
+    def D(self, name, start=1):
+        """First difference y_t - y_t-1 for t = start..T-1 (start >= 1)."""
+        return self.L(name, 0, start) - self.L(name, 1, start)
+
+    def consecutive(self, k):
+        """
+        Codes of the periods that end k consecutive selected periods.
+
+        Bit t is set when periods t-k+1, ..., t are all selected, like
+        has_3consec (k = 3: y, L.y and L2.y observed) in endogenous.do.
+        """
+        codes = self.codes
+        for lag in range(1, k):
+            codes = codes & (self.codes << codes.dtype.type(lag))
+        return codes
+
+    def count_consecutive(self, k):
+        """
+        Number of (individual, period) with k consecutive selected periods, per
+        replication, counted on the bytes of the codes without unpacking them.
+        """
+        codes = np.ascontiguousarray(self.consecutive(k))
+        return POPCOUNT[codes.view(np.uint8)].reshape(self.reps, -1).sum(axis=1)
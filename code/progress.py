@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Progress Events for Al Sadoon et al. (2019) Replication
+=======================================================
+
+A shared, append-only stream of progress events (JSON Lines, one event per
+line, output/progress.jsonl by default) that all workers of a sweep write to
+and monitor.py reads. Every event has the event type, the cell name (as in
+sweep.cell_name()) and the Unix time; the event types are
+
+    sweep     written by sweep.py when a sweep starts: the list of jobs with
+              their replications and relative cost (sweep.cell_cost())
+    start     a job started (sweep.py) or a worker started a cell (simulate.py)
+    progress  replications done, out of reps, and the worker's replications
+              per second since it started
+    done      a worker finished its cell
+    exit      a job exited (sweep.py), with its exit code
+
+simulate.py writes start/progress/done events after every batch; the .do
+files write a progress event with their "Running replication" display, to the
+file named in the SWEEP_PROGRESS environment variable (set by sweep.py). Stata
+records its local clock time as "clock" instead of "time"; read_events()
+converts it.
+
+Lines are written with a single write() on a file opened for appending, so
+concurrent workers do not interleave events.
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import json
+import os
+import time
+
+PROGRESS_PATH = "output/progress.jsonl"
+
+# Environment variables through which sweep.py passes the event file and the
+# cell name to its jobs
+PROGRESS_ENV = "SWEEP_PROGRESS"
+CELL_ENV = "SWEEP_CELL"
+
+# Format of Stata's c(current_date) c(current_time)
+STATA_CLOCK = "%d %b %Y %H:%M:%S"
+
+
+def emit(path, event, cell=None, **fields):
+    """
+    Append one event to the progress file.
+
+    Args:
+        path: Progress file path
+        event: Event type (see the module docstring)
+        cell: Cell name (None for sweep events)
+        **fields: Further JSON-safe fields of the event
+    """
+    record = {'event': event, 'cell': cell, 'time': time.time()}
+    record.update(fields)
+    line = (json.dumps(record) + "\n").encode()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def read_events(path):
+    """
+    Read all events of a progress file, in the order they were written.
+
+    Lines that are not complete JSON objects (e.g. a line being written) are
+    skipped.
+
+    Returns:
+        List of event dictionaries, each with a 'time'
+    """
+    events = []
+    if not os.path.exists(path):
+        return events
+    with open(path) as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(event, dict) or 'event' not in event:
+                continue
+            if 'time' not in event and 'clock' in event:
+                try:
+                    event['time'] = time.mktime(time.strptime(event['clock'], STATA_CLOCK))
+                except ValueError:
+                    continue
+            if 'time' in event:
+                events.append(event)
+    return events
+
+
+def current_sweep(events):
+    """Events of the last sweep (from its 'sweep' event on), or all events if there is none."""
+    starts = [index for index, event in enumerate(events) if event['event'] == 'sweep']
+    return events[starts[-1]:] if starts else events
+
+
+class ProgressReporter:
+    """
+    Progress events of one worker running one cell (or shard).
+
+    The replications per second are measured from start(), so a resumed cell
+    reports the speed of the current run.
+
+    Args:
+        path: Progress file path
+        cell: Cell name
+        reps: Replications of the cell (or shard)
+    """
+
+    def __init__(self, path, cell, reps):
+        self.path = path
+        self.cell = cell
+        self.reps = reps
+        self._first = 0
+        self._started = None
+
+    def start(self, done=0):
+        """Report the start of the run, with the replications already done (on resume)."""
+        self._first = done
+        self._started = time.time()
+        emit(self.path, 'start', self.cell, done=done, reps=self.reps, pid=os.getpid())
+
+    def update(self, done):
+        """Report the replications done so far."""
+        seconds = time.time() - self._started
+        rate = (done - self._first) / seconds if seconds > 0 else None
+        emit(self.path, 'progress', self.cell, done=done, reps=self.reps, rate=rate)
+
+    def finish(self, done):
+        """Report the end of the run (done may be below reps with a precision target)."""
+        emit(self.path, 'done', self.cell, done=done, reps=self.reps, seconds=time.time() - self._started)
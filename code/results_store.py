@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+Results Store for Al Sadoon et al. (2019) Replication
+=====================================================
+
+Single SQLite database with one row per simulation cell, replacing the one-row
+csv/dta/txt files in output/partial* as the source for the table and figure
+builders. Cells are keyed by (experiment, selection, model, N, rho):
+
+    experiment: 0 for the Table 1 / Figure 1 designs, 1-5 for Tables 2 and 3
+    selection:  'endogenous', 'non_endogenous' or 'full_sample'
+
+and every cell holds one row per engine that computed it ('stata' for the .do
+files, 'python' for simulate.py), so a Python rerun never replaces the Stata
+result it reproduces. Readers get the newest row of every cell unless they
+ask for one engine.
+
+Workers (simulate.py, sweep.py) write into the store; the builders read it with
+one filtered query. Results of Stata runs are added with the import command,
+which reads the archived .csv and .dta files of all directories in parallel,
+normalizes their keys (rho0.5 and rho0.50 are the same cell) and keeps, for
+every cell, the newest result by its recorded date and time (the .csv of a
+run before its .dta, which has float precision and no seconds). A row
+already in the store is only replaced by a newer result of the same engine.
+The first connection to a new store, by a writer or a reader, imports the
+archive this way.
+
+Usage:
+    python results_store.py import [--workers K] [directory ...]   # default: all output/partial* directories
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import argparse
+import csv
+import math
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from progress import STATA_CLOCK
+
+try:
+    import pandas as pd
+except ImportError:     # .dta files are then skipped
+    pd = None
+
+STORE_PATH = "output/results.sqlite"
+PARTIAL_DIRS = ["output/partial", "output/partial_tab2", "output/partial_tab3"]
+
+# Replications per cell in the .do files (local reps 500), whose CSVs have no reps column
+STATA_REPS = 500
+
+# Result file formats, preferred first among the files of one run
+RESULT_EXTENSIONS = ['.csv', '.dta']
+
+# Format of the time stamp in .dta headers
+DTA_CLOCK = "%d %b %Y %H:%M"
+
+KEY_COLUMNS = ["experiment", "selection", "model", "N", "rho"]
+# Programs that write results: the .do files and simulate.py (and the sweep/queue workers running it)
+ENGINES = ["stata", "python"]
+# Telemetry of cells run by simulate.py (see telemetry.py); NULL for Stata results
+TELEMETRY_COLUMNS = ["AB_converged", "SYS_converged", "wall_seconds", "dgp_seconds", "moments_seconds",
+                     "AB_seconds", "SYS_seconds", "seconds_per_rep", "peak_rss_mb"]
+# Variance reduction of cells run with simulate.py --variance-reduction/--control-variate
+VARIANCE_REDUCTION_COLUMNS = ["AB_vrf", "SYS_vrf", "variance_reduction"]
+VALUE_COLUMNS = ["AB_bias", "AB_se", "SYS_bias", "SYS_se", "AB_valid", "SYS_valid", "date_time",
+                 "AB_mcse", "SYS_mcse", "AB_rmse", "SYS_rmse", "reps"] + TELEMETRY_COLUMNS + VARIANCE_REDUCTION_COLUMNS
+NUMERIC_COLUMNS = {"AB_bias": float, "AB_se": float, "SYS_bias": float, "SYS_se": float,
+                   "AB_valid": int, "SYS_valid": int,
+                   "AB_mcse": float, "SYS_mcse": float, "AB_rmse": float, "SYS_rmse": float,
+                   "reps": int, "AB_vrf": float, "SYS_vrf": float}
+NUMERIC_COLUMNS.update({column: int if column.endswith("_converged") else float for column in TELEMETRY_COLUMNS})
+COLUMNS = KEY_COLUMNS + ["engine"] + VALUE_COLUMNS
+
+# File name prefix -> (experiment, selection)
+PREFIXES = {
+    'endo': (0, 'endogenous'),
+    'nonendo': (0, 'non_endogenous'),
+    'fullsample': (0, 'full_sample'),
+    'exp1': (1, 'endogenous'),
+    'exp2': (2, 'endogenous'),
+    'exp3': (3, 'endogenous'),
+    'exp4': (4, 'endogenous'),
+    'exp5': (5, 'endogenous'),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    experiment INTEGER NOT NULL,
+    selection TEXT NOT NULL,
+    model TEXT NOT NULL,
+    N INTEGER NOT NULL,
+    rho REAL NOT NULL,
+    engine TEXT NOT NULL,
+    AB_bias REAL,
+    AB_se REAL,
+    SYS_bias REAL,
+    SYS_se REAL,
+    AB_valid INTEGER,
+    SYS_valid INTEGER,
+    date_time TEXT,
+    AB_mcse REAL,
+    SYS_mcse REAL,
+    AB_rmse REAL,
+    SYS_rmse REAL,
+    reps INTEGER,
+    AB_converged INTEGER,
+    SYS_converged INTEGER,
+    wall_seconds REAL,
+    dgp_seconds REAL,
+    moments_seconds REAL,
+    AB_seconds REAL,
+    SYS_seconds REAL,
+    seconds_per_rep REAL,
+    peak_rss_mb REAL,
+    AB_vrf REAL,
+    SYS_vrf REAL,
+    variance_reduction TEXT,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (experiment, selection, model, N, rho, engine)
+);
+CREATE INDEX IF NOT EXISTS results_by_model ON results (model, rho, N);
+CREATE INDEX IF NOT EXISTS results_by_version ON results (version);
+CREATE VIEW IF NOT EXISTS latest AS
+    SELECT * FROM results AS r
+    WHERE version = (SELECT MAX(version) FROM results AS s
+                     WHERE s.experiment = r.experiment AND s.selection = r.selection AND s.model = r.model
+                           AND s.N = r.N AND s.rho = r.rho);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def connect(path=STORE_PATH, archive=PARTIAL_DIRS):
+    """
+    Open (and create if needed) the results store.
+
+    The first connection to a store imports the archived results (see
+    ingest()), whichever program opens it first, and records that in the
+    meta table (archive_imported), so that a store created by a writer
+    (simulate.py, sweep.py, workqueue.py) still holds every archived cell.
+    A new store also gets a random identity (store_id), so that readers
+    such as build.py can tell a rebuilt store from the one they last saw.
+
+    Args:
+        path: Database file path
+        archive: Directories of archived results imported into a new store
+            (None: do not import)
+
+    Returns:
+        sqlite3.Connection
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+    conn.commit()
+    if archive and get_meta(conn, 'archive_imported') is None:
+        # Importing twice (two first connections at once) writes nothing the second time
+        ingest(conn, archive)
+        set_meta(conn, 'archive_imported', '1')
+    return conn
+
+
+def get_meta(conn, key):
+    """Value of a store property in the meta table (None if unset)."""
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return None if row is None else row[0]
+
+
+def set_meta(conn, key, value):
+    """Set a store property in the meta table."""
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def normalize_rho(rho):
+    """Canonical rho value, so that '0.5', '0.50' and '.5' are the same key."""
+    return round(float(rho), 6)
+
+
+def write_result(conn, row):
+    """
+    Insert or replace one engine's results of a cell.
+
+    Every write gets a new store-wide version number, so that readers can
+    find the cells written since they last looked (see changed_since()).
+
+    Args:
+        conn: Store connection
+        row: Dictionary with KEY_COLUMNS, engine (one of ENGINES) and (some
+            of) VALUE_COLUMNS; NaN and empty strings are stored as NULL
+    """
+    write_results(conn, [row])
+
+
+def write_results(conn, rows):
+    """
+    Insert or replace the results of several cells in one transaction.
+
+    Args:
+        conn: Store connection
+        rows: Dictionaries as in write_result()
+    """
+    records = []
+    for row in rows:
+        if row.get('engine') not in ENGINES:
+            raise ValueError(f"Unknown engine {row.get('engine')!r}, expected one of {ENGINES}")
+        values = []
+        for column in COLUMNS:
+            value = row.get(column)
+            if value == '' or (isinstance(value, float) and value != value):
+                value = None
+            elif value is not None and column in NUMERIC_COLUMNS:
+                value = NUMERIC_COLUMNS[column](float(value))
+            values.append(value)
+        values[KEY_COLUMNS.index('rho')] = normalize_rho(row['rho'])
+        records.append(values)
+    placeholders = ", ".join("?" for _ in COLUMNS)
+    with conn:
+        conn.executemany(f"INSERT OR REPLACE INTO results ({', '.join(COLUMNS)}, version) "
+                         f"VALUES ({placeholders}, (SELECT COALESCE(MAX(version), 0) + 1 FROM results))", records)
+
+
+def query_results(conn, **filters):
+    """
+    Load results with one filtered query.
+
+    Without an engine filter, every cell gives its newest row whichever
+    engine wrote it; with one, the rows of the given engine(s).
+
+    Args:
+        conn: Store connection
+        **filters: Column name -> value or list of values, e.g.
+            query_results(conn, experiment=0, selection=['endogenous', 'full_sample'], model='A')
+            or query_results(conn, engine='stata')
+
+    Returns:
+        List of dictionaries with COLUMNS
+    """
+    clauses = []
+    params = []
+    for column, value in filters.items():
+        if column not in KEY_COLUMNS + ['engine']:
+            raise ValueError(f"Cannot filter on '{column}'")
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        if column == 'rho':
+            values = [normalize_rho(v) for v in values]
+        clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+        params.extend(values)
+
+    sql = f"SELECT {', '.join(COLUMNS)} FROM {'results' if 'engine' in filters else 'latest'}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    return [dict(zip(COLUMNS, values)) for values in conn.execute(sql, params)]
+
+
+def changed_since(conn, version):
+    """
+    Cells written after a given store version.
+
+    Args:
+        conn: Store connection
+        version: Last version seen by the caller (0 for everything)
+
+    Returns:
+        Tuple (rows, latest) with the list of row dictionaries (COLUMNS), the
+        newest row of every cell written since, and the latest version in the
+        store
+    """
+    rows = [dict(zip(COLUMNS, values)) for values in
+            conn.execute(f"SELECT {', '.join(COLUMNS)} FROM latest WHERE version > ?", (version,))]
+    latest = conn.execute("SELECT COALESCE(MAX(version), 0) FROM results").fetchone()[0]
+    return rows, latest
+
+
+def load_index(conn, engine=None):
+    """
+    Load the whole store into an in-memory index.
+
+    Args:
+        conn: Store connection
+        engine: Only the results of this engine (default: the newest row of
+            every cell)
+
+    Returns:
+        Dictionary mapping (experiment, selection, model, N, rho) to the row dictionary
+    """
+    rows = query_results(conn) if engine is None else query_results(conn, engine=engine)
+    return {tuple(row[column] for column in KEY_COLUMNS): row for row in rows}
+
+
+def parse_filename(filename):
+    """
+    Key of a result file name such as endo_modelA_N500_rho0.25.csv.
+
+    Args:
+        filename: File name (with or without directory and extension)
+
+    Returns:
+        Dictionary with KEY_COLUMNS, or None if the name is not a result file
+    """
+    name = os.path.splitext(os.path.basename(filename))[0]
+    parts = name.split('_')
+    if len(parts) != 4 or parts[0] not in PREFIXES:
+        return None
+    experiment, selection = PREFIXES[parts[0]]
+    return {
+        'experiment': experiment,
+        'selection': selection,
+        'model': parts[1].replace('model', ''),
+        'N': int(parts[2].replace('N', '')),
+        'rho': normalize_rho(parts[3].replace('rho', '')),
+    }
+
+
+def mc_error_columns(row):
+    """
+    Monte Carlo error columns derived from bias, sd and number of valid replications.
+
+    Results written by the .do files only have AB_bias, AB_se (the sd of the
+    estimates) and AB_valid; the MC standard error of the bias is
+    sd / sqrt(valid) and the RMSE is sqrt(sd^2 (valid - 1) / valid + bias^2).
+
+    Args:
+        row: Dictionary with the results columns (strings or numbers)
+
+    Returns:
+        Dictionary with AB_mcse, SYS_mcse, AB_rmse, SYS_rmse (None if unavailable)
+    """
+    columns = {}
+    for estimator in ["AB", "SYS"]:
+        columns[f"{estimator}_mcse"] = columns[f"{estimator}_rmse"] = None
+        try:
+            bias = float(row[f"{estimator}_bias"])
+            sd = float(row[f"{estimator}_se"])
+            valid = float(row[f"{estimator}_valid"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if valid > 0 and not math.isnan(bias) and not math.isnan(sd):
+            columns[f"{estimator}_mcse"] = sd / math.sqrt(valid)
+            columns[f"{estimator}_rmse"] = math.sqrt(sd * sd * (valid - 1) / valid + bias * bias)
+    return columns
+
+
+def parse_date_time(value):
+    """
+    Unix time of a recorded date and time.
+
+    Args:
+        value: date_time column ('14 Jul 2025 04:02:21') or .dta time stamp
+            ('14 Jul 2025 04:02')
+
+    Returns:
+        Seconds since the epoch, or None if missing or not a date
+    """
+    if not value:
+        return None
+    for clock in (STATA_CLOCK, DTA_CLOCK):
+        try:
+            return time.mktime(time.strptime(value.strip(), clock))
+        except ValueError:
+            continue
+    return None
+
+
+def _read_values(path):
+    """Values (first row) and date_time of one result file, None if empty or unreadable."""
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        return dict(rows[0]) if rows else None
+    if pd is None:
+        return None
+    with pd.io.stata.StataReader(path) as reader:
+        data = reader.read()
+        stamp = reader.time_stamp
+    if data.empty:
+        return None
+    row = {column: value.item() if hasattr(value, 'item') else value
+           for column, value in data.iloc[0].items()}
+    row.setdefault('date_time', stamp)
+    return row
+
+
+def read_result_file(path):
+    """
+    Parse one result file written by a .do file or simulate.py.
+
+    Args:
+        path: .csv or .dta file path
+
+    Returns:
+        Row dictionary with KEY_COLUMNS (from the file name), the engine, the
+        values and derived Monte Carlo errors, plus 'timestamp' (from
+        date_time, else the file's modification time) and 'source'; None if
+        the file is not a result file or cannot be read
+    """
+    key = parse_filename(path)
+    if key is None or os.path.splitext(path)[1] not in RESULT_EXTENSIONS:
+        return None
+    try:
+        row = _read_values(path)
+    except (OSError, ValueError) as e:
+        print(f"Warning: cannot read {path}: {e}")
+        return None
+    if row is None:
+        return None
+    if "AB_mcse" not in row:
+        row.update(mc_error_columns(row))
+    # simulate.py writes its engine; the .do files write neither engine nor reps
+    if not row.get("engine"):
+        row["engine"] = "python" if "reps" in row else "stata"
+    if "reps" not in row:
+        row["reps"] = STATA_REPS
+    row.update(key)
+    timestamp = parse_date_time(row.get('date_time'))
+    row['timestamp'] = timestamp if timestamp is not None else os.path.getmtime(path)
+    row['source'] = path
+    return row
+
+
+def import_csv(conn, path):
+    """
+    Add one result CSV written by a .do file or simulate.py to the store.
+
+    Args:
+        conn: Store connection
+        path: CSV file path
+
+    Returns:
+        True if the file was imported
+    """
+    row = read_result_file(path)
+    if row is None:
+        return False
+    write_result(conn, row)
+    return True
+
+
+def _result_files(directory):
+    """Result files of one directory, sorted by name."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(entry.path for entry in os.scandir(directory)
+                  if os.path.splitext(entry.name)[1] in RESULT_EXTENSIONS and parse_filename(entry.name))
+
+
+def scan_directories(directories=PARTIAL_DIRS, workers=None):
+    """
+    Parse all result files in the given directories in parallel.
+
+    Args:
+        directories: Directories to scan
+        workers: Number of threads (default: CPUs)
+
+    Returns:
+        List of row dictionaries (see read_result_file()), in directory and
+        file name order
+    """
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        paths = [path for files in pool.map(_result_files, directories) for path in files]
+        return [row for row in pool.map(read_result_file, paths) if row is not None]
+
+
+def resolve_duplicates(rows):
+    """
+    Keep the newest result of every cell and engine.
+
+    Results are compared by timestamp; among the files of one run (same
+    directory and name) the .csv is kept over the .dta whatever their time
+    stamps, and on equal times the later directory wins.
+
+    Args:
+        rows: Row dictionaries from scan_directories()
+
+    Returns:
+        Dictionary mapping (experiment, selection, model, N, rho, engine) to the kept row
+    """
+    runs = {}
+    for order, row in enumerate(rows):
+        run_file, extension = os.path.splitext(row['source'])
+        preference = RESULT_EXTENSIONS.index(extension)
+        if run_file not in runs or preference < runs[run_file][0]:
+            runs[run_file] = (preference, order, row)
+
+    newest = {}
+    for _, _, row in sorted(runs.values(), key=lambda item: item[1]):
+        key = tuple(row[column] for column in KEY_COLUMNS + ['engine'])
+        if key not in newest or row['timestamp'] >= newest[key]['timestamp']:
+            newest[key] = row
+    return newest
+
+
+def ingest(conn, directories=PARTIAL_DIRS, workers=None):
+    """
+    Add the archived results of the given directories to the store.
+
+    Rows already in the store for the same cell and engine with the same or
+    a newer date_time are kept, so importing the same files again writes
+    nothing.
+
+    Args:
+        conn: Store connection
+        directories: Directories to scan
+        workers: Number of threads (default: CPUs)
+
+    Returns:
+        Dictionary with the number of files read, cells found, cells written
+        and cells kept because the store is up to date
+    """
+    rows = scan_directories(directories, workers)
+    newest = resolve_duplicates(rows)
+    index = {tuple(row[column] for column in KEY_COLUMNS + ['engine']): row
+             for row in query_results(conn, engine=ENGINES)}
+    written = []
+    for key, row in newest.items():
+        stored = parse_date_time(index[key]['date_time']) if key in index else None
+        if stored is None or row['timestamp'] > stored:
+            written.append(row)
+    write_results(conn, written)
+    return {'files': len(rows), 'cells': len(newest), 'written': len(written),
+            'kept': len(newest) - len(written)}
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Import archived results into the results store.")
+    parser.add_argument('command', choices=['import'])
+    parser.add_argument('directories', nargs='*', default=PARTIAL_DIRS)
+    parser.add_argument('--workers', type=int, default=None, help="parallel readers (default: CPUs)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    conn = connect(archive=None)
+    counts = ingest(conn, args.directories, args.workers)
+    if set(args.directories) >= set(PARTIAL_DIRS):
+        set_meta(conn, 'archive_imported', '1')
+    total = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    conn.close()
+    print(f"Read {counts['files']} result files from {', '.join(args.directories)} "
+          f"in {time.perf_counter() - start:.2f}s")
+    print(f"{counts['cells']} cells: {counts['written']} written, {counts['kept']} already up to date in the store")
+    if pd is None:
+        print("pandas is not installed: .dta files were skipped")
+    print(f"Store {STORE_PATH} now holds {total} cells")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
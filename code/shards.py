@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Replication Shards for Al Sadoon et al. (2019) Replication
+==========================================================
+
+With counter-based random numbers (dgp.replication_rng()), the draws of a
+replication depend only on its index, so the replications of one cell can be
+split into shards that run in any order, in different processes or on
+different machines. Replications are summarized in fixed blocks of
+simulate.STATS_BLOCK, and shards always start on a block boundary; merging the
+block summaries of all shards in replication order gives exactly the same
+result, bit for bit, as running the whole cell in one process.
+
+A shard file is a JSON document with the run description (as in checkpoints),
+the replication range of the shard, per estimator, the list of block
+summaries (mcstats.RunningStats.state()), and the telemetry of the run that
+wrote it (telemetry.CellTelemetry.state()).
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import glob
+import json
+import os
+
+SHARD_DIR = "output/shards"
+
+
+def shard_range(reps, index, count, block):
+    """
+    Replication range of one shard, aligned to whole blocks.
+
+    Args:
+        reps: Replications in the cell
+        index: Shard number (0-based)
+        count: Number of shards
+        block: Replications per block
+
+    Returns:
+        Tuple (start, stop); empty when there are more shards than blocks
+    """
+    if not 0 <= index < count:
+        raise ValueError(f"Shard {index} out of range for {count} shards")
+    n_blocks = -(-reps // block)
+    first = index * n_blocks // count
+    last = (index + 1) * n_blocks // count
+    return min(first * block, reps), min(last * block, reps)
+
+
+def write_shard(path, header, start, stop, blocks, telemetry=None):
+    """
+    Write the block summaries of one shard (atomically).
+
+    Args:
+        path: Shard file path
+        header: Run description
+        start: First replication of the shard
+        stop: One past the last replication of the shard
+        blocks: Dictionary mapping estimator name to the list of block states
+        telemetry: Optional telemetry state of the shard's run
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'header': header, 'start': start, 'stop': stop, 'blocks': blocks, 'telemetry': telemetry}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def load_shards(directory, header):
+    """
+    Read and order all shards of one cell.
+
+    Files written by a different run (e.g. an earlier split into a different
+    number of shards) are ignored, and so are empty shards, which hold no
+    blocks and would otherwise tie on their start with the next shard.
+
+    Args:
+        directory: Directory with the cell's shard files
+        header: Run description of the shards to merge
+
+    Returns:
+        Tuple (blocks, telemetry): dictionary mapping estimator name to the
+        list of block states of all replications, in replication order; and
+        the list of recorded telemetry states of the shards
+
+    Raises:
+        ValueError: If the shards do not cover 0..reps exactly once
+    """
+    shards = []
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        with open(path) as f:
+            shard = json.load(f)
+        if shard['header'] == header and shard['stop'] > shard['start']:
+            shards.append(shard)
+    shards.sort(key=lambda shard: shard['start'])
+
+    expected = 0
+    for shard in shards:
+        if shard['start'] != expected:
+            raise ValueError(f"Shards in {directory} do not cover replications {expected}-{shard['start'] - 1}"
+                             if shard['start'] > expected else
+                             f"Shards in {directory} overlap at replication {shard['start']}")
+        expected = shard['stop']
+    if expected != header['reps']:
+        raise ValueError(f"Shards in {directory} cover {expected} of {header['reps']} replications")
+
+    blocks = {name: [state for shard in shards for state in shard['blocks'][name]]
+              for name in header['estimators']}
+    return blocks, [shard['telemetry'] for shard in shards if shard.get('telemetry')]
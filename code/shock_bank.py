@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Common-Random-Numbers Shock Bank for Al Sadoon et al. (2019) Replication
+========================================================================
+
+Every .do file runs `set seed 08869`, so all cells with the same N and T_total
+draw the same innovations; only rho, the selection model and the design's
+scale parameters differ. The shock bank draws those standardized innovations
+(see dgp.draw_shocks()) once per (N, T_total, reps, seed), stores each one as
+a .npy file under output/shocks, and hands every cell memory-mapped,
+read-only views of the replications it needs. Cells running in parallel
+share the same pages of the OS page cache instead of each drawing and holding
+its own copy, and comparisons across rho, models and designs are paired.
+
+Each innovation is drawn from its own stream, seeded with (seed, index), so a
+bank file does not depend on which other files exist. Files are written to a
+temporary name and renamed, so concurrent cells creating the same bank are
+safe.
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import os
+
+import numpy as np
+
+import dgp
+
+SHOCK_DIR = "output/shocks"
+
+# Innovations in the bank and whether they vary over time
+INNOVATIONS = {
+    'alpha_i0': False,
+    'eta_i': False,
+    'eps_i0': True,
+    'u_it': True,
+    'z_it': True,
+}
+INNOVATIONS.update({name: True for name in dgp.NONSTATIONARY_UNIFORMS})
+INNOVATIONS.update({name: False for name in dgp.STATIONARY_INIT})
+
+# Innovations drawn as uniforms (the others are standard normals)
+UNIFORMS = dgp.NONSTATIONARY_UNIFORMS + ['d_init']
+
+# Upper bound on values drawn at once while filling a bank file
+FILL_CHUNK_VALUES = 10_000_000
+
+
+class ShockBank:
+    """
+    Memory-mapped innovations for all replications of one (N, T_total) grid.
+
+    Args:
+        N: Number of individuals
+        T_total: Total periods generated
+        reps: Number of replications in the bank
+        seed: RNG seed
+        directory: Root directory of the shock banks
+    """
+
+    def __init__(self, N, T_total, reps, seed=dgp.SEED, directory=SHOCK_DIR):
+        self.N = N
+        self.T_total = T_total
+        self.reps = reps
+        self.seed = seed
+        self.path = os.path.join(directory, f"N{N}_T{T_total}_reps{reps}_seed{seed}")
+        self._arrays = {}
+
+    def _shape(self, name):
+        if INNOVATIONS[name]:
+            return (self.reps, self.N, self.T_total)
+        return (self.reps, self.N)
+
+    def _fill(self, name, path):
+        """Draw one innovation for all replications into a new .npy file."""
+        os.makedirs(self.path, exist_ok=True)
+        shape = self._shape(name)
+        rng = np.random.default_rng([self.seed, list(INNOVATIONS).index(name)])
+        tmp_path = f"{path[:-4]}.{os.getpid()}.tmp.npy"
+        values = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64, shape=shape)
+        chunk = max(1, FILL_CHUNK_VALUES // int(np.prod(shape[1:])))
+        for start in range(0, self.reps, chunk):
+            stop = min(start + chunk, self.reps)
+            if name in UNIFORMS:
+                values[start:stop] = rng.random((stop - start,) + shape[1:])
+            else:
+                values[start:stop] = rng.standard_normal((stop - start,) + shape[1:])
+        values.flush()
+        del values
+        os.replace(tmp_path, path)
+
+    def array(self, name):
+        """
+        Read-only memory map of one innovation, drawing it the first time.
+
+        Args:
+            name: Innovation name (see INNOVATIONS)
+
+        Returns:
+            Memory-mapped array of shape (reps, N) or (reps, N, T_total)
+        """
+        if name not in self._arrays:
+            path = os.path.join(self.path, f"{name}.npy")
+            if not os.path.exists(path):
+                self._fill(name, path)
+            self._arrays[name] = np.load(path, mmap_mode='r')
+        return self._arrays[name]
+
+    def shocks(self, start, stop, nonstationary=False, stationary_init=False, individuals=slice(None)):
+        """
+        Innovations of replications start..stop-1, as views of the bank.
+
+        Args:
+            start: First replication
+            stop: One past the last replication
+            nonstationary: Include the Experiment 5 uniforms
+            stationary_init: Include the stationary initial conditions
+            individuals: Slice of the individuals to return (default: all)
+
+        Returns:
+            Dictionary in the format of dgp.draw_shocks()
+        """
+        if stop > self.reps:
+            raise ValueError(f"Shock bank {self.path} holds {self.reps} replications, not {stop}")
+        names = [name for name in INNOVATIONS
+                 if (nonstationary or name not in dgp.NONSTATIONARY_UNIFORMS)
+                 and (stationary_init or name not in dgp.STATIONARY_INIT)]
+        return {name: self.array(name)[start:stop, individuals] for name in names}
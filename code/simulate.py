@@ -0,0 +1,966 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo Cell Runner for Al Sadoon et al. (2019) Replication
+===============================================================
+
+Python counterpart of endogenous.do, nonendogenous.do, endogenous2.do and
+experiment1-5.do. Runs all replications of one (design, N, model, rho) cell
+with the vectorized DGP and the batched AB/SYS estimators, and writes the same
+one-row CSV files the .do files produce. Results are also written to the
+results store (output/results.sqlite) read by the table and figure builders.
+
+Usage:
+    python simulate.py design N model rho [output_dir] [--full-sample] [--checkpoint-dir DIR [--resume]] [--no-csv]
+                       [--target-mcse SE [--min-reps M] [--reps MAX]] [--crn | --counter-rng]
+                       [--init {burn_in,stationary}] [--progress FILE]
+                       [--variance-reduction {antithetic,lhs}] [--control-variate]
+    python simulate.py design N model rho --shard K/M      # replications of shard K of M only
+    python simulate.py design N model rho --merge-shards M  # combine the M shards into the results
+    python simulate.py design N model rho --nested n1 n2 ...   # estimate on the first n of N individuals too
+
+Where design is one of: endogenous, nonendogenous, exp1, exp2, exp3, exp4, exp5
+
+Examples:
+    python simulate.py endogenous 500 A 0.25
+    python simulate.py endogenous 200 A 0.25 --full-sample   # like endogenous2.do
+    python simulate.py exp2 5000 B 0.50 output/partial_tab3
+    python simulate.py exp2 5000 B 0.50 --checkpoint-dir output/checkpoints --resume
+    python simulate.py endogenous 200 B 0.25 --target-mcse 0.002 --reps 5000   # adaptive
+    python simulate.py exp3 500 A 0.75 --crn   # innovations from the shared shock bank
+    python simulate.py endogenous 5000 B 0.50 --init stationary   # no burn-in periods
+    python simulate.py exp2 5000 B 0.50 --shard 3/8   # on any core or machine, then --merge-shards 8
+    python simulate.py endogenous 3000 A 0.25 --full-sample --nested 200 400 600 800 1000 1500 2000 2500
+    python simulate.py endogenous 500 A 0.50 --variance-reduction lhs --control-variate --reps 200
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import argparse
+import csv
+import os
+from datetime import datetime
+
+import numpy as np
+
+import dgp
+import gmm
+import results_store
+from checkpoint import CheckpointWriter, load_checkpoint
+from mcstats import RunningStats, UnitStats
+from panel import Panel
+from progress import PROGRESS_ENV, ProgressReporter
+from shards import SHARD_DIR, load_shards, shard_range, write_shard
+from shock_bank import SHOCK_DIR, ShockBank
+from telemetry import PHASES, CellTelemetry
+
+# Number of Monte Carlo replications (as in the .do files)
+REPS = 500
+
+# Upper bound on individuals (reps x N) simulated and estimated at once
+MAX_INDIVIDUALS_PER_BATCH = 100_000
+
+# Individuals of one replication simulated at once; larger N is simulated
+# chunk by chunk and only the GMM sufficient statistics are kept
+CHUNK_INDIVIDUALS = 10_000
+
+# Replications before the precision target is first checked (adaptive mode)
+MIN_REPS = 100
+
+# Replications per summary block with counter-based random numbers
+STATS_BLOCK = 25
+
+# File prefix, default output directory and identifying columns per design
+DESIGN_OUTPUT = {
+    'endogenous': ('endo', 'output/partial', {'selection_type': 'endogenous'}),
+    'nonendogenous': ('nonendo', 'output/partial', {'selection_type': 'non_endogenous'}),
+    'exp1': ('exp1', 'output/partial_tab2', {'experiment': 1, 'experiment_type': 'exp1_short_T'}),
+    'exp2': ('exp2', 'output/partial_tab2', {'experiment': 2, 'experiment_type': 'exp2_more_selection'}),
+    'exp3': ('exp3', 'output/partial_tab2', {'experiment': 3, 'experiment_type': 'exp3_variance_ratio'}),
+    'exp4': ('exp4', 'output/partial_tab2', {'experiment': 4, 'experiment_type': 'exp4_reduced_correlation'}),
+    'exp5': ('exp5', 'output/partial_tab2', {'experiment': 5, 'experiment_type': 'exp5_nonstationary_errors'}),
+}
+
+
+def default_batch_size(N):
+    """Number of replications per batch so that batches stay within memory."""
+    return max(1, MAX_INDIVIDUALS_PER_BATCH // min(N, CHUNK_INDIVIDUALS))
+
+
+def estimator_names(full_sample=False):
+    """Estimators of a cell, in output order."""
+    return ['AB', 'SYS'] + (['AB_full', 'SYS_full'] if full_sample else [])
+
+
+def counter_batch_size(batch_size):
+    """Batch size rounded up to whole STATS_BLOCK blocks (counter-based RNG)."""
+    return -(-batch_size // STATS_BLOCK) * STATS_BLOCK
+
+
+def simulate_chunks(params, N, model, rho, start, stop, rng=None, bank=None, counter_seed=None, telemetry=None,
+                    sampling=None):
+    """
+    Simulate replications start..stop-1 of a cell, CHUNK_INDIVIDUALS individuals at a time.
+
+    The innovations come from the shock bank if given, else from counter-based
+    streams if counter_seed is given (one stream per chunk), else from rng,
+    in units of dgp.SAMPLING_UNITS[sampling] replications if sampling is given.
+
+    Args:
+        params: DGP parameters
+        N: Number of individuals
+        model: Selection model
+        rho: Autoregressive parameter
+        start: First replication
+        stop: One past the last replication
+        rng: numpy Generator (sequential stream)
+        bank: Optional ShockBank
+        counter_seed: Optional seed of the counter-based streams
+        telemetry: CellTelemetry to which the simulation time is added
+        sampling: Optional variance reduction mode, 'antithetic' or 'lhs'
+
+    Yields:
+        Tuple (first, panel): index of the first individual of the chunk and
+        the panel.Panel of the chunk (y_star and the selection) without the
+        burn-in periods
+    """
+    stationary_init = params['init'] == 'stationary'
+    for chunk, first in enumerate(range(0, N, CHUNK_INDIVIDUALS)):
+        last = min(first + CHUNK_INDIVIDUALS, N)
+        with telemetry.phase('dgp'):
+            if bank is not None:
+                shocks = bank.shocks(start, stop, params['nonstationary'], stationary_init, slice(first, last))
+            elif counter_seed is not None:
+                shocks = dgp.counter_shocks(N, dgp.generated_periods(params), start, stop, counter_seed,
+                                            params['nonstationary'], stationary_init, chunk, last - first)
+            elif sampling is not None:
+                shocks = dgp.variance_reduced_shocks(last - first, dgp.generated_periods(params), stop - start, rng,
+                                                     sampling, params['nonstationary'], stationary_init)
+            else:
+                shocks = None
+            panels = dgp.drop_burn_in(
+                dgp.simulate_panels(params, last - first, model, rho, stop - start, rng, shocks), params)
+            chunk_panel = Panel.from_panels(panels)
+        del panels
+        yield first, chunk_panel
+
+
+def batch_moments(reps, T, full_sample=False):
+    """Empty GMM sufficient statistics of a batch: selected sample 'y', full sample 'y_star'."""
+    moments = {'y': gmm.PatternMoments(reps, T)}
+    if full_sample:
+        moments['y_star'] = gmm.PatternMoments(reps, T)
+    return moments
+
+
+def add_panel(moments, panel):
+    """
+    Add a chunk of individuals to the sufficient statistics of a batch.
+
+    The full sample is accumulated in the same pass as the selected sample
+    (gmm.PatternMoments.add_panel() with full).
+    """
+    moments['y'].add_panel(panel, full=moments.get('y_star'))
+
+
+def moment_controls(moments, rho):
+    """
+    Control variates of a batch: the full-sample moment conditions of AB and
+    SYS at the true coefficients (rho, and dgp.OUTCOME_CONSTANT for _cons).
+
+    The instruments are valid in the full sample, so every condition has mean
+    exactly zero (the designs with time-varying alpha_i of Experiment 5
+    excepted), while it moves with the estimates of the same replication.
+
+    Args:
+        moments: Full-sample PatternMoments of the batch
+        rho: Autoregressive parameter
+
+    Returns:
+        Dictionary mapping estimator name to a (reps, k) array of controls
+    """
+    ab = moments.arellano_bond_conditions(rho)
+    system = moments.system_gmm_conditions(rho, dgp.OUTCOME_CONSTANT)
+    return {'AB': ab, 'SYS': system, 'AB_full': ab, 'SYS_full': system}
+
+
+def estimate_moments(moments, full_sample, telemetry):
+    """
+    AB and SYS estimates from the sufficient statistics of a batch.
+
+    Returns:
+        Dictionary mapping estimator name to (coefs, ses)
+    """
+    batch = {}
+    with telemetry.phase('AB'):
+        batch['AB'] = moments['y'].arellano_bond()
+        if full_sample:
+            batch['AB_full'] = moments['y_star'].arellano_bond()
+    with telemetry.phase('SYS'):
+        batch['SYS'] = moments['y'].system_gmm()
+        if full_sample:
+            batch['SYS_full'] = moments['y_star'].system_gmm()
+    return {name: batch[name] for name in estimator_names(full_sample)}
+
+
+def estimate_batch(params, N, model, rho, start, stop, full_sample=False, rng=None, bank=None, counter_seed=None,
+                   telemetry=None, sampling=None, control_variate=False):
+    """
+    Simulate and estimate replications start..stop-1 of a cell.
+
+    The innovations come from the shock bank if given, else from counter-based
+    streams if counter_seed is given, else from rng (in units for sampling).
+
+    Individuals are simulated in chunks of CHUNK_INDIVIDUALS and each chunk is
+    reduced to the GMM sufficient statistics (gmm.PatternMoments) before the
+    next is drawn, so memory is bounded by the chunk size whatever N is. With
+    counter-based streams every chunk has its own stream.
+
+    Args:
+        params: DGP parameters
+        N: Number of individuals
+        model: Selection model
+        rho: Autoregressive parameter
+        start: First replication
+        stop: One past the last replication
+        full_sample: Also estimate on the full (unselected) sample
+        rng: numpy Generator (sequential stream)
+        bank: Optional ShockBank
+        counter_seed: Optional seed of the counter-based streams
+        telemetry: Optional CellTelemetry to which the time of each phase is added
+        sampling: Optional variance reduction mode, 'antithetic' or 'lhs'
+        control_variate: Also return the control variates (see moment_controls())
+
+    Returns:
+        Dictionary mapping estimator name to (coefs, ses), or to (coefs, ses,
+        controls) with control_variate
+    """
+    if telemetry is None:
+        telemetry = CellTelemetry()
+    moments = batch_moments(stop - start, params['T'], full_sample or control_variate)
+    for _, panel in simulate_chunks(params, N, model, rho, start, stop, rng, bank, counter_seed, telemetry,
+                                    sampling):
+        with telemetry.phase('moments'):
+            add_panel(moments, panel)
+    batch = estimate_moments(moments, full_sample, telemetry)
+    if control_variate:
+        controls = moment_controls(moments['y_star'], rho)
+        batch = {name: values + (controls[name],) for name, values in batch.items()}
+    return batch
+
+
+def estimate_nested_batch(params, N_values, model, rho, start, stop, full_sample=False, rng=None, bank=None,
+                          counter_seed=None, telemetry=None):
+    """
+    Simulate replications start..stop-1 once at the largest N and estimate on
+    the first n individuals for every n in N_values.
+
+    The sufficient statistics are accumulated in individual order and the
+    estimators are applied to them each time a prefix is complete, so the
+    whole curve costs one simulation at the largest N plus one estimation per
+    n, and all sample sizes share their draws. The estimates at the largest N
+    are those of estimate_batch() (up to rounding).
+
+    Args:
+        params: DGP parameters
+        N_values: Sample sizes (prefixes of the individuals)
+        model: Selection model
+        rho: Autoregressive parameter
+        start: First replication
+        stop: One past the last replication
+        full_sample: Also estimate on the full (unselected) sample
+        rng: numpy Generator (sequential stream)
+        bank: Optional ShockBank (for the largest N)
+        counter_seed: Optional seed of the counter-based streams
+        telemetry: Optional CellTelemetry to which the time of each phase is added
+
+    Returns:
+        Dictionary mapping n to the dictionary of estimator name to (coefs, ses)
+    """
+    if telemetry is None:
+        telemetry = CellTelemetry()
+    pending = sorted(set(N_values))
+    moments = batch_moments(stop - start, params['T'], full_sample)
+    estimates = {}
+    for first, panel in simulate_chunks(params, pending[-1], model, rho, start, stop, rng, bank, counter_seed,
+                                        telemetry):
+        offset = first
+        last = first + panel.N
+        while offset < last:
+            end = min(last, pending[0])
+            with telemetry.phase('moments'):
+                add_panel(moments, panel.individuals(offset - first, end - first))
+            offset = end
+            if end == pending[0]:
+                estimates[pending.pop(0)] = estimate_moments(moments, full_sample, telemetry)
+    return estimates
+
+
+def fold_blocks(stats, batch, start, blocks=None):
+    """
+    Add a batch to the running statistics one STATS_BLOCK block at a time.
+
+    Blocks are aligned to replication indices that are multiples of
+    STATS_BLOCK, so the statistics do not depend on how replications were
+    grouped into batches, processes or shards.
+
+    Args:
+        stats: Dictionary of RunningStats (updated in place)
+        batch: Dictionary returned by estimate_batch(); start must be a multiple of STATS_BLOCK
+        start: First replication of the batch
+        blocks: Optional dictionary of lists to which the block states are appended
+    """
+    for name, (coefs, ses) in batch.items():
+        for offset in range(0, len(coefs), STATS_BLOCK):
+            block = RunningStats()
+            block.update(coefs[offset:offset + STATS_BLOCK], ses[offset:offset + STATS_BLOCK])
+            stats[name].merge(block)
+            if blocks is not None:
+                blocks[name].append(block.state())
+
+
+def run_cell(design, N, model, rho, reps=REPS, full_sample=False, seed=dgp.SEED, batch_size=None,
+             checkpoint=None, resume=False, target_mcse=None, min_reps=MIN_REPS, shock_dir=None,
+             counter_rng=False, init='burn_in', telemetry=None, progress=None, sampling=None,
+             control_variate=False):
+    """
+    Simulate and estimate all replications of one cell.
+
+    Replications are generated and estimated in batches of batch_size to bound
+    memory at large N; each batch is a vectorized DGP draw (one per chunk of
+    CHUNK_INDIVIDUALS individuals) followed by one batched AB and one batched
+    SYS estimation. The estimates of each batch
+    are folded into running statistics and then discarded, so memory does not
+    grow with reps.
+
+    With a checkpoint path, the running statistics after every completed batch
+    are appended to the checkpoint together with the RNG state. With
+    resume=True, the run continues from the last completed batch with the same
+    statistics and RNG state, so the results are identical to an uninterrupted
+    run. A checkpoint written by a different run of the cell (other reps,
+    seed, batch size, random numbers or initial conditions) is discarded with
+    a warning and the cell starts over.
+
+    With target_mcse, the cell stops at the first batch boundary after min_reps
+    replications where the Monte Carlo standard error of the bias of every
+    estimator is at most target_mcse, and reps is the maximum number of
+    replications. The replications actually used are in RunningStats.reps.
+
+    With shock_dir, the innovations are read from the common-random-numbers
+    shock bank for (N, T_total, reps, seed) instead of being drawn (see
+    shock_bank.py), so all cells of a sweep share one set of draws.
+
+    With counter_rng, every replication is drawn from its own counter-based
+    stream (dgp.replication_rng()) and summarized in STATS_BLOCK blocks, so the
+    results are bit-identical to merging shards of the cell run anywhere (see
+    run_shard()).
+
+    With init='stationary', the initial conditions are drawn from their
+    stationary distributions instead of generating and discarding T_discard
+    burn-in periods (see dgp.simulate_panels()).
+
+    With a CellTelemetry, the wall time per phase and the peak memory of the
+    cell are recorded in it (and in the checkpoint, so a resumed cell reports
+    the time of all its runs).
+
+    With a ProgressReporter, the replications done are reported after every
+    batch (see progress.py).
+
+    With sampling ('antithetic' or 'lhs'), replications are drawn in
+    dependent units (dgp.variance_reduced_shocks()), and with control_variate
+    the biases are corrected with the full-sample moment conditions
+    (moment_controls()). The statistics are then mcstats.UnitStats, whose
+    Monte Carlo errors account for the units and controls and which report
+    the variance reduction factor. reps must hold whole units; neither mode
+    combines with checkpoints, the shock bank or counter-based streams.
+
+    Args:
+        design: Design name (see dgp.DESIGNS)
+        N: Number of individuals
+        model: Selection model ('A' or 'B')
+        rho: Autoregressive parameter
+        reps: Number of replications
+        full_sample: Also estimate on the full (unselected) sample, like endogenous2.do
+        seed: RNG seed
+        batch_size: Replications per batch (default: default_batch_size(N))
+        checkpoint: Optional checkpoint file path
+        resume: Continue from the completed batches in the checkpoint
+        target_mcse: Optional precision target for the MC standard error of the biases
+        min_reps: Minimum replications before stopping on the precision target
+        shock_dir: Optional shock bank directory
+        counter_rng: Use counter-based random numbers
+        init: Initial conditions, 'burn_in' or 'stationary'
+        telemetry: Optional CellTelemetry to record the run in
+        progress: Optional progress.ProgressReporter
+        sampling: Optional variance reduction mode, 'antithetic' or 'lhs'
+        control_variate: Correct the biases with control variates
+
+    Returns:
+        Dictionary mapping estimator name ('AB', 'SYS', 'AB_full', 'SYS_full')
+        to its RunningStats (UnitStats with sampling or control_variate)
+    """
+    if counter_rng and shock_dir is not None:
+        raise ValueError("Use either the shock bank or counter-based random numbers")
+    unit_size = dgp.SAMPLING_UNITS[sampling] if sampling is not None else 1
+    if sampling is not None or control_variate:
+        if counter_rng or shock_dir is not None or checkpoint is not None:
+            raise ValueError("Variance reduction does not combine with checkpoints, the shock bank "
+                             "or counter-based random numbers")
+        if reps % unit_size:
+            raise ValueError(f"{sampling} draws need a multiple of {unit_size} replications, got {reps}")
+    if telemetry is None:
+        telemetry = CellTelemetry()
+    telemetry.start()
+    params = dgp.get_design(design, init=init)
+    rng = np.random.default_rng(seed)
+    if batch_size is None:
+        batch_size = default_batch_size(N)
+    if counter_rng:
+        batch_size = counter_batch_size(batch_size)
+    batch_size = -(-batch_size // unit_size) * unit_size
+    bank = ShockBank(N, dgp.generated_periods(params), reps, seed, shock_dir) if shock_dir is not None else None
+
+    estimators = estimator_names(full_sample)
+    if sampling is not None or control_variate:
+        stats = {name: UnitStats(unit_size) for name in estimators}
+    else:
+        stats = {name: RunningStats() for name in estimators}
+
+    first = 0
+    writer = None
+    if checkpoint is not None:
+        header = {'design': design, 'N': N, 'model': model, 'rho': rho, 'reps': reps,
+                  'seed': seed, 'batch_size': batch_size, 'estimators': estimators, 'records': 'stats'}
+        if target_mcse is not None:
+            header.update({'target_mcse': target_mcse, 'min_reps': min_reps})
+        if bank is not None:
+            header['shock_bank'] = bank.path
+        if counter_rng:
+            header['counter_rng'] = STATS_BLOCK
+        if init != 'burn_in':
+            header['init'] = init
+        batches = []
+        if resume:
+            try:
+                batches = load_checkpoint(checkpoint, header)
+            except ValueError:
+                print(f"Warning: {checkpoint} was written by a different run of the cell; starting over")
+        if batches:
+            first = batches[-1]['stop']
+            stats = {name: RunningStats.from_state(state) for name, state in batches[-1]['stats'].items()}
+            rng.bit_generator.state = batches[-1]['rng_state']
+            if 'telemetry' in batches[-1]:
+                telemetry.merge(CellTelemetry.from_state(batches[-1]['telemetry']))
+        writer = CheckpointWriter(checkpoint, header, batches)
+
+    done = first
+    if progress is not None:
+        progress.start(done)
+    for start in range(first, reps, batch_size):
+        if target_mcse is not None and start >= min_reps and precise_enough(stats, rho, target_mcse):
+            break
+        stop = min(start + batch_size, reps)
+        batch = estimate_batch(params, N, model, rho, start, stop, full_sample, rng, bank,
+                               seed if counter_rng else None, telemetry, sampling, control_variate)
+
+        if counter_rng:
+            fold_blocks(stats, batch, start)
+        else:
+            for name, values in batch.items():
+                stats[name].update(*values)
+        if writer is not None:
+            writer.append(start, stop, stats, rng.bit_generator.state, telemetry)
+        done = stop
+        if progress is not None:
+            progress.update(done)
+
+    if writer is not None:
+        writer.close()
+    telemetry.stop()
+    if progress is not None:
+        progress.finish(done)
+    return stats
+
+
+def shard_header(design, N, model, rho, reps, shards, seed=dgp.SEED, full_sample=False, init='burn_in'):
+    """Run description shared by all shards of a cell split into a given number of shards."""
+    header = {'design': design, 'N': N, 'model': model, 'rho': rho, 'reps': reps, 'shards': shards,
+              'seed': seed, 'estimators': estimator_names(full_sample), 'block': STATS_BLOCK}
+    if init != 'burn_in':
+        header['init'] = init
+    return header
+
+
+def run_shard(design, N, model, rho, start, stop, full_sample=False, seed=dgp.SEED, batch_size=None,
+              init='burn_in', telemetry=None, progress=None):
+    """
+    Simulate and estimate replications start..stop-1 of a cell with
+    counter-based random numbers.
+
+    Args:
+        design: Design name
+        N: Number of individuals
+        model: Selection model
+        rho: Autoregressive parameter
+        start: First replication (a multiple of STATS_BLOCK, see shards.shard_range())
+        stop: One past the last replication
+        full_sample: Also estimate on the full (unselected) sample
+        seed: RNG seed
+        batch_size: Replications per batch (default: default_batch_size(N))
+        init: Initial conditions, 'burn_in' or 'stationary'
+        telemetry: Optional CellTelemetry to record the run in
+        progress: Optional progress.ProgressReporter (replications counted from start)
+
+    Returns:
+        Dictionary mapping estimator name to the list of block states
+    """
+    if telemetry is None:
+        telemetry = CellTelemetry()
+    telemetry.start()
+    params = dgp.get_design(design, init=init)
+    batch_size = counter_batch_size(batch_size or default_batch_size(N))
+    stats = {name: RunningStats() for name in estimator_names(full_sample)}
+    blocks = {name: [] for name in stats}
+    if progress is not None:
+        progress.start()
+    for batch_start in range(start, stop, batch_size):
+        batch_stop = min(batch_start + batch_size, stop)
+        batch = estimate_batch(params, N, model, rho, batch_start, batch_stop, full_sample, counter_seed=seed,
+                               telemetry=telemetry)
+        fold_blocks(stats, batch, batch_start, blocks)
+        if progress is not None:
+            progress.update(batch_stop - start)
+    telemetry.stop()
+    if progress is not None:
+        progress.finish(stop - start)
+    return blocks
+
+
+def run_nested(design, N_values, model, rho, reps=REPS, full_sample=False, seed=dgp.SEED, batch_size=None,
+               shock_dir=None, counter_rng=False, init='burn_in', telemetry=None, progress=None):
+    """
+    Simulate all replications of a cell once at the largest N and estimate on
+    nested samples: the first n individuals for every n in N_values.
+
+    This is the nested-sample mode for the Figure 1 curve (see
+    estimate_nested_batch()): the curve costs little more than its largest
+    point, and the bias-versus-N lines are smoother because all points share
+    their draws. The points are not independent of each other, unlike
+    separate runs of each N. Random numbers, initial conditions, telemetry and
+    progress work as in run_cell().
+
+    Args:
+        design: Design name
+        N_values: Sample sizes
+        model: Selection model
+        rho: Autoregressive parameter
+        reps: Number of replications
+        full_sample: Also estimate on the full (unselected) sample
+        seed: RNG seed
+        batch_size: Replications per batch (default: default_batch_size(max(N_values)))
+        shock_dir: Optional shock bank directory
+        counter_rng: Use counter-based random numbers
+        init: Initial conditions, 'burn_in' or 'stationary'
+        telemetry: Optional CellTelemetry to record the run in
+        progress: Optional progress.ProgressReporter
+
+    Returns:
+        Dictionary mapping n to the dictionary of estimator name to RunningStats
+    """
+    if counter_rng and shock_dir is not None:
+        raise ValueError("Use either the shock bank or counter-based random numbers")
+    if telemetry is None:
+        telemetry = CellTelemetry()
+    telemetry.start()
+    N = max(N_values)
+    params = dgp.get_design(design, init=init)
+    rng = np.random.default_rng(seed)
+    batch_size = batch_size or default_batch_size(N)
+    if counter_rng:
+        batch_size = counter_batch_size(batch_size)
+    bank = ShockBank(N, dgp.generated_periods(params), reps, seed, shock_dir) if shock_dir is not None else None
+
+    stats = {n: {name: RunningStats() for name in estimator_names(full_sample)} for n in N_values}
+    if progress is not None:
+        progress.start()
+    for start in range(0, reps, batch_size):
+        stop = min(start + batch_size, reps)
+        estimates = estimate_nested_batch(params, N_values, model, rho, start, stop, full_sample, rng, bank,
+                                          seed if counter_rng else None, telemetry)
+        for n, batch in estimates.items():
+            if counter_rng:
+                fold_blocks(stats[n], batch, start)
+            else:
+                for name, (coefs, ses) in batch.items():
+                    stats[n][name].update(coefs, ses)
+        if progress is not None:
+            progress.update(stop)
+    telemetry.stop()
+    if progress is not None:
+        progress.finish(reps)
+    return stats
+
+
+def merge_shard_blocks(blocks):
+    """
+    Running statistics of a whole cell from the block states of its shards.
+
+    Args:
+        blocks: Dictionary returned by shards.load_shards()
+
+    Returns:
+        Dictionary mapping estimator name to its RunningStats, identical to
+        run_cell(..., counter_rng=True)
+    """
+    stats = {}
+    for name, states in blocks.items():
+        stats[name] = RunningStats()
+        for state in states:
+            stats[name].merge(RunningStats.from_state(state))
+    return stats
+
+
+def precise_enough(stats, rho, target_mcse):
+    """
+    Whether the MC standard error of every estimator's bias meets the target.
+
+    Args:
+        stats: Dictionary of RunningStats
+        rho: Autoregressive parameter
+        target_mcse: Precision target
+
+    Returns:
+        True if all biases are reported and precise enough
+    """
+    return all(running.summary(rho)['mcse'] <= target_mcse for running in stats.values())
+
+
+def summarize_cell(stats, N, rho, suffix=''):
+    """
+    Build the results row (N rho AB_bias AB_se SYS_bias SYS_se AB_valid SYS_valid,
+    followed by the Monte Carlo errors AB_mcse SYS_mcse, AB_rmse SYS_rmse, the
+    number of replications used, reps, and the number of converged estimations
+    AB_converged SYS_converged). With variance reduction (mcstats.UnitStats),
+    the variance reduction factors AB_vrf SYS_vrf follow.
+
+    As in the .do files, AB_se and SYS_se are the standard deviations of the
+    estimates across replications.
+
+    Args:
+        stats: Dictionary returned by run_cell()
+        N: Number of individuals
+        rho: Autoregressive parameter
+        suffix: '' for the selected sample, '_full' for the full sample
+
+    Returns:
+        Dictionary with the results columns
+    """
+    ab = stats['AB' + suffix].summary(rho)
+    system = stats['SYS' + suffix].summary(rho)
+    return {
+        'N': N,
+        'rho': rho,
+        'AB_bias': ab['bias'],
+        'AB_se': ab['sd'],
+        'SYS_bias': system['bias'],
+        'SYS_se': system['sd'],
+        'AB_valid': ab['valid'],
+        'SYS_valid': system['valid'],
+        'AB_mcse': ab['mcse'],
+        'SYS_mcse': system['mcse'],
+        'AB_rmse': ab['rmse'],
+        'SYS_rmse': system['rmse'],
+        'reps': ab['reps'],
+        'AB_converged': ab['converged'],
+        'SYS_converged': system['converged'],
+        **({'AB_vrf': ab['vrf'], 'SYS_vrf': system['vrf']} if 'vrf' in ab else {}),
+    }
+
+
+def stata_date_time(now=None):
+    """Timestamp in the format of Stata's c(current_date) c(current_time)."""
+    now = now or datetime.now()
+    return f"{now.day:2d} {now:%b %Y %H:%M:%S}"
+
+
+def write_results_csv(row, path):
+    """
+    Write a one-row results CSV. Missing values are left empty, like Stata.
+
+    Args:
+        row: Dictionary with the results columns
+        path: Output file path
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    values = ['' if isinstance(v, float) and np.isnan(v) else v for v in row.values()]
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(row.keys())
+        writer.writerow(values)
+
+
+def cell_basename(design, model, rho_str, N):
+    """Base file name of a cell, e.g. endo_modelA_N500_rho0.25."""
+    prefix = DESIGN_OUTPUT[design][0]
+    return f"{prefix}_model{model}_N{N}_rho{rho_str}"
+
+
+def variance_reduction_label(sampling=None, control_variate=False):
+    """Value of the variance_reduction column, e.g. 'lhs+cv' (None without variance reduction)."""
+    parts = ([sampling] if sampling else []) + (['cv'] if control_variate else [])
+    return "+".join(parts) or None
+
+
+def result_rows(design, model, rho_str, stats, N, full_sample=False, telemetry=None, variance_reduction=None):
+    """
+    Build the output rows of a cell with the same columns as the .do files.
+
+    The telemetry of the run (time, memory) goes into the main row only, as it
+    covers the full-sample estimates as well.
+
+    Args:
+        design: Design name
+        model: Selection model
+        rho_str: rho as given on the command line (used in file names)
+        stats: Dictionary returned by run_cell()
+        N: Number of individuals
+        full_sample: Whether to include the full sample row
+        telemetry: Optional CellTelemetry of the run
+        variance_reduction: Optional label of the variance reduction modes
+            (see variance_reduction_label())
+
+    Returns:
+        List of (filename, row) tuples
+    """
+    columns = DESIGN_OUTPUT[design][2]
+    rho = float(rho_str)
+    date_time = stata_date_time()
+
+    row = summarize_cell(stats, N, rho)
+    if 'experiment' in columns:
+        row['experiment'] = columns['experiment']
+        row['model'] = model
+        row['experiment_type'] = columns['experiment_type']
+    else:
+        row['model'] = model
+        row['selection_type'] = columns['selection_type']
+    row['date_time'] = date_time
+    row['engine'] = 'python'
+    if variance_reduction is not None:
+        row['variance_reduction'] = variance_reduction
+    if telemetry is not None:
+        row.update(telemetry.columns(row['reps']))
+    rows = [(cell_basename(design, model, rho_str, N) + ".csv", row)]
+
+    if full_sample:
+        row_full = summarize_cell(stats, N, rho, suffix='_full')
+        row_full['model'] = model
+        row_full['selection_type'] = 'full_sample'
+        row_full['date_time'] = date_time
+        row_full['engine'] = 'python'
+        if variance_reduction is not None:
+            row_full['variance_reduction'] = variance_reduction
+        rows.append((f"fullsample_model{model}_N{N}_rho{rho_str}.csv", row_full))
+
+    return rows
+
+
+def format_telemetry(telemetry):
+    """One-line summary of a cell's time and memory."""
+    phases = ", ".join(f"{name} {telemetry.seconds[name]:.1f}s" for name in PHASES)
+    line = f"Time: {telemetry.wall:.1f}s ({phases})"
+    if telemetry.peak_rss_mb is not None:
+        line += f", peak RSS {telemetry.peak_rss_mb:.0f} MB"
+    return line
+
+
+def parse_args(argv=None):
+    """Parse command line arguments (same positional order as the .do files)."""
+    parser = argparse.ArgumentParser(description="Run one Monte Carlo cell of the AR(1) selection model.")
+    parser.add_argument('design', choices=sorted(DESIGN_OUTPUT))
+    parser.add_argument('N', type=int)
+    parser.add_argument('model', choices=['A', 'B'])
+    parser.add_argument('rho')
+    parser.add_argument('output_dir', nargs='?', default=None)
+    parser.add_argument('--reps', type=int, default=REPS,
+                        help="replications (maximum replications with --target-mcse)")
+    parser.add_argument('--seed', type=int, default=dgp.SEED)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--full-sample', action='store_true',
+                        help="also estimate on the full sample (AB all / system all), like endogenous2.do")
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help="append per-replication results to a checkpoint in this directory")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue from the last completed replication in the checkpoint")
+    parser.add_argument('--target-mcse', type=float, default=None,
+                        help="replicate in batches until the MC standard error of every bias is at most this")
+    parser.add_argument('--min-reps', type=int, default=MIN_REPS,
+                        help="minimum replications before stopping on --target-mcse")
+    parser.add_argument('--crn', action='store_true',
+                        help="read the innovations from the common-random-numbers shock bank")
+    parser.add_argument('--shock-dir', default=SHOCK_DIR, help="shock bank directory (with --crn)")
+    parser.add_argument('--counter-rng', action='store_true',
+                        help="draw every replication from its own counter-based stream")
+    parser.add_argument('--init', choices=dgp.INIT_MODES, default='burn_in',
+                        help="initial conditions: burn-in periods (as in the .do files) or stationary draws")
+    parser.add_argument('--shard', default=None, metavar='K/M',
+                        help="only run shard K of M (counter-based streams) and save it for --merge-shards")
+    parser.add_argument('--merge-shards', type=int, default=None, metavar='M',
+                        help="combine the M saved shards of the cell instead of simulating")
+    parser.add_argument('--shard-dir', default=SHARD_DIR)
+    parser.add_argument('--nested', type=int, nargs='+', default=None, metavar='n',
+                        help="simulate once at N and also estimate on the first n individuals for every n")
+    parser.add_argument('--variance-reduction', choices=sorted(dgp.SAMPLING_UNITS), default=None,
+                        help="draw replications in antithetic pairs or Latin hypercube blocks")
+    parser.add_argument('--control-variate', action='store_true',
+                        help="correct the biases with the full-sample moment conditions as control variates")
+    parser.add_argument('--store', default=results_store.STORE_PATH, help="results store to write into")
+    parser.add_argument('--progress', default=os.environ.get(PROGRESS_ENV), metavar='FILE',
+                        help=f"append progress events to this file (default: ${PROGRESS_ENV}, see monitor.py)")
+    parser.add_argument('--no-csv', action='store_true', help="only write to the results store")
+    args = parser.parse_args(argv)
+
+    if args.N < 200:
+        parser.error("N must be >= 200")
+    if float(args.rho) < 0:
+        parser.error("rho must be >= 0")
+    if args.target_mcse is not None and args.target_mcse <= 0:
+        parser.error("--target-mcse must be > 0")
+    if args.crn and args.counter_rng:
+        parser.error("--crn and --counter-rng are alternatives")
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume needs --checkpoint-dir")
+    if args.init == 'stationary' and dgp.get_design(args.design)['nonstationary']:
+        parser.error(f"--init stationary is not available for {args.design} (non-stationary errors)")
+    if args.shard or args.merge_shards is not None:
+        if args.shard and args.merge_shards is not None:
+            parser.error("--shard and --merge-shards are separate steps")
+        if args.crn or args.target_mcse is not None or args.checkpoint_dir:
+            parser.error("shards use counter-based streams and cannot be combined with "
+                         "--crn, --target-mcse or --checkpoint-dir")
+    if args.nested is not None:
+        if any(n < 200 or n > args.N for n in args.nested):
+            parser.error("--nested sample sizes must be between 200 and N")
+        if args.shard or args.merge_shards is not None or args.target_mcse is not None or args.checkpoint_dir:
+            parser.error("--nested cannot be combined with shards, --target-mcse or --checkpoint-dir")
+        args.nested = sorted(set(args.nested) | {args.N})
+    if args.variance_reduction or args.control_variate:
+        if (args.crn or args.counter_rng or args.checkpoint_dir or args.shard or args.merge_shards is not None
+                or args.nested is not None):
+            parser.error("--variance-reduction and --control-variate cannot be combined with --crn, "
+                         "--counter-rng, --checkpoint-dir, shards or --nested")
+        unit = dgp.SAMPLING_UNITS.get(args.variance_reduction, 1)
+        if args.reps % unit or (args.target_mcse is not None and args.min_reps % unit):
+            parser.error(f"--variance-reduction {args.variance_reduction} needs --reps (and --min-reps) "
+                         f"in multiples of {unit}")
+    if args.control_variate and dgp.get_design(args.design)['nonstationary']:
+        parser.error(f"--control-variate is not available for {args.design} (time-varying alpha_i)")
+    if args.shard:
+        try:
+            index, count = (int(part) for part in args.shard.split('/'))
+        except ValueError:
+            parser.error("--shard must be K/M, e.g. 3/8")
+        if not 1 <= index <= count:
+            parser.error("--shard K/M needs 1 <= K <= M")
+        args.shard = (index - 1, count)
+    return args
+
+
+def main(argv=None):
+    """Main function to run one simulation cell."""
+    args = parse_args(argv)
+    output_dir = args.output_dir or DESIGN_OUTPUT[args.design][1]
+
+    print("=" * 70)
+    print("MONTE CARLO SIMULATION - Al Sadoon et al. (2019) Replication")
+    print("=" * 70)
+    if args.target_mcse is None:
+        print(f"Design: {args.design}, N={args.N}, Model={args.model}, rho={args.rho}, Replications={args.reps}")
+    else:
+        print(f"Design: {args.design}, N={args.N}, Model={args.model}, rho={args.rho}, "
+              f"Replications={args.min_reps}-{args.reps} until MC s.e. <= {args.target_mcse}")
+    if args.init == 'stationary':
+        print("Initial conditions: stationary draws (no burn-in)")
+    variance_reduction = variance_reduction_label(args.variance_reduction, args.control_variate)
+    if variance_reduction is not None:
+        print(f"Variance reduction: {variance_reduction}")
+    print()
+
+    name = cell_basename(args.design, args.model, args.rho, args.N)
+    shard_dir = os.path.join(args.shard_dir, name)
+    telemetry = CellTelemetry()
+    if args.shard:
+        start, stop = shard_range(args.reps, *args.shard, STATS_BLOCK)
+        progress = None
+        if args.progress:
+            progress = ProgressReporter(args.progress, f"{name}_shard{args.shard[0] + 1}of{args.shard[1]}",
+                                        stop - start)
+        blocks = run_shard(args.design, args.N, args.model, float(args.rho), start, stop,
+                           full_sample=args.full_sample, seed=args.seed, batch_size=args.batch_size,
+                           init=args.init, telemetry=telemetry, progress=progress)
+        header = shard_header(args.design, args.N, args.model, float(args.rho), args.reps, args.shard[1],
+                              args.seed, args.full_sample, args.init)
+        path = os.path.join(shard_dir, f"{start:09d}-{stop:09d}.json")
+        write_shard(path, header, start, stop, blocks, telemetry.state())
+        print(f"Shard {args.shard[0] + 1}/{args.shard[1]}: replications {start}-{stop - 1}")
+        print(f"  {format_telemetry(telemetry)}")
+        print(f"  Saved to: {path}")
+        print("=" * 70)
+        return
+
+    if args.nested is not None:
+        all_stats = run_nested(args.design, args.nested, args.model, float(args.rho), reps=args.reps,
+                               full_sample=args.full_sample, seed=args.seed, batch_size=args.batch_size,
+                               shock_dir=args.shock_dir if args.crn else None, counter_rng=args.counter_rng,
+                               init=args.init, telemetry=telemetry,
+                               progress=ProgressReporter(args.progress, name, args.reps) if args.progress else None)
+        print(f"Nested samples: n = {', '.join(map(str, args.nested))} (first n of {args.N} individuals)")
+    elif args.merge_shards is not None:
+        header = shard_header(args.design, args.N, args.model, float(args.rho), args.reps, args.merge_shards,
+                              args.seed, args.full_sample, args.init)
+        blocks, telemetry_states = load_shards(shard_dir, header)
+        stats = merge_shard_blocks(blocks)
+        for state in telemetry_states:
+            telemetry.merge(CellTelemetry.from_state(state))
+    else:
+        checkpoint = None
+        if args.checkpoint_dir:
+            checkpoint = os.path.join(args.checkpoint_dir, name + ".jsonl")
+        stats = run_cell(args.design, args.N, args.model, float(args.rho), reps=args.reps,
+                         full_sample=args.full_sample, seed=args.seed, batch_size=args.batch_size,
+                         checkpoint=checkpoint, resume=args.resume, target_mcse=args.target_mcse,
+                         min_reps=args.min_reps, shock_dir=args.shock_dir if args.crn else None,
+                         counter_rng=args.counter_rng, init=args.init, telemetry=telemetry,
+                         progress=ProgressReporter(args.progress, name, args.reps) if args.progress else None,
+                         sampling=args.variance_reduction, control_variate=args.control_variate)
+
+    if args.nested is None:
+        all_stats = {args.N: stats}
+
+    conn = results_store.connect(args.store)
+    # The telemetry covers the whole nested run, so it goes with the largest N
+    rows = [item for n, stats in all_stats.items()
+            for item in result_rows(args.design, args.model, args.rho, stats, n, args.full_sample,
+                                    telemetry if n == args.N else None, variance_reduction)]
+    for filename, row in rows:
+        results_store.write_result(conn, dict(row, **results_store.parse_filename(filename)))
+        path = os.path.join(output_dir, filename)
+        if not args.no_csv:
+            write_results_csv(row, path)
+        print(f"{filename}:")
+        for estimator, label in [('AB', 'AB: '), ('SYS', 'SYS:')]:
+            line = (f"  {label} bias={row[f'{estimator}_bias']:.6f} (MC s.e. {row[f'{estimator}_mcse']:.6f}), "
+                    f"s.e.={row[f'{estimator}_se']:.6f}, valid={row[f'{estimator}_valid']}/{row['reps']}")
+            if f'{estimator}_vrf' in row:
+                line += (f", variance reduction x{row[f'{estimator}_vrf']:.2f} "
+                         f"(worth {row[f'{estimator}_vrf'] * row['reps']:.0f} replications)")
+            print(line)
+        print(f"  Saved to: {args.store}" + ("" if args.no_csv else f" and {path}"))
+    conn.close()
+
+    print(format_telemetry(telemetry))
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+Sweep Runner for Al Sadoon et al. (2019) Replication
+====================================================
+
+Replaces the run_*.sh launchers, which start every (N, model, rho) job at once
+in the background. Here the grid (design x model x N x rho) is expanded into
+cells, each cell's cost is estimated from N * T_total * reps, and the cells are
+run biggest-first on a bounded pool sized to the CPU and memory budget, with
+BLAS/OpenMP threads capped per worker. Results of finished Stata cells are
+added to the results store (output/results.sqlite); the Python engine writes
+into the store directly.
+
+Usage:
+    python sweep.py --preset table1                      # run_parallel_N500.sh + run_parallel_N5000.sh
+    python sweep.py --preset table2                      # run_experiment1..5.sh 500
+    python sweep.py --preset table3 --engine python      # run_experiment1..5.sh 5000, NumPy engine
+    python sweep.py --preset figure1 --N 200 400 --rho 0.25 --models A
+    python sweep.py --preset table1 --engine python --target-mcse 0.002 --reps 5000   # adaptive reps
+    python sweep.py --preset table2 --engine python --crn   # shared common-random-numbers shock bank
+    python sweep.py --designs exp2 --N 5000 --models B --rho 0.50 --engine python --shards 16
+    python sweep.py --preset figure1 --engine python --nested   # one job per curve, nested samples
+    python sweep.py --preset table1 --command "sleep 1"  # stub command, no Stata needed
+
+Progress events of all jobs go to output/progress.jsonl (--progress); follow
+them with python monitor.py --follow in another terminal.
+
+Custom commands are formatted with the fields {design} {do_file} {N} {model}
+{rho} {output_dir}.
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import argparse
+import itertools
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+import dgp
+import progress
+import results_store
+from shards import shard_range
+from simulate import DESIGN_OUTPUT, MAX_INDIVIDUALS_PER_BATCH, MIN_REPS, REPS, STATS_BLOCK, cell_basename
+
+# Define Stata command (same default as the run_*.sh scripts)
+STATA = os.environ.get("STATA", "/Applications/Stata/StataBE.app/Contents/MacOS/StataBE")
+
+RHO_VALUES = ["0.25", "0.50", "0.75"]
+MODELS = ["A", "B"]
+EXPERIMENTS = ["exp1", "exp2", "exp3", "exp4", "exp5"]
+FIGURE1_N = [200, 400, 600, 800, 1000, 1500, 2000, 2500, 3000, 3500, 4000, 4500, 5000]
+
+# Grids reproducing the run_*.sh scripts
+PRESETS = {
+    'table1': {'designs': ['nonendogenous', 'endogenous'], 'N': [500, 5000], 'output_dir': None},
+    'table2': {'designs': EXPERIMENTS, 'N': [500], 'output_dir': 'output/partial_tab2'},
+    'table3': {'designs': EXPERIMENTS, 'N': [5000], 'output_dir': 'output/partial_tab3'},
+    'figure1': {'designs': ['endogenous'], 'N': FIGURE1_N, 'output_dir': None, 'full_sample': True},
+}
+
+# Environment variables that control BLAS/OpenMP thread pools
+THREAD_VARIABLES = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                    "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+# Checkpoints of the Python engine, so a rerun of the sweep resumes unfinished cells
+CHECKPOINT_DIR = "output/checkpoints"
+
+# Rough memory model per job: fixed process overhead plus bytes per simulated
+# individual-period held at once
+MEMORY_BASE = {'stata': 300 * 2**20, 'python': 150 * 2**20}
+MEMORY_PER_OBS = {'stata': 256, 'python': 1024}
+
+POLL_INTERVAL = 0.2
+
+
+def build_grid(designs, N_values, models=MODELS, rho_values=RHO_VALUES, output_dir=None, full_sample=False,
+               reps=REPS, target_mcse=None, min_reps=MIN_REPS, crn=False, shards=1):
+    """
+    Expand the sweep grid into a list of cells.
+
+    Args:
+        designs: Design names (see dgp.DESIGNS)
+        N_values: Sample sizes
+        models: Selection models
+        rho_values: rho values as strings (used in file names)
+        output_dir: Output directory (None: the design's default)
+        full_sample: Also estimate on the full sample (Figure 1, endogenous2.do)
+        reps: Replications per cell (maximum with target_mcse)
+        target_mcse: Optional precision target (Python engine only)
+        min_reps: Minimum replications before stopping on the precision target
+        crn: Read the innovations from the shared shock bank (Python engine only)
+        shards: Split every cell into this many jobs (Python engine only, see expand_shards())
+
+    Returns:
+        List of cell dictionaries
+    """
+    return [
+        {
+            'design': design,
+            'N': int(N),
+            'model': model,
+            'rho': rho,
+            'output_dir': output_dir,
+            'full_sample': full_sample,
+            'reps': reps,
+            'target_mcse': target_mcse,
+            'min_reps': min_reps,
+            'crn': crn,
+            'shards': shards,
+            'shard': None,
+        }
+        for design, N, model, rho in itertools.product(designs, N_values, models, rho_values)
+    ]
+
+
+def expand_shards(cells):
+    """
+    Split cells into one job per shard of replications.
+
+    Shards use counter-based random numbers, so they can run in parallel and
+    are merged (simulate.py --merge-shards) into exactly the results of the
+    whole cell once all of them have finished.
+
+    Args:
+        cells: List of cell dictionaries
+
+    Returns:
+        List of job dictionaries; cells with shards > 1 become one job per
+        shard with 'shard' set to the shard number (0-based). The number of
+        shards is capped at the number of replication blocks, so no job is
+        empty.
+    """
+    jobs = []
+    for cell in cells:
+        count = min(cell['shards'], -(-cell['reps'] // STATS_BLOCK))
+        if count > 1:
+            jobs += [dict(cell, shards=count, shard=index) for index in range(count)]
+        else:
+            jobs.append(dict(cell, shards=1))
+    return jobs
+
+
+def nest_cells(cells):
+    """
+    Merge the cells that differ only in N into one nested-sample job each.
+
+    The job simulates once at the largest N and estimates on the first n
+    individuals for every N of the group (simulate.py --nested), so a Figure 1
+    curve costs little more than its largest point.
+
+    Args:
+        cells: List of cell dictionaries
+
+    Returns:
+        List of cell dictionaries with N the largest sample size and 'nested'
+        the sorted list of all sample sizes of the group
+    """
+    groups = {}
+    for cell in cells:
+        key = tuple((column, value) for column, value in sorted(cell.items()) if column not in ('N', 'nested'))
+        groups.setdefault(key, []).append(cell['N'])
+    return [dict(key, N=max(N_values), nested=sorted(N_values)) for key, N_values in groups.items()]
+
+
+def cell_name(cell):
+    """Short name of a cell, matching the output file names."""
+    name = cell_basename(cell['design'], cell['model'], cell['rho'], cell['N'])
+    if cell.get('shard') is not None:
+        name += f"_shard{cell['shard'] + 1}of{cell['shards']}"
+    return name
+
+
+def cell_cost(cell):
+    """
+    Relative cost of a cell: N * T_total * reps, doubled when the full-sample
+    estimates are also computed. With a precision target, reps is the maximum,
+    so the cost is an upper bound.
+    """
+    T_total = dgp.get_design(cell['design'])['T_total']
+    cost = cell['N'] * T_total * cell['reps']
+    if cell.get('shard') is not None:
+        cost //= cell['shards']
+    return 2 * cost if cell['full_sample'] else cost
+
+
+def cell_reps(cell):
+    """Replications run by a job (the shard's share of a sharded cell)."""
+    if cell.get('shard') is None:
+        return cell['reps']
+    start, stop = shard_range(cell['reps'], cell['shard'], cell['shards'], STATS_BLOCK)
+    return stop - start
+
+
+def cell_memory(cell, engine):
+    """
+    Estimated peak memory of one job in bytes.
+
+    Stata holds one replication in memory at a time; the Python engine holds one
+    batch of up to MAX_INDIVIDUALS_PER_BATCH individuals.
+
+    Args:
+        cell: Cell dictionary
+        engine: 'stata' or 'python'
+
+    Returns:
+        Estimated bytes
+    """
+    T_total = dgp.get_design(cell['design'])['T_total']
+    if engine == 'python':
+        individuals = min(cell['N'] * cell['reps'], max(cell['N'], MAX_INDIVIDUALS_PER_BATCH))
+    else:
+        individuals = cell['N']
+    return MEMORY_BASE[engine] + MEMORY_PER_OBS[engine] * individuals * T_total
+
+
+def do_file(cell):
+    """Name of the .do file that runs a cell."""
+    design = cell['design']
+    if design.startswith('exp'):
+        return f"experiment{design[3:]}.do"
+    if design == 'endogenous' and cell['full_sample']:
+        return "endogenous2.do"
+    return f"{design}.do"
+
+
+def build_command(cell, engine='stata', template=None, stata=STATA):
+    """
+    Command line for one cell.
+
+    Args:
+        cell: Cell dictionary
+        engine: 'stata' or 'python'
+        template: Optional custom command template (overrides engine)
+        stata: Path to the Stata executable
+
+    Returns:
+        List of arguments
+    """
+    output_dir = cell['output_dir'] or ''
+    if template is not None:
+        return shlex.split(template.format(design=cell['design'], do_file=do_file(cell), N=cell['N'],
+                                           model=cell['model'], rho=cell['rho'], output_dir=output_dir))
+
+    args = [str(cell['N']), cell['model'], cell['rho']]
+    if engine == 'python':
+        command = [sys.executable, "simulate.py", cell['design']] + args
+        if output_dir:
+            command.append(output_dir)
+        if cell['full_sample']:
+            command.append("--full-sample")
+        if cell['reps'] != REPS:
+            command += ["--reps", str(cell['reps'])]
+        if cell['target_mcse'] is not None:
+            command += ["--target-mcse", str(cell['target_mcse']), "--min-reps", str(cell['min_reps'])]
+        if cell['crn']:
+            command.append("--crn")
+        if cell.get('nested'):
+            return command + ["--nested"] + [str(N) for N in cell['nested']] + ["--no-csv"]
+        if cell.get('shard') is not None:
+            return command + ["--shard", f"{cell['shard'] + 1}/{cell['shards']}"]
+        command += ["--checkpoint-dir", CHECKPOINT_DIR, "--resume", "--no-csv"]
+        return command
+
+    command = [stata, "-b", do_file(cell)] + args
+    # Only experiment*.do accept an output directory argument
+    if output_dir and cell['design'].startswith('exp'):
+        command.append(output_dir)
+    return command
+
+
+def merge_command(cell):
+    """Command line that merges the shards of a cell into its results."""
+    command = build_command(dict(cell, shard=None, shards=1), engine='python')
+    command = command[:command.index("--checkpoint-dir")]
+    return command + ["--merge-shards", str(cell['shards']), "--no-csv"]
+
+
+def result_files(cell):
+    """CSV files a .do file writes for one cell."""
+    output_dir = cell['output_dir'] or DESIGN_OUTPUT[cell['design']][1]
+    files = [cell_name(cell) + ".csv"]
+    if cell['full_sample']:
+        files.append(f"fullsample_model{cell['model']}_N{cell['N']}_rho{cell['rho']}.csv")
+    return [os.path.join(output_dir, filename) for filename in files]
+
+
+def import_results(cell):
+    """Add the CSV results of a finished Stata cell to the results store."""
+    conn = results_store.connect()
+    for path in result_files(cell):
+        if os.path.exists(path):
+            results_store.import_csv(conn, path)
+    conn.close()
+
+
+def physical_memory():
+    """Total physical memory in bytes (None if unknown)."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_workers(threads_per_worker=1):
+    """Worker slots that fit in the CPU budget."""
+    return max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+
+def default_memory_budget():
+    """Memory budget for the sweep: 75% of physical memory."""
+    total = physical_memory()
+    return int(0.75 * total) if total else None
+
+
+def schedule(cells):
+    """Order cells biggest-first by estimated cost."""
+    return sorted(cells, key=cell_cost, reverse=True)
+
+
+def run_sweep(cells, engine='stata', template=None, max_workers=None, memory_budget=None,
+              threads_per_worker=1, log_dir=None, dry_run=False, stata=STATA, progress_path=None):
+    """
+    Run all cells on a bounded pool, biggest first.
+
+    A job is started when a worker slot is free and its estimated memory fits in
+    what is left of the budget. If the biggest pending job does not fit, smaller
+    jobs are started in the meantime; a job that exceeds the budget on its own
+    is run when nothing else is running. Cells split into shards are run as
+    one job per shard and merged when their last shard has finished.
+
+    With a progress file, the sweep writes a 'sweep' event with all jobs and a
+    'start' and 'exit' event per job, and passes the file and the cell name to
+    the jobs (SWEEP_PROGRESS, SWEEP_CELL), which add their progress events;
+    monitor.py turns them into throughput and ETAs.
+
+    Args:
+        cells: List of cell dictionaries
+        engine: 'stata' or 'python'
+        template: Optional custom command template
+        max_workers: Maximum concurrent jobs (default: CPUs / threads_per_worker)
+        memory_budget: Memory budget in bytes (default: 75% of physical memory)
+        threads_per_worker: BLAS/OpenMP threads per job
+        log_dir: Directory for per-job stdout/stderr (None: discard)
+        dry_run: Only print the schedule
+        stata: Path to the Stata executable
+        progress_path: Optional progress event file (see progress.py)
+
+    Returns:
+        Dictionary mapping cell name to exit code
+    """
+    if max_workers is None:
+        max_workers = default_workers(threads_per_worker)
+    if memory_budget is None:
+        memory_budget = default_memory_budget() or float('inf')
+
+    env = dict(os.environ)
+    for variable in THREAD_VARIABLES:
+        env[variable] = str(threads_per_worker)
+
+    pending = schedule(expand_shards(cells))
+    if dry_run:
+        for cell in pending:
+            print(f"{cell_name(cell):40s} cost={cell_cost(cell):>12,d}  "
+                  f"memory={cell_memory(cell, engine) / 2**20:8.0f} MB  "
+                  f"{' '.join(build_command(cell, engine, template, stata))}")
+        return {}
+
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    if progress_path:
+        # Jobs may resolve the path from another working directory
+        progress_path = os.path.abspath(progress_path)
+        env[progress.PROGRESS_ENV] = progress_path
+        progress.emit(progress_path, 'sweep', workers=max_workers,
+                      jobs=[{'cell': cell_name(cell), 'reps': cell_reps(cell), 'cost': cell_cost(cell)}
+                            for cell in pending])
+
+    running = []
+    exit_codes = {}
+    shard_codes = {}
+    start_time = time.time()
+
+    while pending or running:
+        # Reap finished jobs
+        for job in list(running):
+            code = job['process'].poll()
+            if code is not None:
+                running.remove(job)
+                if job['log'] is not None:
+                    job['log'].close()
+                exit_codes[job['name']] = code
+                # The Python engine writes into the store itself
+                if code == 0 and engine == 'stata' and template is None:
+                    import_results(job['cell'])
+                if progress_path:
+                    progress.emit(progress_path, 'exit', job['name'], code=code, seconds=time.time() - job['start'])
+                status = "done" if code == 0 else f"FAILED (exit {code})"
+                print(f"[{time.time() - start_time:8.1f}s] {status}: {job['name']} "
+                      f"({time.time() - job['start']:.1f}s)")
+
+                cell = job['cell']
+                if cell.get('shard') is not None:
+                    base = dict(cell, shard=None)
+                    codes = shard_codes.setdefault(cell_name(base), [])
+                    codes.append(code)
+                    if len(codes) == cell['shards']:
+                        merged = 1
+                        if not any(codes):
+                            merged = subprocess.run(merge_command(cell), env=env, stdout=subprocess.DEVNULL,
+                                                    stderr=subprocess.STDOUT).returncode
+                        exit_codes[cell_name(base)] = merged
+                        status = "merged" if merged == 0 else "MERGE FAILED"
+                        print(f"[{time.time() - start_time:8.1f}s] {status}: {cell_name(base)}")
+
+        # Start as many pending jobs as fit, biggest first
+        memory_in_use = sum(job['memory'] for job in running)
+        for cell in list(pending):
+            if len(running) >= max_workers:
+                break
+            memory = cell_memory(cell, engine)
+            if running and memory_in_use + memory > memory_budget:
+                continue
+
+            name = cell_name(cell)
+            log = open(os.path.join(log_dir, f"{name}.log"), 'w') if log_dir else None
+            process = subprocess.Popen(build_command(cell, engine, template, stata),
+                                       env=dict(env, **{progress.CELL_ENV: name}),
+                                       stdout=log or subprocess.DEVNULL, stderr=subprocess.STDOUT)
+            if progress_path:
+                progress.emit(progress_path, 'start', name, reps=cell_reps(cell), pid=process.pid)
+            running.append({'name': name, 'cell': cell, 'process': process, 'memory': memory,
+                            'log': log, 'start': time.time()})
+            pending.remove(cell)
+            memory_in_use += memory
+            print(f"[{time.time() - start_time:8.1f}s] started: {name} ({len(running)} running, "
+                  f"{len(pending)} pending)")
+
+        if running:
+            time.sleep(POLL_INTERVAL)
+
+    return exit_codes
+
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Run a simulation sweep with bounded, cost-aware scheduling.")
+    parser.add_argument('--preset', choices=sorted(PRESETS), help="grid of one of the run_*.sh scripts")
+    parser.add_argument('--designs', nargs='+', choices=sorted(DESIGN_OUTPUT))
+    parser.add_argument('--N', nargs='+', type=int)
+    parser.add_argument('--models', nargs='+', choices=MODELS, default=MODELS)
+    parser.add_argument('--rho', nargs='+', default=RHO_VALUES)
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--full-sample', action='store_true')
+    parser.add_argument('--reps', type=int, default=REPS, help="replications (maximum with --target-mcse)")
+    parser.add_argument('--target-mcse', type=float, default=None,
+                        help="per-cell precision target for the MC standard error of the biases (Python engine)")
+    parser.add_argument('--min-reps', type=int, default=MIN_REPS)
+    parser.add_argument('--crn', action='store_true',
+                        help="share one common-random-numbers shock bank across all cells (Python engine)")
+    parser.add_argument('--nested', action='store_true',
+                        help="one job per curve: simulate at the largest N, estimate on prefixes (Python engine)")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="split every cell into this many parallel jobs (Python engine, counter-based RNG)")
+    parser.add_argument('--engine', choices=['stata', 'python'], default='stata')
+    parser.add_argument('--stata', default=STATA, help="path to the Stata executable")
+    parser.add_argument('--command', default=None, help="custom command template (e.g. a stub for testing)")
+    parser.add_argument('--max-workers', type=int, default=None)
+    parser.add_argument('--memory-gb', type=float, default=None)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--log-dir', default="output/logs")
+    parser.add_argument('--progress', default=progress.PROGRESS_PATH, metavar='FILE',
+                        help="progress event file for monitor.py ('' to disable)")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args(argv)
+
+    preset = PRESETS.get(args.preset, {})
+    args.designs = args.designs or preset.get('designs')
+    args.N = args.N or preset.get('N')
+    args.output_dir = args.output_dir or preset.get('output_dir')
+    args.full_sample = args.full_sample or preset.get('full_sample', False)
+    if not args.designs or not args.N:
+        parser.error("specify --preset or both --designs and --N")
+    if args.target_mcse is not None and (args.engine != 'python' or args.command is not None):
+        parser.error("--target-mcse needs --engine python (the .do files run a fixed number of replications)")
+    if args.crn and (args.engine != 'python' or args.command is not None):
+        parser.error("--crn needs --engine python")
+    if args.shards > 1 and (args.engine != 'python' or args.command is not None
+                            or args.crn or args.target_mcse is not None):
+        parser.error("--shards needs --engine python and cannot be combined with --crn or --target-mcse")
+    if args.nested and (args.engine != 'python' or args.command is not None
+                        or args.shards > 1 or args.target_mcse is not None):
+        parser.error("--nested needs --engine python and cannot be combined with --shards or --target-mcse")
+    return args
+
+
+def main(argv=None):
+    """Main function to run a sweep."""
+    args = parse_args(argv)
+
+    # Jobs run relative to the code/ directory, like the run_*.sh scripts
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    cells = build_grid(args.designs, args.N, args.models, args.rho, args.output_dir, args.full_sample, args.reps,
+                       args.target_mcse, args.min_reps, args.crn, args.shards)
+    if args.nested:
+        cells = nest_cells(cells)
+    max_workers = args.max_workers or default_workers(args.threads_per_worker)
+    memory_budget = args.memory_gb * 2**30 if args.memory_gb else default_memory_budget()
+
+    print("=" * 70)
+    print("SIMULATION SWEEP")
+    print("=" * 70)
+    print(f"Cells: {len(cells)}, engine: {args.engine if args.command is None else 'custom command'}")
+    budget = f"{memory_budget / 2**30:.1f} GB" if memory_budget else "unlimited"
+    print(f"Workers: {max_workers}, threads per worker: {args.threads_per_worker}, memory budget: {budget}")
+    print()
+
+    exit_codes = run_sweep(cells, engine=args.engine, template=args.command, max_workers=max_workers,
+                           memory_budget=memory_budget, threads_per_worker=args.threads_per_worker,
+                           log_dir=args.log_dir, dry_run=args.dry_run, stata=args.stata,
+                           progress_path=args.progress)
+
+    failed = [name for name, code in exit_codes.items() if code != 0]
+    print()
+    print("=" * 70)
+    print(f"Sweep complete: {len(exit_codes) - len(failed)} succeeded, {len(failed)} failed")
+    for name in failed:
+        print(f"  FAILED: {name}")
+    print("=" * 70)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
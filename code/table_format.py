@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+LaTeX Number Formatting for the Al Sadoon et al. (2019) Tables
+==============================================================
+
+Formatting shared by make_table_1.py, make_table_2.py and make_table_3.py:
+five decimals, phantom minus signs so that columns line up, and the first
+significant decimal underlined. Kept free of pandas so that the table scripts
+start quickly.
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import math
+
+
+def is_missing(value):
+    """True for None (NULL in the results store) and NaN."""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def find_first_significant_decimal(value):
+    """
+    Find the position of the first significant (non-zero) digit after the decimal point.
+    
+    Args:
+        value: Numeric value
+    
+    Returns:
+        Position of first significant digit (1-indexed), or None if no significant decimals
+    """
+    if is_missing(value) or value == 0:
+        return None
+    
+    # Get the decimal part
+    decimal_part = abs(value) % 1
+    if decimal_part == 0:
+        return None
+    
+    # Convert to string and find first non-zero digit after decimal
+    decimal_str = f"{decimal_part:.10f}"  # Use more precision to be safe
+    decimal_str = decimal_str[2:]  # Remove "0."
+    
+    for i, digit in enumerate(decimal_str):
+        if digit != '0':
+            return i + 1  # 1-indexed position
+    
+    return None
+
+def format_number_enhanced(value, underline_significant=True, use_centered_alignment=True):
+    """
+    Enhanced number formatting with optional underlining of first significant decimal
+    and centered alignment that preserves decimal alignment.
+    
+    Args:
+        value: Numeric value to format
+        underline_significant: Whether to underline the first significant decimal
+        use_centered_alignment: Whether to use centered alignment (vs math mode)
+    
+    Returns:
+        Formatted string for LaTeX
+    """
+    if is_missing(value):
+        return "---"
+    
+    # Handle zero
+    if value == 0:
+        if use_centered_alignment:
+            return "$\\phantom{-}0.00000$"  # Add phantom minus for alignment in math mode
+        else:
+            return "$0.00000$"
+    
+    # Check if we need scientific notation
+    if abs(value) < 1e-5 and abs(value) > 0:
+        # Use scientific notation
+        formatted = f"{value:.2e}"
+        if "e" in formatted:
+            base, exp = formatted.split("e")
+            exp = int(exp)
+            if use_centered_alignment:
+                if base.startswith('-'):
+                    return f"${base} \\times 10^{{{exp}}}$"
+                else:
+                    return f"$\\phantom{{-}}{base} \\times 10^{{{exp}}}$"
+            else:
+                if base.startswith('-'):
+                    return f"${base} \\times 10^{{{exp}}}$"
+                else:
+                    return f"${base} \\times 10^{{{exp}}}$"
+    
+    # Regular formatting with 5 decimal places
+    formatted = f"{value:.5f}"
+    
+    if underline_significant:
+        # Find the first significant decimal
+        sig_pos = find_first_significant_decimal(value)
+        if sig_pos is not None:
+            # Split the formatted number
+            if '.' in formatted:
+                integer_part, decimal_part = formatted.split('.')
+                if sig_pos <= len(decimal_part):
+                    # Underline the significant digit
+                    sig_digit = decimal_part[sig_pos-1]
+                    new_decimal = (decimal_part[:sig_pos-1] + 
+                                 f"\\underline{{{sig_digit}}}" + 
+                                 decimal_part[sig_pos:])
+                    formatted = f"{integer_part}.{new_decimal}"
+    
+    if use_centered_alignment:
+        # For centered alignment, add phantom minus to positive numbers for consistent spacing
+        # Always wrap in math mode for proper formatting
+        if formatted.startswith('-'):
+            return f"${formatted}$"
+        else:
+            return f"$\\phantom{{-}}{formatted}$"
+    else:
+        # Handle negative signs properly for LaTeX math mode
+        if formatted.startswith('-'):
+            return f"$-{formatted[1:]}$"
+        else:
+            return f"${formatted}$"
+
+def format_mc_error(mcse):
+    """
+    Monte Carlo standard error of a bias, shown in small type after the bias.
+    
+    Args:
+        mcse: Monte Carlo standard error (sd / sqrt(valid replications))
+    
+    Returns:
+        Formatted string for LaTeX, empty if the MC error is missing
+    """
+    if is_missing(mcse):
+        return ""
+    return f" {{\\scriptsize $({mcse:.5f})$}}"
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Cell Telemetry for Al Sadoon et al. (2019) Replication
+======================================================
+
+Wall time and peak memory of one simulation cell, recorded with its results
+so that long sweeps can be planned from data (see hotspots.py). The time of a
+cell is split into phases:
+
+    dgp:      simulating the panels (simulate_panels and dropping the burn-in)
+    moments:  reducing the panels to the GMM sufficient statistics, shared by
+              AB and SYS (gmm.PatternMoments.add)
+    AB, SYS:  building the moment matrices and solving each estimator
+              (including the full-sample estimates)
+
+Telemetry is saved in checkpoints and shards, so a resumed or sharded cell
+reports the time of all its runs. Peak RSS is the largest resident set size
+of any of those processes.
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+PHASES = ['dgp', 'moments', 'AB', 'SYS']
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+class CellTelemetry:
+    """
+    Accumulated wall time per phase, total wall time and peak memory of a cell.
+
+    Args:
+        seconds: Seconds spent so far per phase (see PHASES)
+        wall: Total wall time so far
+        peak_rss_mb: Largest peak RSS seen so far, in MB
+    """
+
+    def __init__(self, seconds=None, wall=0.0, peak_rss_mb=None):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.seconds.update(seconds or {})
+        self.wall = wall
+        self.peak_rss_mb = peak_rss_mb
+        self._started = None
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in the with-block to a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def start(self):
+        """Start counting wall time."""
+        self._started = time.perf_counter()
+
+    def stop(self):
+        """Stop counting wall time and record the peak memory of this process."""
+        self.wall = self.elapsed()
+        self._started = None
+        current = peak_rss_mb()
+        if current is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, current)
+
+    def elapsed(self):
+        """Total wall time, including the running interval."""
+        if self._started is None:
+            return self.wall
+        return self.wall + time.perf_counter() - self._started
+
+    def merge(self, other):
+        """
+        Add the telemetry of another run of the same cell (e.g. another shard).
+
+        Args:
+            other: CellTelemetry
+        """
+        for name, seconds in other.seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.wall += other.wall
+        if other.peak_rss_mb is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, other.peak_rss_mb)
+
+    def state(self):
+        """Telemetry so far as a JSON-safe dictionary (for checkpoints and shards)."""
+        current = peak_rss_mb()
+        peak = self.peak_rss_mb if current is None else max(self.peak_rss_mb or 0.0, current)
+        return {'seconds': dict(self.seconds), 'wall': self.elapsed(), 'peak_rss_mb': peak}
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild the telemetry saved with state()."""
+        return cls(state['seconds'], state['wall'], state['peak_rss_mb'])
+
+    def columns(self, reps):
+        """
+        Results store columns.
+
+        Args:
+            reps: Replications run
+
+        Returns:
+            Dictionary with wall_seconds, <phase>_seconds, seconds_per_rep and peak_rss_mb
+        """
+        columns = {'wall_seconds': self.wall}
+        for name in PHASES:
+            columns[f"{name}_seconds"] = self.seconds[name]
+        columns['seconds_per_rep'] = self.wall / reps if reps else None
+        columns['peak_rss_mb'] = self.peak_rss_mb
+        return columns
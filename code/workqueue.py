@@ -0,0 +1,635 @@
+#!/usr/bin/env python3
+"""
+Multi-Node Work Queue for Al Sadoon et al. (2019) Replication
+=============================================================
+
+A pull-based alternative to sweep.py for spreading a sweep over several
+machines. The grid is split into (cell, replication chunk) tasks; workers on
+any host lease the most expensive pending task, run its replications with
+counter-based random numbers (simulate.run_shard()), renew the lease with
+heartbeats while they work and commit the block summaries back to the queue.
+A task whose lease runs out (the worker died or lost its connection) is
+leased again by the next worker that asks. Chunks start on block boundaries,
+so merging the chunks of a cell gives exactly the result of running it in one
+process (see shards.py). Workers always run in processes started with their
+BLAS/OpenMP threads capped (--threads-per-worker), as NumPy's thread pools are
+sized when it is imported.
+
+Commits are idempotent: a chunk is committed once, later commits of the same
+chunk (a slow worker whose lease had expired) are ignored, and because the
+draws of a replication depend only on its index, every run of a chunk
+commits the same numbers. The worker that finds all chunks of a cell done
+merges them into its results store (INSERT OR REPLACE on the cell key, so a
+second merge writes the same row again).
+
+The broker here (SQLiteBroker) keeps the tasks in one SQLite file. On one
+machine it needs nothing else; on a cluster, put the file on a file system
+with working POSIX locks shared by all hosts. Another broker only has to
+provide the same methods (submit, lease, heartbeat, complete, fail, results,
+mark_merged, retry_failed, tasks).
+
+Usage:
+    python workqueue.py submit --preset table3 [--chunk-reps 100]   # enqueue the N=5000 Table 3 grid
+    python workqueue.py submit --designs exp2 --N 5000 --models B --rho 0.50
+    python workqueue.py work [--processes P] [--wait]                # on every host
+    python workqueue.py work --processes 4 --threads-per-worker 2
+    python workqueue.py status
+    python workqueue.py collect [--store output/results.sqlite]     # merge finished cells into a store
+    python workqueue.py retry                                       # requeue failed tasks
+
+Author: Felipe I. Tappata
+Date: July 2025
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import progress
+import results_store
+from shards import shard_range
+from simulate import DESIGN_OUTPUT, MIN_REPS, REPS, STATS_BLOCK, merge_shard_blocks, result_rows, run_shard
+from sweep import MODELS, PRESETS, RHO_VALUES, THREAD_VARIABLES, build_grid, cell_cost, cell_name
+from telemetry import CellTelemetry
+
+QUEUE_PATH = "output/queue.sqlite"
+
+# Replications per task (rounded to whole STATS_BLOCK blocks)
+CHUNK_REPS = 100
+
+# Seconds a lease lasts without a heartbeat; heartbeats are sent every third of it
+LEASE_SECONDS = 300
+
+# Attempts per task before it is marked failed
+MAX_ATTEMPTS = 3
+
+# Seconds an idle worker waits before asking again
+POLL_SECONDS = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    cell TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    stop INTEGER NOT NULL,
+    cost INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    finished REAL,
+    UNIQUE (spec, start)
+);
+CREATE INDEX IF NOT EXISTS tasks_by_state ON tasks (state, cost);
+CREATE TABLE IF NOT EXISTS cells (
+    name TEXT NOT NULL,
+    spec TEXT PRIMARY KEY,
+    chunks INTEGER NOT NULL,
+    merged REAL
+);
+"""
+
+TASK_COLUMNS = ['id', 'cell', 'spec', 'start', 'stop', 'cost', 'state', 'worker', 'lease_expires', 'attempts',
+                'error', 'finished']
+
+
+def cell_spec(cell):
+    """Canonical JSON of the run description of a cell (the parameters run_shard() needs)."""
+    return json.dumps({'design': cell['design'], 'N': cell['N'], 'model': cell['model'], 'rho': cell['rho'],
+                       'reps': cell['reps'], 'full_sample': cell['full_sample']}, sort_keys=True)
+
+
+def chunk_tasks(cell, chunk_reps=CHUNK_REPS):
+    """
+    Split one cell into replication chunks.
+
+    Args:
+        cell: Cell dictionary (see sweep.build_grid())
+        chunk_reps: Target replications per chunk
+
+    Returns:
+        List of task dictionaries (cell name, spec, start, stop, cost)
+    """
+    chunks = max(1, -(-cell['reps'] // max(chunk_reps, STATS_BLOCK)))
+    base = dict(cell, shards=1, shard=None)
+    tasks = []
+    for index in range(chunks):
+        start, stop = shard_range(cell['reps'], index, chunks, STATS_BLOCK)
+        if stop > start:
+            tasks.append({'cell': cell_name(base), 'spec': cell_spec(cell), 'start': start, 'stop': stop,
+                          'cost': cell_cost(base) * (stop - start) // cell['reps']})
+    return tasks
+
+
+class SQLiteBroker:
+    """
+    Task queue in one SQLite file (the local stand-in broker).
+
+    Every method is one short transaction, so any number of worker processes
+    can share the file. The connection may be used from several threads (the
+    worker's heartbeat thread).
+
+    Args:
+        path: Queue database path
+        max_attempts: Leases per task before it is marked failed
+    """
+
+    def __init__(self, path=QUEUE_PATH, max_attempts=MAX_ATTEMPTS):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _write(self, statements):
+        """
+        Run statements in one write transaction.
+
+        Args:
+            statements: Function of the connection run between BEGIN IMMEDIATE and COMMIT
+
+        Returns:
+            Whatever the function returns
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def submit(self, tasks):
+        """
+        Enqueue tasks.
+
+        Cells already in the queue are left as they are (with their own
+        chunks, done or not), so submitting a grid again only adds its new
+        cells.
+
+        Args:
+            tasks: Task dictionaries (see chunk_tasks())
+
+        Returns:
+            Number of tasks added
+        """
+        def insert(conn):
+            queued = {spec for (spec,) in conn.execute("SELECT spec FROM cells")}
+            new = [task for task in tasks if task['spec'] not in queued]
+            chunks = {}
+            for task in new:
+                chunks[(task['cell'], task['spec'])] = chunks.get((task['cell'], task['spec']), 0) + 1
+            conn.executemany("INSERT INTO cells (name, spec, chunks) VALUES (?, ?, ?)",
+                             [(name, spec, count) for (name, spec), count in chunks.items()])
+            conn.executemany("INSERT INTO tasks (cell, spec, start, stop, cost) VALUES (?, ?, ?, ?, ?)",
+                             [(task['cell'], task['spec'], task['start'], task['stop'], task['cost'])
+                              for task in new])
+            return len(new)
+        return self._write(insert)
+
+    def lease(self, worker, lease_seconds=LEASE_SECONDS):
+        """
+        Lease the most expensive task that is pending or whose lease has expired.
+
+        Expired leases of tasks out of attempts are marked failed instead.
+
+        Args:
+            worker: Worker name
+            lease_seconds: Seconds until the lease expires without a heartbeat
+
+        Returns:
+            Task dictionary (with its spec decoded), or None if there is nothing to lease
+        """
+        def take(conn):
+            now = time.time()
+            conn.execute("UPDATE tasks SET state = 'failed', error = 'lease expired on the last attempt' "
+                         "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?", (now, self.max_attempts))
+            row = conn.execute(f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks "
+                               "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                               "ORDER BY cost DESC, id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE tasks SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                         "WHERE id = ?", (worker, now + lease_seconds, row[0]))
+            task = dict(zip(TASK_COLUMNS, row))
+            task.update(state='leased', worker=worker, attempts=task['attempts'] + 1)
+            return task
+        task = self._write(take)
+        if task is not None:
+            task['spec'] = json.loads(task['spec'])
+        return task
+
+    def heartbeat(self, task_id, worker, lease_seconds=LEASE_SECONDS):
+        """
+        Extend a lease.
+
+        Returns:
+            False if the worker no longer holds the lease (it expired and the
+            task was leased again, or it is done)
+        """
+        return self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET lease_expires = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+            (time.time() + lease_seconds, task_id, worker)).rowcount == 1)
+
+    def complete(self, task_id, worker, result):
+        """
+        Commit the result of a task, once.
+
+        The commit is accepted from any worker as long as the task is not done
+        yet: every run of a chunk produces the same result.
+
+        Args:
+            task_id: Task id
+            worker: Worker name
+            result: JSON-safe result
+
+        Returns:
+            True if this call committed the task, False if it was already done
+        """
+        return self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET state = 'done', worker = ?, result = ?, error = NULL, finished = ? "
+            "WHERE id = ? AND state != 'done'", (worker, json.dumps(result), time.time(), task_id)).rowcount == 1)
+
+    def fail(self, task_id, worker, error):
+        """
+        Give a task back after an error: pending again, or failed when out of attempts.
+
+        Returns:
+            The new state, or None if the worker no longer held the lease
+        """
+        def give_back(conn):
+            row = conn.execute("SELECT attempts FROM tasks WHERE id = ? AND worker = ? AND state = 'leased'",
+                               (task_id, worker)).fetchone()
+            if row is None:
+                return None
+            state = 'failed' if row[0] >= self.max_attempts else 'pending'
+            conn.execute("UPDATE tasks SET state = ?, error = ?, lease_expires = NULL WHERE id = ?",
+                         (state, error, task_id))
+            return state
+        return self._write(give_back)
+
+    def retry_failed(self):
+        """Requeue all failed tasks with their attempts reset; returns how many."""
+        return self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET state = 'pending', attempts = 0, worker = NULL, lease_expires = NULL "
+            "WHERE state = 'failed'").rowcount)
+
+    def results(self, spec):
+        """
+        Results of all chunks of a cell, if all of them are done.
+
+        Args:
+            spec: Cell spec (JSON string, see cell_spec())
+
+        Returns:
+            List of (start, stop, result) in replication order, or None while a chunk is not done
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT start, stop, state, result FROM tasks WHERE spec = ? ORDER BY start",
+                                      (spec,)).fetchall()
+        if not rows or any(state != 'done' for _, _, state, _ in rows):
+            return None
+        return [(start, stop, json.loads(result)) for start, stop, _, result in rows]
+
+    def mark_merged(self, spec):
+        """Record that a cell has been merged into a results store."""
+        self._write(lambda conn: conn.execute("UPDATE cells SET merged = ? WHERE spec = ?", (time.time(), spec)))
+
+    def cells(self):
+        """List of (name, spec, chunks, merged time or None) of all cells."""
+        with self._lock:
+            return self._conn.execute("SELECT name, spec, chunks, merged FROM cells ORDER BY name").fetchall()
+
+    def tasks(self):
+        """All tasks as dictionaries (without results)."""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks ORDER BY id").fetchall()
+        return [dict(zip(TASK_COLUMNS, row)) for row in rows]
+
+
+class Heartbeat(threading.Thread):
+    """
+    Background thread that keeps a lease alive while its task runs.
+
+    Args:
+        broker: Broker holding the lease
+        task: Leased task
+        lease_seconds: Lease length; a heartbeat is sent every third of it
+    """
+
+    def __init__(self, broker, task, lease_seconds=LEASE_SECONDS):
+        super().__init__(daemon=True)
+        self.broker = broker
+        self.task = task
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                if not self.broker.heartbeat(self.task['id'], self.task['worker'], self.lease_seconds):
+                    self.lost = True
+            except sqlite3.Error:
+                # A busy queue is retried on the next beat; the lease has two more to go
+                pass
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_task(task, progress_path=None):
+    """
+    Run the replications of one chunk.
+
+    Args:
+        task: Leased task
+        progress_path: Optional progress event file (see progress.py)
+
+    Returns:
+        JSON-safe result: block states per estimator and the telemetry of the run
+    """
+    spec = task['spec']
+    telemetry = CellTelemetry()
+    reporter = None
+    if progress_path:
+        reporter = progress.ProgressReporter(progress_path, f"{task['cell']}_reps{task['start']}-{task['stop'] - 1}",
+                                             task['stop'] - task['start'])
+    blocks = run_shard(spec['design'], spec['N'], spec['model'], float(spec['rho']), task['start'], task['stop'],
+                       full_sample=spec['full_sample'], telemetry=telemetry, progress=reporter)
+    return {'blocks': blocks, 'telemetry': telemetry.state()}
+
+
+def merge_cell(spec, chunks, conn):
+    """
+    Merge the chunks of a cell and write its results into a results store.
+
+    Args:
+        spec: Cell spec (JSON string)
+        chunks: List returned by SQLiteBroker.results()
+        conn: Results store connection
+
+    Returns:
+        List of the result file names written (as simulate.py would name them)
+    """
+    cell = json.loads(spec)
+    blocks = {name: [state for _, _, result in chunks for state in result['blocks'][name]]
+              for name in chunks[0][2]['blocks']}
+    telemetry = CellTelemetry()
+    for _, _, result in chunks:
+        telemetry.merge(CellTelemetry.from_state(result['telemetry']))
+    rows = result_rows(cell['design'], cell['model'], cell['rho'], merge_shard_blocks(blocks), cell['N'],
+                       cell['full_sample'], telemetry)
+    results_store.write_results(conn, [dict(row, **results_store.parse_filename(filename))
+                                       for filename, row in rows])
+    return [filename for filename, _ in rows]
+
+
+def collect(broker, conn):
+    """
+    Merge every finished cell of the queue into a results store.
+
+    Args:
+        broker: Queue
+        conn: Results store connection
+
+    Returns:
+        Number of cells written
+    """
+    written = 0
+    for _, spec, _, _ in broker.cells():
+        chunks = broker.results(spec)
+        if chunks is not None:
+            merge_cell(spec, chunks, conn)
+            broker.mark_merged(spec)
+            written += 1
+    return written
+
+
+def default_worker_name():
+    """Worker name: host and process id."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(broker, store=results_store.STORE_PATH, worker=None, lease_seconds=LEASE_SECONDS, wait=False,
+               progress_path=None):
+    """
+    Lease, run and commit tasks until the queue is finished.
+
+    Without wait, the worker returns once no task is pending or leased by
+    anyone; while other workers hold leases it keeps polling, as their tasks
+    come back if they die.
+
+    Args:
+        broker: Queue
+        store: Results store into which finished cells are merged
+        worker: Worker name (default: host:pid)
+        lease_seconds: Lease length
+        wait: Keep polling for new tasks when the queue is finished
+        progress_path: Optional progress event file
+
+    Returns:
+        Number of tasks this worker committed
+    """
+    worker = worker or default_worker_name()
+    committed = 0
+    while True:
+        task = broker.lease(worker, lease_seconds)
+        if task is None:
+            if not wait and not any(other['state'] in ('pending', 'leased') for other in broker.tasks()):
+                return committed
+            time.sleep(POLL_SECONDS)
+            continue
+
+        label = f"{task['cell']} replications {task['start']}-{task['stop'] - 1}"
+        print(f"[{worker}] leased {label} (attempt {task['attempts']})", flush=True)
+        heartbeat = Heartbeat(broker, task, lease_seconds)
+        heartbeat.start()
+        try:
+            result = run_task(task, progress_path)
+        except Exception as error:
+            heartbeat.stop()
+            state = broker.fail(task['id'], worker, f"{type(error).__name__}: {error}")
+            print(f"[{worker}] FAILED {label} ({state}):\n{traceback.format_exc()}", flush=True)
+            continue
+        except BaseException:
+            heartbeat.stop()
+            broker.fail(task['id'], worker, "interrupted")
+            raise
+        heartbeat.stop()
+
+        if not broker.complete(task['id'], worker, result):
+            print(f"[{worker}] {label} was already committed", flush=True)
+            continue
+        committed += 1
+        note = " (lease had expired)" if heartbeat.lost else ""
+        print(f"[{worker}] committed {label}{note}", flush=True)
+
+        spec = json.dumps(task['spec'], sort_keys=True)
+        chunks = broker.results(spec)
+        if chunks is not None:
+            conn = results_store.connect(store)
+            merge_cell(spec, chunks, conn)
+            conn.close()
+            broker.mark_merged(spec)
+            print(f"[{worker}] merged {task['cell']} into {store}", flush=True)
+
+
+def print_status(broker):
+    """Print the task counts, the active leases and the cells of the queue."""
+    tasks = broker.tasks()
+    now = time.time()
+    counts = {state: sum(task['state'] == state for task in tasks) for state in ['pending', 'leased', 'done', 'failed']}
+    expired = sum(task['state'] == 'leased' and task['lease_expires'] < now for task in tasks)
+    cost = sum(task['cost'] for task in tasks)
+    done = sum(task['cost'] for task in tasks if task['state'] == 'done')
+    print("=" * 70)
+    print(f"WORK QUEUE - {broker.path}")
+    print("=" * 70)
+    print(f"Tasks: {counts['done']} done, {counts['leased']} leased ({expired} expired), "
+          f"{counts['pending']} pending, {counts['failed']} failed; cost done {done / cost if cost else 0.0:.1%}")
+
+    leased = [task for task in tasks if task['state'] == 'leased']
+    if leased:
+        print()
+        print(f"{'worker':<30} {'task':<45} {'attempt':>7} {'lease':>8}")
+        for task in sorted(leased, key=lambda task: task['worker']):
+            label = f"{task['cell']} {task['start']}-{task['stop'] - 1}"
+            print(f"{task['worker']:<30} {label:<45} {task['attempts']:>7} {task['lease_expires'] - now:>7.0f}s")
+    for task in tasks:
+        if task['state'] == 'failed':
+            print(f"  FAILED: {task['cell']} {task['start']}-{task['stop'] - 1}: {task['error']}")
+
+    print()
+    cells = broker.cells()
+    finished = sum(broker.results(spec) is not None for _, spec, _, _ in cells)
+    merged = sum(merged is not None for _, _, _, merged in cells)
+    print(f"Cells: {len(cells)}, {finished} finished, {merged} merged into a results store")
+    print("=" * 70)
+
+
+def threads_capped(threads):
+    """Whether this process was started with its BLAS/OpenMP threads capped at threads."""
+    return all(os.environ.get(variable) == str(threads) for variable in THREAD_VARIABLES)
+
+
+def worker_command(args, index=0):
+    """Command line of one local worker process with the same options."""
+    command = [sys.executable, os.path.abspath(__file__), '--queue', os.path.abspath(args.queue), 'work',
+               '--store', os.path.abspath(args.store), '--lease', str(args.lease),
+               '--threads-per-worker', str(args.threads_per_worker)]
+    if args.worker:
+        command += ['--worker', args.worker if args.processes == 1 else f"{args.worker}-{index}"]
+    if args.wait:
+        command.append('--wait')
+    if args.progress:
+        command += ['--progress', os.path.abspath(args.progress)]
+    return command
+
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Pull-based work queue for running a sweep on several machines.")
+    parser.add_argument('--queue', default=QUEUE_PATH, help="queue database")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit = commands.add_parser('submit', help="split a grid into tasks and enqueue them")
+    submit.add_argument('--preset', choices=sorted(PRESETS), help="grid of one of the run_*.sh scripts")
+    submit.add_argument('--designs', nargs='+', choices=sorted(DESIGN_OUTPUT))
+    submit.add_argument('--N', nargs='+', type=int)
+    submit.add_argument('--models', nargs='+', choices=MODELS, default=MODELS)
+    submit.add_argument('--rho', nargs='+', default=RHO_VALUES)
+    submit.add_argument('--full-sample', action='store_true')
+    submit.add_argument('--reps', type=int, default=REPS)
+    submit.add_argument('--chunk-reps', type=int, default=CHUNK_REPS,
+                        help=f"replications per task (rounded to blocks of {STATS_BLOCK})")
+
+    work = commands.add_parser('work', help="lease and run tasks until the queue is finished")
+    work.add_argument('--store', default=results_store.STORE_PATH, help="results store for finished cells")
+    work.add_argument('--processes', type=int, default=1, help="worker processes to start on this machine")
+    work.add_argument('--threads-per-worker', type=int, default=1)
+    work.add_argument('--lease', type=float, default=LEASE_SECONDS, help="lease length in seconds")
+    work.add_argument('--worker', default=None, help="worker name (default: host:pid)")
+    work.add_argument('--wait', action='store_true', help="keep polling for new tasks")
+    work.add_argument('--progress', default=os.environ.get(progress.PROGRESS_ENV), metavar='FILE',
+                      help="append progress events to this file (see monitor.py)")
+
+    commands.add_parser('status', help="show the tasks and leases")
+
+    collect_parser = commands.add_parser('collect', help="merge all finished cells into a results store")
+    collect_parser.add_argument('--store', default=results_store.STORE_PATH)
+
+    commands.add_parser('retry', help="requeue failed tasks")
+    args = parser.parse_args(argv)
+
+    if args.command == 'submit':
+        preset = PRESETS.get(args.preset, {})
+        args.designs = args.designs or preset.get('designs')
+        args.N = args.N or preset.get('N')
+        args.full_sample = args.full_sample or preset.get('full_sample', False)
+        if not args.designs or not args.N:
+            parser.error("specify --preset or both --designs and --N")
+        if args.chunk_reps < 1 or args.reps < 1:
+            parser.error("--reps and --chunk-reps must be positive")
+    if args.command == 'work' and (args.processes < 1 or args.threads_per_worker < 1 or args.lease <= 0):
+        parser.error("--processes, --threads-per-worker and --lease must be positive")
+    return args
+
+
+def main(argv=None):
+    """Main function of the work queue."""
+    args = parse_args(argv)
+
+    # Tasks run relative to the code/ directory, like the sweep jobs
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    broker = SQLiteBroker(args.queue)
+
+    if args.command == 'submit':
+        cells = build_grid(args.designs, args.N, args.models, args.rho, full_sample=args.full_sample,
+                           reps=args.reps, min_reps=MIN_REPS)
+        tasks = [task for cell in cells for task in chunk_tasks(cell, args.chunk_reps)]
+        added = broker.submit(tasks)
+        print(f"Queued {added} of {len(tasks)} tasks ({len(cells)} cells) in {args.queue}")
+    elif args.command == 'work' and (args.processes > 1 or not threads_capped(args.threads_per_worker)):
+        # NumPy has already started its thread pools here, so the cap only holds in new processes
+        env = dict(os.environ, **{variable: str(args.threads_per_worker) for variable in THREAD_VARIABLES})
+        processes = [subprocess.Popen(worker_command(args, index), env=env) for index in range(args.processes)]
+        codes = [process.wait() for process in processes]
+        broker.close()
+        return max(codes)
+    elif args.command == 'work':
+        committed = run_worker(broker, args.store, args.worker, args.lease, args.wait, args.progress)
+        print(f"Worker {args.worker or default_worker_name()} done: {committed} tasks committed")
+    elif args.command == 'status':
+        print_status(broker)
+    elif args.command == 'collect':
+        conn = results_store.connect(args.store)
+        written = collect(broker, conn)
+        conn.close()
+        print(f"Merged {written} finished cells into {args.store}")
+    elif args.command == 'retry':
+        print(f"Requeued {broker.retry_failed()} failed tasks")
+    broker.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Shared fixtures for the tests of the Python engine in code/.
+
+The modules in code/ are flat scripts that import each other by name and
+resolve output/ paths relative to code/, so the tests put code/ on the path
+and run from there.
+"""
+
+import os
+import sys
+
+import pytest
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code")
+sys.path.insert(0, CODE_DIR)
+
+import results_store  # noqa: E402
+
+# Archived result directories, as absolute paths
+ARCHIVE_DIRS = [os.path.join(CODE_DIR, directory) for directory in results_store.PARTIAL_DIRS]
+
+
+@pytest.fixture
+def in_code_dir(monkeypatch):
+    """Run the test from code/, like the scripts."""
+    monkeypatch.chdir(CODE_DIR)
+    return CODE_DIR
+
+
+@pytest.fixture(scope='session')
+def archived_cells():
+    """Keys of all archived cells (read into an in-memory store)."""
+    conn = results_store.connect(":memory:", archive=ARCHIVE_DIRS)
+    keys = set(results_store.load_index(conn))
+    conn.close()
+    return keys
@@ -0,0 +1,54 @@
+"""Tests of the speed regression and Stata equivalence checks of benchmark.py."""
+
+import math
+import statistics
+
+import pytest
+
+import benchmark
+
+
+def test_only_throughput_losses_beyond_the_tolerance_are_regressions():
+    baseline = {'dgp N=200': 100.0, 'AB N=200': 10.0, 'tables': 2.0}
+    results = {'dgp N=200': 71.0, 'AB N=200': 6.0, 'tables': 5.0, 'SYS N=200': 1.0}
+    assert benchmark.find_regressions(results, baseline, tolerance=0.3) == [('AB N=200', 6.0, 10.0)]
+
+
+def test_differences_are_scaled_by_the_mc_errors_of_both_runs():
+    reference = {'AB_bias': 0.02, 'AB_se': 0.2, 'AB_valid': 500}
+    summary = {'bias': 0.05, 'sd': 0.22, 'mcse': 0.22 / math.sqrt(400), 'valid': 400, 'kurtosis': 3.0}
+    (_, _, _, z_bias), (_, _, _, z_sd) = benchmark.compare_estimator(reference, summary, 'AB')
+    assert z_bias == pytest.approx(0.03 / math.hypot(0.2 / math.sqrt(500), 0.22 / math.sqrt(400)))
+    assert z_sd == pytest.approx(0.02 / math.hypot(0.2 / math.sqrt(998), 0.22 / math.sqrt(798)))
+
+    # Heavy tails widen the error of the sds only
+    heavy = benchmark.compare_estimator(reference, dict(summary, kurtosis=33.0), 'AB')
+    assert (heavy[0][3], heavy[1][3]) == (pytest.approx(z_bias), pytest.approx(z_sd / 4))
+
+    # Cells without enough valid replications are not compared
+    assert benchmark.compare_estimator(dict(reference, AB_valid=1), summary, 'AB') == []
+
+
+@pytest.mark.parametrize('t, df, p', [(1.0, 1, 0.5), (2.0, 2, 1 - 2 / math.sqrt(6)), (3.182446, 3, 0.05),
+                                      (2.776445, 4, 0.05), (2.228139, 10, 0.05)])
+def test_student_t_p_values(t, df, p):
+    assert benchmark.student_t_p_value(t, df) == pytest.approx(p, abs=1e-6)
+    assert benchmark.student_t_p_value(-t, df) == pytest.approx(p, abs=1e-6)
+
+
+def test_groups_are_tested_against_the_spread_between_seeds():
+    # Every seed moves all cells of a group together: the cells count once per seed
+    z_values = {('endogenous', 500, 'AB_se'): [[-1.0, -1.2], [-0.8, -1.0], [-1.5, -1.7]],
+                ('endogenous', 500, 'AB_bias'): [[0.5, -0.5], [1.5, 0.5], [-1.5, -2.5]]}
+    (group, mean, t, p), (_, mean_se, t_se, p_se) = benchmark.pool_groups(z_values)
+    assert group == ('endogenous', 500, 'AB_bias')
+    assert mean == pytest.approx(-1 / 3)
+    assert t == pytest.approx(mean / math.sqrt(statistics.variance([0, 1, -2]) * (1 + 1 / 3)))
+    assert p == pytest.approx(benchmark.student_t_p_value(t, 2))
+    assert mean_se == pytest.approx(-1.2)
+    assert t_se == pytest.approx(-1.2 / math.sqrt(statistics.variance([-1.1, -0.9, -1.6]) * (1 + 1 / 3)))
+    assert p_se < p
+
+    # One seed gives no spread to test against
+    (_, mean, t, p), = benchmark.pool_groups({('exp1', 500, 'SYS_se'): [[1.0, 2.0]]})
+    assert mean == 1.5 and math.isnan(t) and math.isnan(p)
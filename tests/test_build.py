@@ -0,0 +1,54 @@
+"""Tests of the incremental rebuild decisions of build.py."""
+
+import build
+import results_store
+
+TABLE2 = "output/tables/table2.tex"
+
+
+def table2_cell(rho='0.25', bias=0.01):
+    return {'experiment': 2, 'selection': 'endogenous', 'model': 'A', 'N': 500, 'rho': rho, 'engine': 'python',
+            'AB_bias': bias, 'AB_se': 0.1, 'SYS_bias': bias, 'SYS_se': 0.1, 'AB_valid': 500, 'SYS_valid': 500}
+
+
+def built(conn, manifest):
+    """Mark every stale artifact as built, like build.build() does."""
+    stale = build.stale_artifacts(conn, manifest)
+    for path in stale:
+        manifest['artifacts'][path] = 'built'
+    return stale
+
+
+def test_only_changed_inputs_are_stale(tmp_path, in_code_dir):
+    conn = results_store.connect(str(tmp_path / "results.sqlite"), archive=None)
+    results_store.write_result(conn, table2_cell())
+    manifest = build.load_manifest(str(tmp_path / "manifest.json"))
+    assert built(conn, manifest) == set(build.ARTIFACTS)
+    assert built(conn, manifest) == set()
+
+    # Same values again (e.g. a rerun with the same numbers) rebuild nothing
+    results_store.write_result(conn, table2_cell())
+    assert built(conn, manifest) == set()
+    results_store.write_result(conn, table2_cell(bias=0.02))
+    assert built(conn, manifest) == {TABLE2}
+    conn.close()
+
+
+def test_rebuilt_store_rebuilds_everything(tmp_path, in_code_dir):
+    path = tmp_path / "results.sqlite"
+    conn = results_store.connect(str(path), archive=None)
+    for bias in [0.01, 0.02, 0.03]:
+        results_store.write_result(conn, table2_cell(bias=bias))
+    manifest = build.load_manifest(str(tmp_path / "manifest.json"))
+    built(conn, manifest)
+    conn.close()
+
+    # A new store whose version counter reaches the old one, with a changed cell
+    path.unlink()
+    conn = results_store.connect(str(path), archive=None)
+    for rho in ['0.25', '0.50', '0.75', '0.25']:
+        results_store.write_result(conn, table2_cell(rho, bias=0.05))
+    assert results_store.changed_since(conn, 0)[1] >= manifest['version']
+    assert built(conn, manifest) == set(build.ARTIFACTS)
+    assert manifest['store'] == results_store.get_meta(conn, 'store_id')
+    conn.close()
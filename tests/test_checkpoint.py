@@ -0,0 +1,43 @@
+"""Tests of checkpointed runs: resume bit-identity and runs that do not match the checkpoint."""
+
+import pytest
+
+import dgp
+import simulate
+
+
+def run(checkpoint, resume=False, reps=60, seed=11):
+    return simulate.run_cell('endogenous', 200, 'B', 0.5, reps=reps, seed=seed, batch_size=20,
+                             checkpoint=str(checkpoint), resume=resume)
+
+
+def states(stats):
+    return {name: running.state() for name, running in stats.items()}
+
+
+def test_resume_is_bit_identical(tmp_path, monkeypatch):
+    checkpoint = tmp_path / "cell.jsonl"
+    whole = states(run(checkpoint))
+
+    # Keep the header and the first batch, plus a line cut off mid-write
+    lines = checkpoint.read_text().split('\n')
+    checkpoint.write_text('\n'.join(lines[:2]) + '\n' + lines[2][:40])
+    draws = []
+    simulate_panels = dgp.simulate_panels
+    monkeypatch.setattr(dgp, 'simulate_panels', lambda *args: draws.append(args[4]) or simulate_panels(*args))
+    assert states(run(checkpoint, resume=True)) == whole
+    assert draws == [20, 20]
+    assert len(checkpoint.read_text().strip().split('\n')) == 1 + 3
+
+
+def test_checkpoint_of_another_run_starts_over(tmp_path, capsys):
+    checkpoint = tmp_path / "cell.jsonl"
+    run(checkpoint, reps=40)
+    resumed = states(run(checkpoint, resume=True, reps=60))
+    assert "different run" in capsys.readouterr().out
+    assert resumed == states(run(tmp_path / "fresh.jsonl", reps=60))
+
+
+def test_resume_needs_a_checkpoint_directory():
+    with pytest.raises(SystemExit):
+        simulate.parse_args(['endogenous', '500', 'A', '0.25', '--resume'])
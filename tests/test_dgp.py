@@ -0,0 +1,109 @@
+"""Tests of the data generating process: shapes, selection and reproducibility of the draws."""
+
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+import dgp
+
+
+@pytest.mark.parametrize('design', ['exp1', 'endogenous'])
+@pytest.mark.parametrize('model', ['A', 'B'])
+def test_panel_shapes(design, model):
+    params = dgp.get_design(design)
+    reps, N = 3, 40
+    panels = dgp.simulate_panels(params, N, model, 0.5, reps, np.random.default_rng(1))
+    assert panels['alpha_i0'].shape == panels['eta_i'].shape == (reps, N)
+    for name in ['eps_it', 'u_it', 'z_it', 'd', 'y_star', 'y']:
+        assert panels[name].shape == (reps, N, params['T_total'])
+
+    panels = dgp.drop_burn_in(panels, params)
+    assert panels['y'].shape == (reps, N, params['T'])
+    assert panels['alpha_i0'].shape == (reps, N)
+    assert np.array_equal(np.isnan(panels['y']), ~panels['d'].astype(bool))
+    assert np.all(np.isfinite(panels['y_star']))
+
+
+def test_outcome_is_the_ar1_of_the_do_files():
+    params = dgp.get_design('endogenous')
+    rho = 0.75
+    panels = dgp.simulate_panels(params, 50, 'A', rho, 2, np.random.default_rng(2))
+    y_star, innovation = panels['y_star'], 2 + panels['alpha_i'][..., None] + panels['eps_it']
+    np.testing.assert_allclose(y_star[..., 0], innovation[..., 0] / (1 - rho))
+    np.testing.assert_allclose(y_star[..., 1:] - rho * y_star[..., :-1], innovation[..., 1:])
+
+
+def test_static_selection_rate():
+    # d_it* = a - z_it - eta_i - u_it is N(a, 3): a = 1.794 selects 85%
+    params = dgp.get_design('endogenous')
+    panels = dgp.simulate_panels(params, 2000, 'A', 0.5, 10, np.random.default_rng(3))
+    expected = NormalDist().cdf(params['a_param'] / np.sqrt(3))
+    assert abs(panels['d'].mean() - expected) < 0.005
+
+
+def test_same_seed_same_panels():
+    params = dgp.get_design('endogenous')
+    first, second, other = [dgp.simulate_panels(params, 30, 'B', 0.5, 2, np.random.default_rng(seed))
+                            for seed in [5, 5, 6]]
+    for name in first:
+        assert np.array_equal(first[name], second[name], equal_nan=True)
+    assert not np.array_equal(first['y_star'], other['y_star'])
+
+
+def test_counter_shocks_do_not_depend_on_the_other_replications():
+    T_total = dgp.get_design('endogenous')['T_total']
+    whole = dgp.counter_shocks(30, T_total, 0, 4, seed=7)
+    part = dgp.counter_shocks(30, T_total, 2, 4, seed=7)
+    assert whole.keys() == part.keys()
+    for name, values in whole.items():
+        assert values.shape[0] == 4
+        assert np.array_equal(values[2:], part[name])
+
+
+def test_stationary_selection_probability_is_the_long_run_rate():
+    # Model B selection after a long burn-in reaches the stationary rate given eta_i
+    params = dgp.get_design('endogenous', T_total=60)
+    panels = dgp.simulate_panels(params, 4000, 'B', 0.5, 5, np.random.default_rng(3))
+    expected = dgp.stationary_selection_probability(params, panels['eta_i']).mean()
+    assert abs(panels['d'][..., -1].mean() - expected) < 0.01
+
+    # With stationary initial conditions the rate holds from the first period
+    params = dgp.get_design('endogenous', init='stationary')
+    panels = dgp.simulate_panels(params, 4000, 'B', 0.5, 5, np.random.default_rng(3))
+    expected = dgp.stationary_selection_probability(params, panels['eta_i']).mean()
+    assert abs(panels['d'][..., 0].mean() - expected) < 0.01
+
+
+@pytest.mark.parametrize('rho', [0.5, 0.9])
+def test_stationary_init_draws_the_stationary_outcome(rho):
+    params = dgp.get_design('endogenous', init='stationary')
+    panels = dgp.simulate_panels(params, 2000, 'A', rho, 5, np.random.default_rng(4))
+    assert panels['y_star'].shape[-1] == params['T']
+
+    # Around (2 + alpha_i)/(1-rho), the outcome has variance Var(eps_it)/(1-rho^2) in every period
+    deviation = panels['y_star'] - ((2 + panels['alpha_i']) / (1 - rho))[..., None]
+    variance = np.var(panels['eps_it']) / (1 - rho ** 2)
+    for t in [0, params['T'] - 1]:
+        assert abs(deviation[..., t].mean()) < 0.05 * np.sqrt(variance)
+        np.testing.assert_allclose(deviation[..., t].var(), variance, rtol=0.05)
+
+
+def test_antithetic_pairs_mirror_the_first_draw():
+    T_total = dgp.get_design('endogenous')['T_total']
+    shocks = dgp.variance_reduced_shocks(5, T_total, 4, np.random.default_rng(6), 'antithetic', nonstationary=True)
+    for name, values in shocks.items():
+        mirrored = 1 - values[::2] if name in dgp.NONSTATIONARY_UNIFORMS else -values[::2]
+        assert np.array_equal(values[1::2], mirrored)
+
+
+def test_latin_hypercube_blocks_take_every_stratum_once():
+    T_total = dgp.get_design('endogenous')['T_total']
+    size = dgp.SAMPLING_UNITS['lhs']
+    shocks = dgp.variance_reduced_shocks(3, T_total, 2 * size, np.random.default_rng(7), 'lhs')
+    for values in shocks.values():
+        strata = np.floor(dgp._normal_cdf(values) * size).reshape((2, size) + values.shape[1:])
+        assert np.array_equal(np.sort(strata, axis=1), np.broadcast_to(
+            np.arange(size).reshape((1, size) + (1,) * (values.ndim - 1)), strata.shape))
+    with pytest.raises(ValueError, match="multiple of 10"):
+        dgp.variance_reduced_shocks(3, T_total, 15, np.random.default_rng(7), 'lhs')
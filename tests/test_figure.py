@@ -0,0 +1,28 @@
+"""Tests of the pgfplots Figure 1 panels of make_figure_1.py."""
+
+import make_figure_1
+import results_store
+
+
+def cell(selection, N, rho, AB_bias, SYS_bias):
+    return {'experiment': 0, 'selection': selection, 'model': 'A', 'N': N, 'rho': rho, 'engine': 'python',
+            'AB_bias': AB_bias, 'SYS_bias': SYS_bias}
+
+
+def test_panels_plot_the_biases_of_their_cells_by_n(tmp_path, monkeypatch):
+    conn = results_store.connect(":memory:", archive=None)
+    for row in [cell('endogenous', 400, 0.25, 0.02, 0.03), cell('endogenous', 200, 0.25, 0.01, float('nan')),
+                cell('full_sample', 200, 0.25, -0.01, -0.02), cell('endogenous', 500, 0.25, 9.0, 9.0),
+                cell('endogenous', 200, 0.5, 9.0, 9.0)]:
+        results_store.write_result(conn, row)
+    series = make_figure_1.select_series(results_store.query_results(conn, **make_figure_1.panel_filters(0.25)))
+    assert series == {'AB (all)': [(200, -0.01)], 'AB (select)': [(200, 0.01), (400, 0.02)],
+                      'System (all)': [(200, -0.02)], 'System (select)': [(400, 0.03)]}
+
+    monkeypatch.setattr(make_figure_1, 'FIGURE_OUTPUT_DIR', str(tmp_path))
+    path, = make_figure_1.build_panels(conn, [1])
+    conn.close()
+    tex = open(path).read()
+    assert tex.count("\\addplot") == tex.count("\\addlegendentry") == 4
+    assert "{N bias\\\\ 200 0.01\\\\ 400 0.02\\\\}" in tex
+    assert tex.rstrip().endswith("\\end{tikzpicture}")
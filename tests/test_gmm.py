@@ -0,0 +1,173 @@
+"""Tests of the batched AB and System GMM estimators and their sufficient statistics."""
+
+import numpy as np
+
+import dgp
+import gmm
+from panel import Panel
+
+
+def simulated_panels(N=400, reps=6, model='B', rho=0.5, seed=3):
+    params = dgp.get_design('endogenous')
+    rng = np.random.default_rng(seed)
+    return dgp.drop_burn_in(dgp.simulate_panels(params, N, model, rho, reps, rng), params)
+
+
+def estimates(moments):
+    return moments.arellano_bond() + moments.system_gmm()
+
+
+def test_merged_chunks_match_the_single_pass():
+    panel = Panel.from_panels(simulated_panels())
+    reps, T = panel.reps, panel.T
+    chunks = [panel.individuals(0, 150), panel.individuals(150, panel.N)]
+
+    # Single pass: the chunks added one after the other, as simulate.estimate_batch() does
+    sequential, sequential_full = gmm.PatternMoments(reps, T), gmm.PatternMoments(reps, T)
+    for chunk in chunks:
+        sequential.add_panel(chunk, full=sequential_full)
+
+    # Chunks accumulated separately (e.g. in other processes), then merged
+    merged, merged_full = gmm.PatternMoments(reps, T), gmm.PatternMoments(reps, T)
+    for chunk in chunks:
+        part, part_full = gmm.PatternMoments(reps, T), gmm.PatternMoments(reps, T)
+        part.add_panel(chunk, full=part_full)
+        merged.merge(part)
+        merged_full.merge(part_full)
+
+    for ours, theirs in [(merged, sequential), (merged_full, sequential_full)]:
+        assert sorted(ours.totals) == sorted(theirs.totals)
+        for code in ours.totals:
+            assert np.array_equal(ours.totals[code], theirs.totals[code])
+        for ours_values, theirs_values in zip(estimates(ours), estimates(theirs)):
+            assert np.array_equal(ours_values, theirs_values, equal_nan=True)
+
+    # And, up to rounding, the estimates of the whole panel at once
+    whole = gmm.PatternMoments(reps, T)
+    whole.add_panel(panel)
+    for ours_values, whole_values in zip(estimates(merged), estimates(whole)):
+        np.testing.assert_allclose(ours_values, whole_values, rtol=1e-10)
+
+
+def test_shared_pass_matches_separate_selected_and_full_passes():
+    panels = simulated_panels()
+    reps, T = panels['y'].shape[0], panels['y'].shape[-1]
+    selected, full = gmm.PatternMoments(reps, T), gmm.PatternMoments(reps, T)
+    selected.add(panels['y_star'], panels['d'], full=full)
+
+    separate, separate_full = gmm.PatternMoments(reps, T), gmm.PatternMoments(reps, T)
+    separate.add(panels['y'])
+    separate_full.add(panels['y_star'])
+
+    assert sorted(selected.totals) == sorted(separate.totals)
+    for code in selected.totals:
+        assert np.array_equal(selected.totals[code], separate.totals[code])
+    for ours, theirs in zip(estimates(selected), estimates(separate)):
+        assert np.array_equal(ours, theirs, equal_nan=True)
+    for ours, theirs in zip(estimates(full), estimates(separate_full)):
+        np.testing.assert_allclose(ours, theirs, rtol=1e-12)
+
+
+def test_arellano_bond_of_a_small_panel():
+    # Four individuals over T = 5 periods; the third one is not observed in period 2
+    y = np.array([[[1.0, 2.0, 4.0, 3.0, 5.0],
+                   [0.5, 1.5, 1.0, 2.5, 2.0],
+                   [2.0, np.nan, 1.0, 3.0, 4.0],
+                   [3.0, 2.5, 3.5, 5.0, 4.5]]])
+
+    # xtabond2 y L.y, gmm(L.y, collapse) nolevel, one individual and one period at a time
+    T = y.shape[-1]
+    H = 2 * np.eye(T - 2) - np.eye(T - 2, k=1) - np.eye(T - 2, k=-1)
+    ZHZ, ZX, Zy, rows = np.zeros((T - 2, T - 2)), np.zeros(T - 2), np.zeros(T - 2), []
+    for yi in y[0]:
+        Z, X, Y = np.zeros((T - 2, T - 2)), np.zeros(T - 2), np.zeros(T - 2)
+        for t in range(2, T):
+            if np.isnan(yi[t - 2:t + 1]).any():
+                continue
+            Y[t - 2], X[t - 2] = yi[t] - yi[t - 1], yi[t - 1] - yi[t - 2]
+            rows.append((X[t - 2], Y[t - 2]))
+            for lag in range(2, t + 1):
+                Z[t - 2, lag - 2] = 0.0 if np.isnan(yi[t - lag]) else yi[t - lag]
+        ZHZ += Z.T @ H @ Z
+        ZX += Z.T @ X
+        Zy += Z.T @ Y
+    A = np.linalg.inv(ZHZ)
+    coef = (ZX @ A @ Zy) / (ZX @ A @ ZX)
+    sig2 = sum((dy - coef * dx) ** 2 for dx, dy in rows) / (2 * (len(rows) - 1))
+    se = np.sqrt(sig2 / (ZX @ A @ ZX))
+    assert len(rows) == 10 and np.isfinite([coef, se]).all()
+
+    coefs, ses = gmm.arellano_bond(y)
+    np.testing.assert_allclose([coefs[0], ses[0]], [coef, se], rtol=1e-12)
+
+    # The same panel with the gap as a selection mask instead of a missing value
+    mask = np.isfinite(y)
+    masked_coefs, masked_ses = gmm.arellano_bond(np.nan_to_num(y, nan=100.0), mask)
+    np.testing.assert_allclose([masked_coefs[0], masked_ses[0]], [coef, se], rtol=1e-12)
+
+
+def test_system_gmm_of_a_small_panel():
+    # 30 individuals over T = 6 periods, some with gaps
+    rng = np.random.default_rng(4)
+    T = 6
+    y = np.cumsum(rng.normal(1.0, 1.0, size=(1, 30, T)), axis=-1)
+    y[0, 3, 1] = y[0, 7, 3] = y[0, 12, 0] = y[0, 12, 4] = np.nan
+
+    # xtabond2 y L.y, gmm(L.y, lag(2 .)) iv(L.D.y, equation(level)): difference equations for t = 3..T,
+    # then level equations for the same periods
+    periods = range(3, T + 1)
+    diff_columns = [(t, s) for t in periods for s in range(1, t - 2)]
+    n_cols = len(diff_columns) + (T - 3) + 2
+
+    # h(3): covariance of (D.e_3..D.e_T, e_3..e_T) for i.i.d. unit-variance e_1..e_T
+    E = np.zeros((2 * len(periods), T))
+    for r, t in enumerate(periods):
+        E[r, t - 1], E[r, t - 2] = 1.0, -1.0
+        E[len(periods) + r, t - 1] = 1.0
+    H = E @ E.T
+
+    ZHZ, ZX, Zy, residual_rows = np.zeros((n_cols, n_cols)), np.zeros((n_cols, 2)), np.zeros(n_cols), []
+    for yi in y[0]:
+        def value(t):
+            return 0.0 if t < 1 or np.isnan(yi[t - 1]) else yi[t - 1]
+        Z, X, Y = np.zeros((2 * len(periods), n_cols)), np.zeros((2 * len(periods), 2)), np.zeros(2 * len(periods))
+        for r, t in enumerate(periods):
+            if np.isnan(yi[t - 3:t]).any():
+                continue
+            d, level = r, len(periods) + r
+            Y[d], X[d] = yi[t - 1] - yi[t - 2], [yi[t - 2] - yi[t - 3], 0.0]
+            Y[level], X[level] = yi[t - 1], [yi[t - 2], 1.0]
+            residual_rows.append((X[d, 0], Y[d]))
+            for column, (t_column, s) in enumerate(diff_columns):
+                if t_column == t:
+                    Z[d, column] = value(s)
+            if t > 3 and not np.isnan(yi[t - 4]):
+                Z[level, len(diff_columns) + t - 4] = yi[t - 3] - yi[t - 4]
+            Z[level, -2:] = [yi[t - 2] - yi[t - 3], 1.0]
+        ZHZ += Z.T @ H @ Z
+        ZX += Z.T @ X
+        Zy += Z.T @ Y
+    A = np.linalg.inv(ZHZ)
+    M_inv = np.linalg.inv(ZX.T @ A @ ZX)
+    coefs = M_inv @ ZX.T @ A @ Zy
+    sig2 = sum((dy - coefs[0] * dx) ** 2 for dx, dy in residual_rows) / (2 * (len(residual_rows) - 2))
+    se = np.sqrt(sig2 * M_inv[0, 0])
+    assert np.isfinite([coefs[0], se]).all()
+
+    sys_coefs, sys_ses = gmm.system_gmm(y)
+    np.testing.assert_allclose([sys_coefs[0], sys_ses[0]], [coefs[0], se], rtol=1e-10)
+
+
+def test_estimates_do_not_depend_on_the_order_or_the_other_replications():
+    # Moments are summed per observation pattern, so mixing patterns across
+    # individuals and replications must not change any estimate
+    rng = np.random.default_rng(5)
+    y = np.cumsum(rng.standard_normal((3, 40, 7)), axis=-1)
+    y[rng.random(y.shape) < 0.2] = np.nan
+    order = rng.permutation(40)
+    for estimator in [gmm.arellano_bond, gmm.system_gmm]:
+        coefs, ses = estimator(y)
+        np.testing.assert_allclose(estimator(y[:, order])[0], coefs, rtol=1e-10)
+        for rep in range(3):
+            alone = estimator(y[rep:rep + 1])
+            np.testing.assert_allclose([alone[0][0], alone[1][0]], [coefs[rep], ses[rep]], rtol=1e-10)
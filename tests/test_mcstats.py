@@ -0,0 +1,91 @@
+"""Tests of the streaming Monte Carlo statistics."""
+
+import numpy as np
+import pytest
+
+from mcstats import MIN_VALID, RunningStats, UnitStats
+
+
+def test_batches_and_merges_give_the_moments_of_all_replications():
+    rng = np.random.default_rng(2)
+    coefs = rng.standard_t(5, size=500)
+    ses = np.ones_like(coefs)
+    ses[::50] = np.nan
+
+    first, second = RunningStats(), RunningStats()
+    for start in range(0, 300, 70):
+        first.update(coefs[start:min(start + 70, 300)], ses[start:min(start + 70, 300)])
+    second.update(coefs[300:], ses[300:])
+    first.merge(second)
+
+    values = coefs[np.isfinite(ses)]
+    deviations = values - values.mean()
+    summary = first.summary(0.0)
+    assert (summary['valid'], summary['reps'], summary['converged']) == (490, 500, 500)
+    np.testing.assert_allclose(summary['bias'], values.mean(), rtol=1e-12)
+    np.testing.assert_allclose(summary['sd'], values.std(ddof=1), rtol=1e-12)
+    np.testing.assert_allclose(summary['rmse'], np.sqrt((values ** 2).mean()), rtol=1e-12)
+    np.testing.assert_allclose([first.m3, first.m4], [(deviations ** 3).sum(), (deviations ** 4).sum()],
+                               rtol=1e-10)
+    np.testing.assert_allclose(summary['kurtosis'], len(values) * (deviations ** 4).sum()
+                               / (deviations ** 2).sum() ** 2, rtol=1e-10)
+    assert RunningStats.from_state(first.state()).state() == first.state()
+
+
+def test_too_few_valid_replications_report_no_bias():
+    stats = RunningStats()
+    stats.update(np.zeros(MIN_VALID), np.r_[np.ones(MIN_VALID - 1), 0.0])
+    summary = stats.summary(0.0)
+    assert summary['valid'] == MIN_VALID - 1 and np.isnan(summary['bias'])
+
+
+def test_states_without_the_converged_count_still_load():
+    stats = RunningStats.from_state([20, 0.5, 1.5, 25])
+    assert (stats.n, stats.reps, stats.converged) == (20, 25, 0)
+
+
+def test_units_of_one_replication_are_independent_draws():
+    rng = np.random.default_rng(3)
+    coefs, ses = rng.normal(0.5, 0.1, 200), np.ones(200)
+    plain, units = RunningStats(), UnitStats()
+    for start in range(0, 200, 50):
+        plain.update(coefs[start:start + 50], ses[start:start + 50])
+        units.update(coefs[start:start + 50], ses[start:start + 50])
+    summary = units.summary(0.5)
+    for name in ['bias', 'sd', 'mcse', 'rmse']:
+        np.testing.assert_allclose(summary[name], plain.summary(0.5)[name], rtol=1e-12)
+    np.testing.assert_allclose(summary['vrf'], 1.0)
+
+
+def test_mc_errors_of_pairs_come_from_the_pair_means():
+    rng = np.random.default_rng(4)
+    coefs = rng.normal(0.5, 0.1, 200)
+    coefs[1::2] = 1.0 - coefs[::2] + rng.normal(0, 0.01, 100)
+    units = UnitStats(size=2)
+    for start in range(0, 200, 40):
+        units.update(coefs[start:start + 40], np.ones(40))
+    pairs = coefs.reshape(100, 2).mean(axis=1)
+    summary = units.summary(0.5)
+    assert summary['units'] == 100
+    np.testing.assert_allclose(summary['bias'], coefs.mean() - 0.5, rtol=1e-10)
+    np.testing.assert_allclose(summary['mcse'], pairs.std(ddof=1) / np.sqrt(100), rtol=1e-10)
+    assert summary['vrf'] > 10
+    with pytest.raises(ValueError, match="whole units"):
+        units.update(coefs[:3], np.ones(3))
+
+
+def test_control_variates_remove_their_part_of_the_error():
+    rng = np.random.default_rng(5)
+    controls = rng.standard_normal((400, 2))
+    coefs = 0.5 + controls @ [0.08, -0.03] + rng.normal(0, 0.02, 400)
+    units = UnitStats()
+    for start in range(0, 400, 100):
+        units.update(coefs[start:start + 100], np.ones(100), controls[start:start + 100])
+
+    # The intercept and residuals of the regression of the estimates on the controls
+    X = np.column_stack([np.ones(400), controls])
+    beta, residual, _, _ = np.linalg.lstsq(X, coefs, rcond=None)
+    summary = units.summary(0.5)
+    np.testing.assert_allclose(summary['bias'], beta[0] - 0.5, rtol=1e-8)
+    np.testing.assert_allclose(summary['mcse'] ** 2, residual[0] / (400 - 3) / 400 * 398 / 396, rtol=1e-8)
+    assert summary['vrf'] > 10
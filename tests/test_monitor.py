@@ -0,0 +1,57 @@
+"""Tests of the progress events and the sweep ETA of monitor.py."""
+
+import json
+import time
+
+import pytest
+
+import monitor
+import progress
+
+
+def sweep_events(b_done=40, b_rate=4.0):
+    jobs = [{'cell': 'a', 'reps': 100, 'cost': 100}, {'cell': 'b', 'reps': 100, 'cost': 100},
+            {'cell': 'c', 'reps': 100, 'cost': 200}]
+    return [
+        {'event': 'sweep', 'cell': None, 'time': 0.0, 'jobs': jobs},
+        {'event': 'start', 'cell': 'a', 'time': 0.0, 'done': 0, 'reps': 100},
+        {'event': 'start', 'cell': 'b', 'time': 0.0, 'done': 0, 'reps': 100},
+        {'event': 'progress', 'cell': 'a', 'time': 10.0, 'done': 50, 'reps': 100, 'rate': 5.0},
+        {'event': 'progress', 'cell': 'b', 'time': 10.0, 'done': b_done, 'reps': 100, 'rate': b_rate},
+    ]
+
+
+def test_eta_is_the_remaining_cost_over_the_current_throughput():
+    states = monitor.cell_states(sweep_events())
+    assert [states[name]['status'] for name in 'abc'] == ['running', 'running', 'queued']
+    assert monitor.cell_eta(states['a']) == pytest.approx(10.0)
+
+    summary = monitor.sweep_summary(states, now=10.0)
+    assert summary['counts'] == {'running': 2, 'failed': 0, 'queued': 1, 'done': 0}
+    assert summary['fraction'] == pytest.approx(90 / 400)
+    assert summary['throughput'] == pytest.approx(9.0)
+    assert summary['eta'] == pytest.approx(310 / 9)
+
+    # But never before the slowest running cell can finish
+    assert monitor.sweep_summary(monitor.cell_states(sweep_events(10, 1.0)), now=10.0)['eta'] == pytest.approx(90.0)
+
+
+def test_slow_and_stalled_cells_are_flagged():
+    states = monitor.cell_states(sweep_events(10, 1.0))
+    assert monitor.flag_stragglers(states, now=10.0) == {'b': 'SLOW'}
+    assert monitor.flag_stragglers(states, now=10.0 + monitor.STALL_SECONDS + 1) == {'a': 'STALLED', 'b': 'STALLED'}
+
+
+def test_events_of_workers_and_stata_are_read_back(tmp_path):
+    path = str(tmp_path / "progress.jsonl")
+    progress.emit(path, 'sweep', jobs=[])
+    progress.emit(path, 'progress', 'a', done=25, reps=100)
+    clock = time.strftime(progress.STATA_CLOCK, time.localtime(1_700_000_000))
+    with open(path, 'a') as f:
+        f.write(json.dumps({'event': 'progress', 'cell': 'b', 'clock': clock, 'done': 5}) + "\n")
+        f.write('{"event": "progress", "cell": "a", "ti')
+
+    events = progress.read_events(path)
+    assert [(event['event'], event['cell']) for event in events] == [('sweep', None), ('progress', 'a'),
+                                                                     ('progress', 'b')]
+    assert events[-1]['time'] == 1_700_000_000
@@ -0,0 +1,79 @@
+"""Tests of the wide panel container and its bit-packed selection."""
+
+import numpy as np
+import pytest
+
+import dgp
+import gmm
+from panel import Panel, code_dtype, pack_mask, unpack_mask
+
+
+def simulated_panel(model='A'):
+    params = dgp.get_design('endogenous')
+    panels = dgp.drop_burn_in(dgp.simulate_panels(params, 300, model, 0.5, 4, np.random.default_rng(8)), params)
+    return params, panels, Panel.from_panels(panels)
+
+
+@pytest.mark.parametrize('T', [4, 7, 9, 17])
+def test_pack_mask_sets_bit_t_for_period_t(T):
+    mask = np.random.default_rng(T).random((3, 50, T)) < 0.6
+    codes = pack_mask(mask)
+    assert codes.shape == (3, 50) and codes.dtype == code_dtype(T)
+    assert np.array_equal((codes[..., None] >> np.arange(T, dtype=codes.dtype)) & 1, mask)
+    assert np.array_equal(unpack_mask(codes, T), mask)
+
+
+def test_panel_moments_match_the_masked_outcome():
+    params, panels, panel = simulated_panel()
+    assert (panel.reps, panel.N, panel.T) == (4, 300, params['T'])
+
+    # The codes group the individuals as the observation mask of y does
+    from_panel, from_y = gmm.PatternMoments(panel.reps, panel.T), gmm.PatternMoments(panel.reps, panel.T)
+    for start, stop in [(0, 120), (120, panel.N)]:
+        from_panel.add_panel(panel.individuals(start, stop))
+    from_y.add(panels['y'])
+    for ours, theirs in zip(from_panel.arellano_bond() + from_panel.system_gmm(),
+                            from_y.arellano_bond() + from_y.system_gmm()):
+        np.testing.assert_allclose(ours, theirs, rtol=1e-10)
+
+
+def test_lags_and_differences_are_views_of_the_wide_arrays():
+    _, panels, panel = simulated_panel()
+    y = panels['y_star']
+    assert np.shares_memory(panel.L('y_star', 2), y)
+    assert np.array_equal(panel.L('y_star', 2), y[..., :-2])
+    assert np.array_equal(panel.L('y_star', 1, start=2), y[..., 1:-1])
+    assert np.array_equal(panel.D('y_star', start=2), y[..., 2:] - y[..., 1:-1])
+    with pytest.raises(ValueError):
+        panel.L('y_star', 2, start=1)
+
+    assert np.array_equal(panel.selected(), panels['d'])
+    assert np.array_equal(panel.observed('y_star'), np.where(panels['d'], y, 0.0))
+    assert panel.nbytes == y.nbytes + panel.codes.nbytes
+    assert panel.codes.nbytes * panel.T == panels['d'].nbytes
+
+
+@pytest.mark.parametrize('model', ['A', 'B'])
+def test_consecutive_selections_are_the_do_file_indicators(model):
+    _, panels, panel = simulated_panel(model)
+    d = panels['d']
+    has_3consec = d[..., 2:] & d[..., 1:-1] & d[..., :-2]
+    has_2consec = d[..., 1:] & d[..., :-1]
+    assert np.array_equal(unpack_mask(panel.consecutive(3), panel.T)[..., 2:], has_3consec)
+    assert not unpack_mask(panel.consecutive(3), panel.T)[..., :2].any()
+    assert np.array_equal(panel.count_consecutive(2), has_2consec.sum(axis=(1, 2)))
+    assert np.array_equal(panel.count_consecutive(1), d.sum(axis=(1, 2)))
+
+    # The AB equations are exactly the periods with y, L.y and L2.y observed
+    moments = gmm.PatternMoments(panel.reps, panel.T)
+    moments.add_panel(panel)
+    assert np.array_equal(moments.moments(gmm._ab_equations)['nobs'], panel.count_consecutive(3))
+
+
+@pytest.mark.parametrize('T', [9, 17, 40])
+def test_consecutive_counts_of_wide_codes(T):
+    d = np.random.default_rng(T).random((3, 20, T)) < 0.7
+    panel = Panel({}, pack_mask(d), T)
+    has_3consec = d[..., 2:] & d[..., 1:-1] & d[..., :-2]
+    assert np.array_equal(panel.count_consecutive(3), has_3consec.sum(axis=(1, 2)))
+    assert np.array_equal(panel.individuals(5, 12).count_consecutive(3), has_3consec[:, 5:12].sum(axis=(1, 2)))
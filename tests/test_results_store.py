@@ -0,0 +1,121 @@
+"""Tests of the results store: archive bootstrap, keys and versioning."""
+
+import results_store
+import simulate
+
+
+def test_store_created_by_a_writer_holds_the_archive(tmp_path, in_code_dir, archived_cells):
+    store = str(tmp_path / "results.sqlite")
+    simulate.main(['endogenous', '200', 'A', '0.25', '--reps', '2', '--no-csv', '--store', store])
+
+    conn = results_store.connect(store)
+    index = results_store.load_index(conn)
+    assert results_store.get_meta(conn, 'archive_imported') == '1'
+    conn.close()
+    assert archived_cells <= set(index)
+    assert (0, 'endogenous', 'A', 200, 0.25) in index
+    assert index[(0, 'endogenous', 'A', 200, 0.25)]['reps'] == 2
+
+
+def test_archive_is_imported_once(tmp_path, in_code_dir):
+    store = str(tmp_path / "results.sqlite")
+    conn = results_store.connect(store)
+    row = results_store.query_results(conn, experiment=1, model='A', N=500, rho=0.25)[0]
+    assert row['engine'] == 'stata'
+    results_store.write_result(conn, dict(row, AB_bias=1.0, date_time=None))
+    conn.close()
+
+    # Reconnecting does not import the archive over the newer write
+    conn = results_store.connect(store)
+    assert results_store.query_results(conn, experiment=1, model='A', N=500, rho=0.25)[0]['AB_bias'] == 1.0
+    conn.close()
+
+
+def test_writes_replace_the_cell(tmp_path):
+    conn = results_store.connect(str(tmp_path / "results.sqlite"), archive=None)
+    row = {'experiment': 2, 'selection': 'endogenous', 'model': 'B', 'N': 500, 'rho': '0.5', 'engine': 'python',
+           'AB_bias': 0.1, 'AB_valid': '500.0', 'SYS_bias': float('nan')}
+    results_store.write_result(conn, row)
+    results_store.write_result(conn, dict(row, rho='.50', AB_bias=0.2))
+    results_store.write_result(conn, dict(row, model='A'))
+
+    rows = results_store.query_results(conn, model='B', rho=[0.5, 0.75])
+    assert [(row['rho'], row['AB_bias'], row['AB_valid'], row['SYS_bias']) for row in rows] == [(0.5, 0.2, 500, None)]
+    assert len(results_store.query_results(conn)) == 2
+    conn.close()
+
+
+def test_versions_increase_with_every_write(tmp_path):
+    conn = results_store.connect(str(tmp_path / "results.sqlite"), archive=None)
+    row = {'experiment': 2, 'selection': 'endogenous', 'model': 'B', 'N': 500, 'rho': '0.5', 'engine': 'python',
+           'AB_bias': 0.1}
+    results_store.write_result(conn, row)
+    _, first = results_store.changed_since(conn, 0)
+    results_store.write_result(conn, dict(row, rho='.50', AB_bias=0.2))
+
+    rows, latest = results_store.changed_since(conn, first)
+    assert latest == first + 1
+    assert [(row['rho'], row['AB_bias']) for row in rows] == [(0.5, 0.2)]
+    assert len(results_store.query_results(conn)) == 1
+    conn.close()
+
+
+def test_parse_filename_normalizes_rho():
+    assert results_store.parse_filename("output/partial/endo_modelA_N500_rho0.5.csv") == \
+        results_store.parse_filename("endo_modelA_N500_rho0.50.dta")
+    assert results_store.parse_filename("notes.txt") is None
+
+
+def write_archived(directory, name, AB_bias, date_time):
+    directory.mkdir(exist_ok=True)
+    (directory / name).write_text("N,rho,AB_bias,AB_se,SYS_bias,SYS_se,AB_valid,SYS_valid,date_time\n"
+                                  f"200,.5,{AB_bias},.1,.01,.1,500,500,{date_time}\n")
+
+
+def test_newest_archived_run_of_a_cell_wins(tmp_path):
+    write_archived(tmp_path / "partial", "endo_modelA_N200_rho0.50.csv", 0.02, "14 Jul 2025 04:02:21")
+    write_archived(tmp_path / "partial", "endo_modelA_N200_rho0.5.csv", 0.01, "10 Jul 2025 11:00:00")
+    write_archived(tmp_path / "partial_old", "endo_modelA_N200_rho.5.csv", 0.03, "1 Jul 2025 09:00:00")
+    directories = [str(tmp_path / "partial"), str(tmp_path / "partial_old")]
+    conn = results_store.connect(str(tmp_path / "results.sqlite"), archive=None)
+
+    assert results_store.ingest(conn, directories) == {'files': 3, 'cells': 1, 'written': 1, 'kept': 0}
+    row, = results_store.query_results(conn)
+    assert (row['rho'], row['AB_bias'], row['reps']) == (0.5, 0.02, results_store.STATA_REPS)
+    assert results_store.ingest(conn, directories)['written'] == 0
+    conn.close()
+
+
+def test_csv_of_a_run_wins_over_its_dta():
+    csv, dta = ({'source': f"output/partial/endo_modelA_N200_rho0.25{extension}", 'timestamp': timestamp,
+                 'experiment': 0, 'selection': 'endogenous', 'model': 'A', 'N': 200, 'rho': 0.25, 'engine': 'stata'}
+                for extension, timestamp in [('.csv', 100.0), ('.dta', 200.0)])
+    assert results_store.resolve_duplicates([csv, dta]) == {(0, 'endogenous', 'A', 200, 0.25, 'stata'): csv}
+
+
+def test_python_runs_keep_the_stata_results(tmp_path, in_code_dir):
+    store = str(tmp_path / "results.sqlite")
+    conn = results_store.connect(store)
+    stata = results_store.load_index(conn)[(0, 'endogenous', 'A', 500, 0.25)]
+    conn.close()
+    simulate.main(['endogenous', '500', 'A', '0.25', '--reps', '2', '--no-csv', '--store', store])
+
+    conn = results_store.connect(store)
+    newest = results_store.load_index(conn)[(0, 'endogenous', 'A', 500, 0.25)]
+    assert (newest['engine'], newest['reps']) == ('python', 2)
+    assert results_store.load_index(conn, engine='stata')[(0, 'endogenous', 'A', 500, 0.25)] == stata
+    assert len(results_store.query_results(conn, engine=results_store.ENGINES, N=500, rho=0.25, model='A',
+                                           selection='endogenous', experiment=0)) == 2
+    # Importing the archive again keeps the Python run as the newest row of the cell
+    assert results_store.ingest(conn)['written'] == 0
+    assert results_store.load_index(conn)[(0, 'endogenous', 'A', 500, 0.25)]['engine'] == 'python'
+    conn.close()
+
+
+def test_engine_of_archived_files(tmp_path):
+    write_archived(tmp_path, "endo_modelA_N200_rho0.50.csv", 0.02, "14 Jul 2025 04:02:21")
+    assert results_store.read_result_file(str(tmp_path / "endo_modelA_N200_rho0.50.csv"))['engine'] == 'stata'
+    row = dict(simulate.result_rows('endogenous', 'A', '0.50', simulate.run_cell('endogenous', 200, 'A', 0.5, reps=2),
+                                    200)[0][1])
+    simulate.write_results_csv(row, str(tmp_path / "endo_modelA_N200_rho0.5.csv"))
+    assert results_store.read_result_file(str(tmp_path / "endo_modelA_N200_rho0.5.csv"))['engine'] == 'python'
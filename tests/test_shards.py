@@ -0,0 +1,46 @@
+"""Tests of cells split into shards: the merged shards give the single run, bit for bit."""
+
+import pytest
+
+import shards
+import simulate
+
+
+@pytest.mark.parametrize('count', [2, 3])
+def test_merged_shards_are_the_single_run(tmp_path, count):
+    reps, N = 100, 200
+    header = simulate.shard_header('endogenous', N, 'B', 0.5, reps, count, full_sample=True)
+    for index in reversed(range(count)):
+        start, stop = shards.shard_range(reps, index, count, simulate.STATS_BLOCK)
+        blocks = simulate.run_shard('endogenous', N, 'B', 0.5, start, stop, full_sample=True, batch_size=50)
+        shards.write_shard(str(tmp_path / f"shard{index}.json"), header, start, stop, blocks)
+
+    blocks, _ = shards.load_shards(str(tmp_path), header)
+    merged = simulate.merge_shard_blocks(blocks)
+    single = simulate.run_cell('endogenous', N, 'B', 0.5, reps=reps, full_sample=True, counter_rng=True)
+    assert {name: running.state() for name, running in merged.items()} == \
+        {name: running.state() for name, running in single.items()}
+
+
+def test_shards_must_cover_the_cell(tmp_path):
+    header = simulate.shard_header('endogenous', 200, 'A', 0.5, 50, 2)
+    blocks = simulate.run_shard('endogenous', 200, 'A', 0.5, 0, 25)
+    shards.write_shard(str(tmp_path / "shard0.json"), header, 0, 25, blocks)
+    with pytest.raises(ValueError, match="cover 25 of 50"):
+        shards.load_shards(str(tmp_path), header)
+
+
+def test_empty_shards_are_skipped(tmp_path):
+    reps, count, block = 2 * simulate.STATS_BLOCK, 4, simulate.STATS_BLOCK
+    header = simulate.shard_header('endogenous', 200, 'A', 0.5, reps, count)
+    ranges = [shards.shard_range(reps, index, count, block) for index in range(count)]
+    assert ranges == [(0, 0), (0, block), (block, block), (block, reps)]
+    for index, (start, stop) in enumerate(ranges):
+        blocks = simulate.run_shard('endogenous', 200, 'A', 0.5, start, stop)
+        shards.write_shard(str(tmp_path / f"shard{index}.json"), header, start, stop, blocks)
+
+    blocks, _ = shards.load_shards(str(tmp_path), header)
+    merged = simulate.merge_shard_blocks(blocks)
+    single = simulate.run_cell('endogenous', 200, 'A', 0.5, reps=reps, counter_rng=True)
+    assert {name: running.state() for name, running in merged.items()} == \
+        {name: running.state() for name, running in single.items()}
@@ -0,0 +1,37 @@
+"""Tests of the common-random-numbers shock bank."""
+
+import numpy as np
+
+import dgp
+import simulate
+from shock_bank import ShockBank
+
+
+def test_cells_of_the_same_grid_read_the_same_shocks(tmp_path, monkeypatch):
+    read = []
+    simulate_panels = dgp.simulate_panels
+
+    def recording(*args):
+        read.append({name: np.array(values) for name, values in args[6].items()})
+        return simulate_panels(*args)
+
+    monkeypatch.setattr(dgp, 'simulate_panels', recording)
+    for model, rho in [('A', 0.25), ('B', 0.75)]:
+        simulate.run_cell('endogenous', 50, model, rho, reps=20, seed=3, batch_size=20, shock_dir=str(tmp_path))
+    first, second = read
+    assert first.keys() == second.keys()
+    for name in first:
+        assert np.array_equal(first[name], second[name])
+
+    # A bank drawn again in another directory holds the same innovations
+    bank = ShockBank(50, dgp.get_design('endogenous')['T_total'], 20, seed=3, directory=str(tmp_path / "again"))
+    for name, values in bank.shocks(0, 20).items():
+        assert not values.flags.writeable
+        assert np.array_equal(values, first[name])
+
+
+def test_crn_results_do_not_depend_on_the_batch_size(tmp_path):
+    runs = [simulate.run_cell('exp1', 50, 'B', 0.5, reps=30, seed=3, batch_size=batch_size, shock_dir=str(tmp_path))
+            for batch_size in [30, 7]]
+    for name, running in runs[0].items():
+        np.testing.assert_allclose(running.state(), runs[1][name].state(), rtol=1e-12)
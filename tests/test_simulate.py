@@ -0,0 +1,58 @@
+"""Tests of the cell runners of simulate.py."""
+
+import numpy as np
+
+import dgp
+import gmm
+import simulate
+from mcstats import RunningStats
+
+
+def run(reps, **kwargs):
+    return simulate.run_cell('endogenous', 200, 'A', 0.5, reps=reps, seed=5, batch_size=20, **kwargs)
+
+
+def test_adaptive_cell_stops_at_the_first_precise_batch():
+    target = 0.01
+    stats = run(1000, target_mcse=target, min_reps=40)
+    reps = stats['AB'].reps
+    assert 40 < reps < 1000 and reps % 20 == 0
+    assert all(running.summary(0.5)['mcse'] <= target for running in stats.values())
+
+    # The same replications as a fixed run, which was not precise one batch earlier
+    assert {name: running.state() for name, running in run(reps).items()} == \
+        {name: running.state() for name, running in stats.items()}
+    assert not simulate.precise_enough(run(reps - 20), 0.5, target)
+
+
+def test_adaptive_cell_runs_at_least_min_reps():
+    stats = run(1000, target_mcse=1.0, min_reps=50)
+    assert stats['AB'].reps == stats['SYS'].reps == 60
+
+
+def test_nested_points_are_the_estimates_on_the_first_n_individuals():
+    nested = simulate.run_nested('endogenous', [60, 150], 'B', 0.5, reps=20, full_sample=True, seed=5, batch_size=20)
+
+    # The largest point is the standalone run of the cell, up to rounding
+    single = simulate.run_cell('endogenous', 150, 'B', 0.5, reps=20, full_sample=True, seed=5, batch_size=20)
+    for name, running in single.items():
+        np.testing.assert_allclose(nested[150][name].state(), running.state(), rtol=1e-10)
+
+    # A prefix point estimates on the first n individuals of the same draws
+    params = dgp.get_design('endogenous')
+    panels = dgp.drop_burn_in(dgp.simulate_panels(params, 150, 'B', 0.5, 20, np.random.default_rng(5)), params)
+    prefix = {'AB': gmm.arellano_bond(panels['y'][:, :60]), 'SYS': gmm.system_gmm(panels['y'][:, :60]),
+              'AB_full': gmm.arellano_bond(panels['y_star'][:, :60]),
+              'SYS_full': gmm.system_gmm(panels['y_star'][:, :60])}
+    for name, (coefs, ses) in prefix.items():
+        expected = RunningStats()
+        expected.update(coefs, ses)
+        np.testing.assert_allclose(nested[60][name].state(), expected.state(), rtol=1e-10)
+
+
+def test_control_variates_use_the_same_replications():
+    plain = run(100, full_sample=True)
+    controlled = run(100, full_sample=True, control_variate=True)
+    for name, running in plain.items():
+        assert controlled[name].state()[:3] == running.state()[:3]
+        assert controlled[name].summary(0.5)['vrf'] > 1
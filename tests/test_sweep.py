@@ -0,0 +1,55 @@
+"""Tests of the sweep runner: grid, schedule and the bounded job pool."""
+
+import sys
+
+import sweep
+
+JOB = """
+import sys, time
+log, name, model = sys.argv[1], sys.argv[2], sys.argv[3]
+with open(log, 'a') as f:
+    f.write(f"start {name}\\n")
+time.sleep(0.2)
+with open(log, 'a') as f:
+    f.write(f"end {name}\\n")
+sys.exit(1 if model == 'B' else 0)
+"""
+
+
+def test_grid_and_schedule():
+    cells = sweep.build_grid(['endogenous', 'exp1'], [500, 5000], rho_values=['0.50'])
+    assert len(cells) == 2 * 2 * 2
+    costs = [sweep.cell_cost(cell) for cell in sweep.schedule(cells)]
+    assert costs == sorted(costs, reverse=True)
+    assert sweep.cell_cost(dict(cells[0], full_sample=True)) == 2 * sweep.cell_cost(cells[0])
+
+
+def test_python_command_passes_the_cell():
+    cell = sweep.build_grid(['exp2'], [5000], ['B'], ['0.50'], output_dir='output/partial_tab3', reps=100)[0]
+    command = sweep.build_command(cell, 'python')
+    assert command[1:7] == ['simulate.py', 'exp2', '5000', 'B', '0.50', 'output/partial_tab3']
+    assert command[command.index('--reps') + 1] == '100'
+
+
+def test_cells_are_not_split_into_empty_shards():
+    cell = sweep.build_grid(['exp2'], [5000], ['B'], ['0.50'], reps=2 * sweep.STATS_BLOCK, shards=4)[0]
+    jobs = sweep.expand_shards([cell])
+    assert [(job['shard'], job['shards']) for job in jobs] == [(0, 2), (1, 2)]
+    assert [sweep.cell_reps(job) for job in jobs] == [sweep.STATS_BLOCK, sweep.STATS_BLOCK]
+
+
+def test_jobs_that_do_not_fit_the_memory_budget_run_one_at_a_time(tmp_path):
+    script, log = tmp_path / "job.py", tmp_path / "events.log"
+    script.write_text(JOB)
+    cells = sweep.build_grid(['endogenous'], [500, 5000], rho_values=['0.50'])
+    template = f"{sys.executable} {script} {log} {{design}}_{{N}}_{{model}} {{model}}"
+    budget = max(sweep.cell_memory(cell, 'stata') for cell in cells)
+
+    codes = sweep.run_sweep(cells, template=template, max_workers=4, memory_budget=budget,
+                            log_dir=str(tmp_path / "logs"))
+    assert codes == {sweep.cell_name(cell): 1 if cell['model'] == 'B' else 0 for cell in cells}
+    events = log.read_text().split()[1::2]
+    kinds = log.read_text().split()[::2]
+    assert kinds == ['start', 'end'] * len(cells)
+    assert all(name.startswith('endogenous_5000') for name in events[:4])
+    assert len(list((tmp_path / "logs").iterdir())) == len(cells)
@@ -0,0 +1,33 @@
+"""Tests of the table builders: one load of the results store renders the committed tables."""
+
+import os
+
+import pytest
+
+import make_tables
+import results_store
+from table_format import format_number_enhanced
+
+
+def test_tables_from_the_archive_match_the_committed_tables(tmp_path, in_code_dir, monkeypatch):
+    conn = results_store.connect(":memory:", archive=None)
+    results_store.ingest(conn)
+    index = results_store.load_index(conn)
+    conn.close()
+    for module in make_tables.TABLE_MODULES:
+        monkeypatch.setattr(module, 'TABLE_OUTPUT_DIR', str(tmp_path))
+
+    for path in make_tables.build_all(index):
+        with open(path) as built, open(os.path.join("output/tables", os.path.basename(path))) as committed:
+            assert built.read() == committed.read()
+
+
+@pytest.mark.parametrize('value, formatted', [
+    (0.01234, "$\\phantom{-}0.0\\underline{1}234$"),
+    (-0.1, "$-0.\\underline{1}0000$"),
+    (0.0, "$\\phantom{-}0.00000$"),
+    (None, "---"),
+    (float('nan'), "---"),
+])
+def test_format_number(value, formatted):
+    assert format_number_enhanced(value) == formatted
@@ -0,0 +1,28 @@
+"""Tests of the per-cell telemetry."""
+
+import pytest
+
+from telemetry import PHASES, CellTelemetry
+
+
+def test_runs_of_a_cell_add_their_times_and_keep_the_largest_peak():
+    first = CellTelemetry({'dgp': 1.0, 'AB': 2.0}, wall=4.0, peak_rss_mb=300.0)
+    second = CellTelemetry({'dgp': 0.5, 'SYS': 1.5}, wall=2.5, peak_rss_mb=200.0)
+    first.merge(CellTelemetry.from_state(dict(second.state(), peak_rss_mb=200.0)))
+
+    columns = first.columns(reps=100)
+    assert [columns[f"{name}_seconds"] for name in PHASES] == [1.5, 0.0, 2.0, 1.5]
+    assert columns['wall_seconds'] == 6.5
+    assert columns['seconds_per_rep'] == pytest.approx(0.065)
+    assert columns['peak_rss_mb'] == 300.0
+    assert CellTelemetry().columns(reps=0)['seconds_per_rep'] is None
+
+
+def test_phases_and_wall_time_are_timed():
+    telemetry = CellTelemetry()
+    telemetry.start()
+    with telemetry.phase('AB'):
+        sum(range(10000))
+    telemetry.stop()
+    assert 0 < telemetry.seconds['AB'] <= telemetry.wall
+    assert telemetry.state()['wall'] == telemetry.wall
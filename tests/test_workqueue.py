@@ -0,0 +1,89 @@
+"""Tests of the multi-node work queue: leases, commits, merges and the worker processes."""
+
+import time
+
+import results_store
+import simulate
+import workqueue
+from sweep import THREAD_VARIABLES, build_grid
+
+
+def queued_cell(tmp_path, reps=50, chunk_reps=25):
+    broker = workqueue.SQLiteBroker(str(tmp_path / "queue.sqlite"))
+    cell = build_grid(['endogenous'], [200], ['A'], ['0.50'], reps=reps)[0]
+    broker.submit(workqueue.chunk_tasks(cell, chunk_reps))
+    return broker
+
+
+def test_expired_lease_goes_to_the_next_worker(tmp_path):
+    broker = queued_cell(tmp_path, reps=25)
+    task = broker.lease('slow', lease_seconds=0.05)
+    assert broker.lease('fast') is None
+    time.sleep(0.1)
+
+    # The lease ran out: the task is leased again and the first worker has lost it
+    again = broker.lease('fast')
+    assert (again['id'], again['attempts']) == (task['id'], 2)
+    assert not broker.heartbeat(task['id'], 'slow')
+    assert broker.fail(task['id'], 'slow', "late error") is None
+
+    # Whichever run commits first is kept, later commits are ignored
+    assert broker.complete(task['id'], 'slow', {'run': 'slow'})
+    assert not broker.complete(again['id'], 'fast', {'run': 'fast'})
+    assert broker.results(workqueue.cell_spec(task['spec']))[0][2] == {'run': 'slow'}
+
+
+def test_lease_expired_on_the_last_attempt_fails(tmp_path):
+    broker = workqueue.SQLiteBroker(str(tmp_path / "queue.sqlite"), max_attempts=2)
+    cell = build_grid(['endogenous'], [200], ['A'], ['0.50'], reps=25)[0]
+    broker.submit(workqueue.chunk_tasks(cell))
+    for worker in ['first', 'second']:
+        assert broker.lease(worker, lease_seconds=0.01) is not None
+        time.sleep(0.05)
+    assert broker.lease('third') is None
+    assert [task['state'] for task in broker.tasks()] == ['failed']
+    assert broker.retry_failed() == 1
+
+
+def test_worker_merges_the_single_run_into_a_new_store(tmp_path, in_code_dir, archived_cells):
+    broker = queued_cell(tmp_path)
+    store = str(tmp_path / "results.sqlite")
+    assert workqueue.run_worker(broker, store, 'worker') == 2
+    assert [merged is not None for _, _, _, merged in broker.cells()] == [True]
+
+    conn = results_store.connect(store)
+    index = results_store.load_index(conn)
+    conn.close()
+    assert archived_cells <= set(index)
+    single = simulate.summarize_cell(simulate.run_cell('endogenous', 200, 'A', 0.5, reps=50, counter_rng=True),
+                                     200, 0.5)
+    row = index[(0, 'endogenous', 'A', 200, 0.5)]
+    assert {column: row[column] for column in single} == single
+
+
+def test_workers_always_run_with_capped_threads(tmp_path, monkeypatch, in_code_dir):
+    started = []
+
+    class Process:
+        def __init__(self, command, env):
+            started.append((command, env))
+
+        def wait(self):
+            return 0
+
+    monkeypatch.setattr(workqueue.subprocess, 'Popen', Process)
+    for variable in THREAD_VARIABLES:
+        monkeypatch.delenv(variable, raising=False)
+    queue = str(tmp_path / "queue.sqlite")
+    assert workqueue.main(['--queue', queue, 'work', '--threads-per-worker', '2', '--worker', 'w']) == 0
+    (command, env), = started
+    assert all(env[variable] == '2' for variable in THREAD_VARIABLES)
+    assert command[command.index('--threads-per-worker') + 1] == '2'
+    assert command[command.index('--worker') + 1] == 'w'
+
+    # The started worker finds its threads capped and runs in its own process
+    for variable in THREAD_VARIABLES:
+        monkeypatch.setenv(variable, env[variable])
+    assert workqueue.threads_capped(2)
+    assert workqueue.main(['--queue', queue, 'work', '--threads-per-worker', '2']) == 0
+    assert len(started) == 1